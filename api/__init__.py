@@ -22,7 +22,68 @@ def create_app(test_config=None):
     app.config.from_mapping(
         SECRET_KEY='dev',  # Used for data safety -- should be overridden for production deployment
         # Path to the saved SQLite database file
-        DATABASE=os.path.join(app.instance_path, 'db.sqlite')
+        DATABASE=os.path.join(app.instance_path, 'db.sqlite'),
+        # SQLAlchemy database URL, which overrides DATABASE when set
+        DATABASE_URL=None,
+        # Whether executed SQL statements are logged
+        DATABASE_ECHO=False,
+        # Connection pool class name, e.g. 'QueuePool' or 'NullPool' (None uses the default)
+        DATABASE_POOL_CLASS=None,
+        # Connection pool tuning, where None uses SQLAlchemy's defaults
+        DATABASE_POOL_SIZE=None,
+        DATABASE_POOL_TIMEOUT=None,
+        DATABASE_POOL_RECYCLE=None,
+        DATABASE_MAX_OVERFLOW=None,
+        # Extra arguments passed to the database driver's connect(), e.g. {'timeout': 15}
+        DATABASE_CONNECT_ARGS={},
+        # How GET requests read the database: 'primary', 'readonly' or 'replica'
+        DATABASE_READ_MODE='primary',
+        # Path to the copy of the database used by the 'replica' read mode
+        DATABASE_REPLICA=os.path.join(app.instance_path, 'replica.sqlite'),
+        # Number of seconds between refreshes of the replica
+        DATABASE_REPLICA_REFRESH=60,
+        # Whether responses are compressed for clients that accept gzip/deflate
+        COMPRESS_ENABLED=True,
+        # zlib compression level, from 1 (fastest) to 9 (smallest)
+        COMPRESS_LEVEL=6,
+        # Responses smaller than this many bytes are sent uncompressed
+        COMPRESS_MIN_SIZE=500,
+        # Mimetypes of responses that are compressed
+        COMPRESS_MIMETYPES=['application/json', 'text/html', 'text/css',
+                            'text/javascript', 'application/javascript'],
+        # Maximum number of sensor data rows changed per transaction by chunked deletes and updates
+        BULK_CHUNK_SIZE=10000,
+        # Number of seconds finished background deletion jobs can still be looked up
+        DELETION_JOB_TTL=3600,
+        # Maximum number of rows returned by a filtered collection query
+        QUERY_MAX_LIMIT=10000,
+        # Maximum number of rows a filtered collection query can skip with `offset`
+        QUERY_MAX_OFFSET=100000,
+        # Maximum number of readings loaded by a single analytics request
+        ANALYTICS_MAX_ROWS=1000000,
+        # Maximum number of time steps of the axis of aligned room readings
+        ANALYTICS_MAX_POINTS=100000,
+        # Maximum number of bins of the `histogram` analytics operation
+        ANALYTICS_MAX_HISTOGRAM_BINS=1000,
+        # Whether GET responses of the generic model endpoints are cached in memory
+        RESPONSE_CACHE_ENABLED=True,
+        # Maximum total size of the cached responses, in bytes
+        RESPONSE_CACHE_MAX_BYTES=64 * 1024 * 1024,
+        # Hours of recent readings per sensor kept in memory to answer range queries (0 disables)
+        HOT_TIER_HOURS=0,
+        # Maximum number of readings kept in memory per sensor
+        HOT_TIER_MAX_READINGS_PER_SENSOR=100000,
+        # Maximum memory used by the in-memory readings, in bytes
+        HOT_TIER_MAX_BYTES=256 * 1024 * 1024,
+        # Whether requests to the model endpoints can be profiled with `?_profile=1`
+        PROFILING_ENABLED=False,
+        # Statements taking at least this many milliseconds are logged with
+        # their query plan (None disables timing statements)
+        SLOW_QUERY_THRESHOLD=None,
+        # Number of slow statements kept for '/_debug/slow_queries'
+        SLOW_QUERY_LOG_SIZE=100,
+        # Whether the diagnostic '/_debug' endpoints are registered outside debug mode
+        DEBUG_ENDPOINTS=False,
     )
 
     if not test_config:
@@ -39,11 +100,15 @@ def create_app(test_config=None):
     except OSError:
         pass
 
-    # NOTE: This may be bad practice -- might revist later or
-    # if issues start arising
-    with app.app_context():
-        from . import database
-        database.init_app(app)
+    # The database engines are created lazily from the configuration above
+    from . import database
+    database.init_app(app)
+
+    from . import search
+    search.init_app(app)
+
+    from . import slow_queries
+    slow_queries.init_app(app)
 
     # Depending on which decision we make for defining endpoints,
     # this registration will likely change.
@@ -53,4 +118,34 @@ def create_app(test_config=None):
     from api.views import bp as views_bp
     app.register_blueprint(views_bp)
 
+    from . import cache
+    cache.init_app(app)
+
+    from . import hot_tier
+    hot_tier.init_app(app)
+
+    from . import compression
+    compression.init_app(app)
+
+    from . import ingest
+    ingest.init_app(app)
+
+    from . import stats
+    stats.init_app(app)
+
+    from . import bulk
+    bulk.init_app(app)
+
+    from . import archive
+    archive.init_app(app)
+
+    from . import server
+    server.init_app(app)
+
+    from . import loadtest
+    loadtest.init_app(app)
+
+    from . import debug
+    debug.init_app(app)
+
     return app
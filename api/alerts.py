@@ -0,0 +1,157 @@
+from collections import defaultdict
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import joinedload
+
+from .models import AlertRule, AlertState, Room, Sensor
+from .stats import parse_numeric
+
+# Statuses of an alert state
+OK = 'ok'
+PENDING = 'pending'
+FIRING = 'firing'
+ALERT_STATUSES = (OK, PENDING, FIRING)
+
+
+def is_breached(rule, number):
+    """ is_breached
+
+    Returns whether a value is past the rule's threshold.
+    """
+    if rule.operator == 'above':
+        return number > rule.threshold
+    return number < rule.threshold
+
+
+def is_cleared(rule, number):
+    """ is_cleared
+
+    Returns whether a value is back past the threshold by at least the rule's
+    hysteresis, which keeps alerts from flapping around the threshold.
+    """
+    if rule.operator == 'above':
+        return number <= rule.threshold - rule.hysteresis
+    return number >= rule.threshold + rule.hysteresis
+
+
+def advance_state(state, rule, value, dtime):
+    """ advance_state
+
+    Advances an alert state by a single reading. Readings older than the
+    latest evaluated reading, and values that aren't numbers, are ignored.
+
+    Parameters:
+        state - AlertState instance to update
+        rule - the state's AlertRule
+        value - value of the reading
+        dtime - datetime of the reading
+    """
+    if state.updated_at is not None and dtime < state.updated_at:
+        return
+    number = parse_numeric(value)
+    if number is None:
+        return
+
+    state.value = value
+    state.updated_at = dtime
+    if state.status == FIRING:
+        if is_cleared(rule, number):
+            state.status = OK
+            state.since = None
+            state.resolved_at = dtime
+    elif is_breached(rule, number):
+        if state.status != PENDING:
+            state.status = PENDING
+            state.since = dtime
+        if (dtime - state.since).total_seconds() >= rule.duration:
+            state.status = FIRING
+            state.triggered_at = dtime
+            state.resolved_at = None
+    else:
+        state.status = OK
+        state.since = None
+
+
+def get_rules_by_sensor(session, sensor_ids):
+    """ get_rules_by_sensor
+
+    Looks up the rules applying to each sensor, whether they are defined for
+    the sensor itself or for its room or building, with a single query.
+
+    Parameters:
+        session - database session used for the query
+        sensor_ids - collection of sensor ids
+
+    Returns:
+        dictionary mapping sensor ids to lists of AlertRule instances
+    """
+    statement = (select(Sensor.id, AlertRule)
+                 .join(Room, Sensor.room_id == Room.id)
+                 .join(AlertRule, or_(AlertRule.sensor_id == Sensor.id,
+                                      AlertRule.room_id == Room.id,
+                                      AlertRule.building_id == Room.building_id))
+                 .where(Sensor.id.in_(sensor_ids)))
+    rules = defaultdict(list)
+    for sensor_id, rule in session.execute(statement):
+        rules[sensor_id].append(rule)
+    return rules
+
+
+def evaluate_alerts(session, readings):
+    """ evaluate_alerts
+
+    Evaluates the alert rules of the sensors in a batch of newly inserted
+    readings, in chronological order per sensor. This doesn't commit, so that
+    alert states are updated in the same transaction as the readings.
+
+    Parameters:
+        session - database session used for the evaluation
+        readings - list of inserted readings, either dictionaries or instances
+    """
+    readings_by_sensor = defaultdict(list)
+    for reading in readings:
+        if isinstance(reading, dict):
+            readings_by_sensor[reading['sensor_id']].append(
+                (reading['datetime'], reading['value']))
+        else:
+            readings_by_sensor[reading.sensor_id].append((reading.datetime, reading.value))
+
+    rules_by_sensor = get_rules_by_sensor(session, list(readings_by_sensor))
+    if not rules_by_sensor:
+        return
+
+    rule_ids = {rule.id for rules in rules_by_sensor.values() for rule in rules}
+    states = {(state.rule_id, state.sensor_id): state
+              for state in session.scalars(
+                  select(AlertState).where(AlertState.rule_id.in_(rule_ids),
+                                           AlertState.sensor_id.in_(rules_by_sensor)))}
+
+    for sensor_id, rules in rules_by_sensor.items():
+        sensor_readings = sorted(readings_by_sensor[sensor_id], key=lambda item: item[0])
+        for rule in rules:
+            state = states.get((rule.id, sensor_id))
+            if state is None:
+                state = AlertState(rule_id=rule.id, sensor_id=sensor_id, status=OK)
+                session.add(state)
+            for dtime, value in sensor_readings:
+                advance_state(state, rule, value, dtime)
+
+
+def query_alerts(session, status=None, sensor_id=None):
+    """ query_alerts
+
+    Returns the alert states, most recently updated first, along with their rules.
+
+    Parameters:
+        session - database session used for the query
+        status - optional status the alerts must have
+        sensor_id - optional id of the sensor the alerts must belong to
+    """
+    statement = (select(AlertState)
+                 .options(joinedload(AlertState.rule))
+                 .order_by(AlertState.updated_at.desc(), AlertState.rule_id))
+    if status:
+        statement = statement.where(AlertState.status == status)
+    if sensor_id is not None:
+        statement = statement.where(AlertState.sensor_id == sensor_id)
+    return session.scalars(statement).all()
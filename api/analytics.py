@@ -0,0 +1,456 @@
+import itertools
+import re
+
+import numpy as np
+from sqlalchemy import Float, cast, func, select
+
+from .archive import iter_archived
+from .models import SensorDataReadable
+from .readings import EPOCH, fetch_tuples
+from .stats import is_numeric, parse_numeric
+
+# Number of seconds in each unit accepted by `parse_duration`
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# Julian day of 1970-01-01, used to convert stored datetimes to epoch seconds
+UNIX_EPOCH_JULIAN_DAY = 2440587.5
+
+# Default number of bins of the `histogram` operation
+DEFAULT_HISTOGRAM_BINS = 10
+
+# Ways of filling the time steps without readings of aligned series
+FILL_METHODS = ('none', 'ffill', 'linear')
+
+# Operations reducing the values to a single number
+SUMMARY_OPERATIONS = {
+    'count': len,
+    'mean': np.mean,
+    'min': np.min,
+    'max': np.max,
+    'std': np.std,
+}
+
+
+def parse_duration(text):
+    """ parse_duration
+
+    Parses a duration such as `90s`, `15m`, `2h` or `1d` into seconds.
+    """
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([smhd])', text.strip())
+    if not match:
+        raise ValueError(f'Invalid duration: {text!r}')
+    seconds = float(match.group(1)) * DURATION_UNITS[match.group(2)]
+    if seconds <= 0:
+        raise ValueError(f'Duration must be positive: {text!r}')
+    return seconds
+
+
+def epoch_seconds(column):
+    """ epoch_seconds
+
+    SQL expression converting a datetime column to epoch seconds.
+    """
+    return (func.julianday(column) - UNIX_EPOCH_JULIAN_DAY) * 86400.0
+
+
+def to_epoch_seconds(value):
+    """ to_epoch_seconds
+
+    Converts a naive datetime, assumed to be in UTC, to epoch seconds.
+    """
+    return (value - EPOCH).total_seconds()
+
+
+def select_series(sensor_id, datetime_from=None, datetime_to=None, limit=None):
+    """ select_series
+
+    Builds a SELECT statement of a sensor's numeric readings as
+    (epoch seconds, value) pairs in chronological order. Both columns are
+    computed by SQLite, so the rows can be converted to arrays without
+    parsing them in Python. Values that SQLite can't convert to a number, and
+    would cast to 0, are skipped.
+
+    Parameters:
+        sensor_id - id of the sensor
+        datetime_from - optional datetime the readings must be at or after
+        datetime_to - optional datetime the readings must be at or before
+        limit - optional maximum number of readings
+
+    Returns:
+        SELECT statement
+    """
+    value = cast(SensorDataReadable.value, Float)
+    statement = (select(epoch_seconds(SensorDataReadable.datetime), value)
+        .where(SensorDataReadable.sensor_id == sensor_id,
+               is_numeric(SensorDataReadable.value))
+        .order_by(SensorDataReadable.datetime, SensorDataReadable.id)
+        .limit(limit))
+    if datetime_from:
+        statement = statement.where(SensorDataReadable.datetime >= datetime_from)
+    if datetime_to:
+        statement = statement.where(SensorDataReadable.datetime <= datetime_to)
+    return statement
+
+
+def load_archived_series(session, sensor_ids, datetime_from=None, datetime_to=None):
+    """ load_archived_series
+
+    Decodes the numeric archived readings of sensors within an optional range.
+
+    Returns:
+        list of (sensor id, epoch seconds, value) tuples, ordered by sensor and datetime
+    """
+    series = []
+    for reading in iter_archived(session, sensor_ids, datetime_from, datetime_to):
+        number = parse_numeric(reading.value)
+        if number is not None:
+            series.append((reading.sensor_id, to_epoch_seconds(reading.datetime), number))
+    return series
+
+
+def merge_archived_series(rows, archived, max_rows, key):
+    """ merge_archived_series
+
+    Adds archived series tuples to the rows of a query, checking that the
+    merged series still holds at most `max_rows` readings.
+    """
+    if archived:
+        rows = sorted(itertools.chain(archived, rows), key=key)
+    if max_rows and len(rows) > max_rows:
+        raise ValueError(f'The range holds more than {max_rows} readings, '
+                         f'request a shorter range.')
+    return rows
+
+
+def load_series(session, sensor_id, datetime_from=None, datetime_to=None, max_rows=None):
+    """ load_series
+
+    Loads a sensor's numeric readings, including archived readings, into
+    NumPy arrays with a single query of the readings.
+
+    Parameters:
+        session - database session used for the query
+        sensor_id - id of the sensor
+        datetime_from - optional datetime the readings must be at or after
+        datetime_to - optional datetime the readings must be at or before
+        max_rows - optional maximum number of readings that can be loaded
+
+    Returns:
+        times - array of epoch seconds
+        values - array of values, the same length as `times`
+    """
+    limit = max_rows + 1 if max_rows else None
+    rows = fetch_tuples(
+        session, select_series(sensor_id, datetime_from, datetime_to, limit))
+    archived = load_archived_series(session, [sensor_id], datetime_from, datetime_to)
+    rows = merge_archived_series(rows, [row[1:] for row in archived], max_rows,
+                                 key=lambda row: row[0])
+
+    series = np.fromiter(itertools.chain.from_iterable(rows),
+                         dtype=float, count=2 * len(rows)).reshape(-1, 2)
+    # Julian day arithmetic is only accurate to tens of microseconds, so
+    # times are rounded to keep readings on window boundaries stable
+    return np.round(series[:, 0], 3), series[:, 1]
+
+
+def select_room_series(sensor_ids, datetime_from, datetime_to, limit=None):
+    """ select_room_series
+
+    Builds a SELECT statement of the numeric readings of several sensors, e.g.
+    the sensors of a room, as (sensor id, epoch seconds, value) rows. The rows
+    are ordered by sensor and datetime, the order of the (sensor_id, datetime)
+    index, so SQLite reads them with a single ordered index scan and no sorting.
+
+    Parameters:
+        sensor_ids - ids of the sensors
+        datetime_from - datetime the readings must be at or after
+        datetime_to - datetime the readings must be at or before
+        limit - optional maximum number of readings
+
+    Returns:
+        SELECT statement
+    """
+    value = cast(SensorDataReadable.value, Float)
+    return (select(SensorDataReadable.sensor_id,
+                   epoch_seconds(SensorDataReadable.datetime), value)
+            .where(SensorDataReadable.sensor_id.in_(sensor_ids),
+                   SensorDataReadable.datetime >= datetime_from,
+                   SensorDataReadable.datetime <= datetime_to,
+                   is_numeric(SensorDataReadable.value))
+            .order_by(SensorDataReadable.sensor_id, SensorDataReadable.datetime)
+            .limit(limit))
+
+
+def load_room_series(session, sensor_ids, datetime_from, datetime_to, max_rows=None):
+    """ load_room_series
+
+    Loads the numeric readings of several sensors, e.g. the sensors of a
+    room, into NumPy arrays with a single query. See `load_series`.
+
+    Returns:
+        sensor_ids - array of the sensor id of each reading
+        times - array of epoch seconds
+        values - array of values
+    """
+    limit = max_rows + 1 if max_rows else None
+    rows = fetch_tuples(
+        session, select_room_series(sensor_ids, datetime_from, datetime_to, limit))
+    archived = load_archived_series(session, sensor_ids, datetime_from, datetime_to)
+    rows = merge_archived_series(rows, archived, max_rows, key=lambda row: row[:2])
+
+    series = np.fromiter(itertools.chain.from_iterable(rows),
+                         dtype=float, count=3 * len(rows)).reshape(-1, 3)
+    return series[:, 0].astype(np.int64), np.round(series[:, 1], 3), series[:, 2]
+
+
+def time_axis(start, end, step, max_points=None):
+    """ time_axis
+
+    Returns the epoch seconds from `start` to at most `end`, `step` seconds apart.
+    """
+    points = int(np.floor(round((end - start) / step, 9))) + 1 if end >= start else 0
+    if max_points and points > max_points:
+        raise ValueError(f'The range holds more than {max_points} steps, '
+                         f'request a shorter range or a longer step.')
+    return start + np.arange(points) * step
+
+
+def fill_gaps(columns, method):
+    """ fill_gaps
+
+    Fills the NaN steps of each row of a matrix, either with the last value
+    before them (`ffill`) or by linear interpolation between the values
+    around them (`linear`). Steps before the first value, and for `linear`
+    after the last value, are left as NaN.
+    """
+    positions = np.arange(columns.shape[1])
+    valid = ~np.isnan(columns)
+    if method == 'ffill':
+        last = np.maximum.accumulate(np.where(valid, positions, -1), axis=1)
+        filled = np.take_along_axis(columns, np.maximum(last, 0), axis=1)
+        return np.where(last >= 0, filled, np.nan)
+    if method == 'linear':
+        filled = columns.copy()
+        for row, row_valid in zip(filled, valid):
+            if row_valid.any():
+                row[:] = np.interp(positions, positions[row_valid], row[row_valid],
+                                   left=np.nan, right=np.nan)
+        return filled
+    return columns
+
+
+def align_series(sensor_ids, times, values, columns, axis, step, fill='none'):
+    """ align_series
+
+    Resamples the readings of several sensors onto a shared time axis, by
+    merging the ordered readings with the ordered axis. Each step of the axis
+    holds the mean of a sensor's readings in [step time, step time + step).
+
+    Parameters:
+        sensor_ids - array of the sensor id of each reading
+        times - array of epoch seconds
+        values - array of values
+        columns - sorted list of the sensor ids to return a column for, which
+            must include the sensor id of every reading
+        axis - array of the epoch seconds of each step
+        step - number of seconds between steps
+        fill - 'none', 'ffill' or 'linear', see `fill_gaps`
+
+    Returns:
+        matrix of the aligned values, with a row per sensor in `columns`
+    """
+    if not len(axis):
+        return np.empty((len(columns), 0))
+    rows = np.searchsorted(np.asarray(columns), sensor_ids)
+    steps = np.searchsorted(axis, times, side='right') - 1
+    inside = (steps >= 0) & (times < axis[-1] + step)
+    cells = rows[inside] * len(axis) + steps[inside]
+    size = len(columns) * len(axis)
+    counts = np.bincount(cells, minlength=size)
+    totals = np.bincount(cells, weights=values[inside], minlength=size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = (totals / counts).reshape(len(columns), len(axis))
+    return fill_gaps(means, fill)
+
+
+def window_starts(times, window):
+    """ window_starts
+
+    Returns the index of the first reading of the time window (t - window, t]
+    ending at every reading.
+    """
+    return np.searchsorted(times, times - window, side='right')
+
+
+def window_sums(values, starts):
+    """ window_sums
+
+    Sums the values of every window using cumulative sums, so the cost doesn't
+    depend on the window size.
+    """
+    cumulative = np.concatenate(([0.0], np.cumsum(values)))
+    return cumulative[1:] - cumulative[starts]
+
+
+def rolling_mean(times, values, window):
+    """ rolling_mean
+
+    Mean of the readings in the time window ending at every reading.
+    """
+    starts = window_starts(times, window)
+    counts = np.arange(1, len(times) + 1) - starts
+    return times, window_sums(values, starts) / counts
+
+
+def rolling_std(times, values, window):
+    """ rolling_std
+
+    Population standard deviation of the readings in the time window ending
+    at every reading.
+    """
+    starts = window_starts(times, window)
+    counts = np.arange(1, len(times) + 1) - starts
+    # Centering the values first reduces the cancellation of sum-of-squares
+    centered = values - values.mean() if len(values) else values
+    means = window_sums(centered, starts) / counts
+    variances = window_sums(centered ** 2, starts) / counts - means ** 2
+    return times, np.sqrt(np.maximum(variances, 0.0))
+
+
+def rate(times, values):
+    """ rate
+
+    Change of the value per second between consecutive readings, at the time
+    of the later reading. Readings sharing a timestamp are skipped.
+    """
+    elapsed = np.diff(times)
+    valid = elapsed > 0
+    return times[1:][valid], np.diff(values)[valid] / elapsed[valid]
+
+
+def histogram(values, bins):
+    """ histogram
+
+    Counts the values falling into `bins` equally wide bins.
+    """
+    counts, edges = np.histogram(values, bins=bins)
+    return {"counts": counts.tolist(), "edges": edges.tolist()}
+
+
+def scalar(value):
+    """ scalar
+
+    Converts a NumPy scalar to a JSON serializable number, or None if it isn't finite.
+    """
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+def format_times(times, epoch):
+    """ format_times
+
+    Serializes an array of epoch seconds, either as integers or as datetime strings.
+    """
+    seconds = np.round(times).astype(np.int64)
+    if epoch:
+        return seconds.tolist()
+    formatted = seconds.astype('datetime64[s]').astype(str)
+    return np.char.replace(formatted, 'T', ' ').tolist()
+
+
+def values_json(values):
+    """ values_json
+
+    Serializes an array of values, with null for values that aren't finite.
+    """
+    finite = np.isfinite(values)
+    return values.tolist() if finite.all() else np.where(finite, values, None).tolist()
+
+
+def series_json(times, values, epoch):
+    """ series_json
+
+    Serializes arrays of epoch seconds and values as a series of datetimes and values.
+    """
+    return {
+        "datetime": format_times(times, epoch),
+        "value": values_json(values),
+    }
+
+
+def parse_ops(text, max_bins=None):
+    """ parse_ops
+
+    Parses a comma separated list of operations with optional arguments,
+    e.g. `rolling_mean:15m,p95,rate`, validating their names and arguments.
+    Histograms may have at most `max_bins` bins.
+
+    Returns:
+        list of (name, argument) pairs, where argument may be None
+    """
+    ops = []
+    for item in filter(None, (item.strip() for item in text.split(','))):
+        name, _, argument = item.partition(':')
+        argument = argument or None
+        if name in ('rolling_mean', 'rolling_std'):
+            if argument is None:
+                raise ValueError(f'{name} requires a window, e.g. {name}:15m')
+            parse_duration(argument)
+        elif name == 'histogram':
+            if argument is not None and not (argument.isdigit() and int(argument) > 0):
+                raise ValueError(f'Invalid number of histogram bins: {argument!r}')
+            if argument is not None and max_bins and int(argument) > max_bins:
+                raise ValueError(f'Histograms have at most {max_bins} bins.')
+        elif re.fullmatch(r'p(\d{1,2}(\.\d+)?|100)', name):
+            if argument is not None:
+                raise ValueError(f'{name} doesn\'t take an argument')
+        elif name not in SUMMARY_OPERATIONS and name != 'rate':
+            raise ValueError(f'Unknown operation: {name!r}')
+        ops.append((name, argument))
+    if not ops:
+        raise ValueError('At least one operation is required.')
+    return ops
+
+
+def compute_analytics(ops, times, values, epoch=False):
+    """ compute_analytics
+
+    Computes each operation over arrays of a sensor's readings:
+        count, mean, min, max, std - summary statistics
+        p<N> - Nth percentile, e.g. p95
+        rolling_mean:<window>, rolling_std:<window> - statistics of the time
+            window ending at every reading, e.g. rolling_mean:15m
+        rate - change of the value per second between consecutive readings
+        histogram[:<bins>] - counts of the values in equally wide bins
+
+    Parameters:
+        ops - list of (name, argument) pairs from `parse_ops`
+        times - array of epoch seconds
+        values - array of values
+        epoch - whether series datetimes are serialized as epoch seconds
+
+    Returns:
+        dictionary mapping each operation, as requested, to its result
+    """
+    results = {}
+    for name, argument in ops:
+        key = f'{name}:{argument}' if argument else name
+        if name == 'count':
+            results[key] = len(values)
+        elif not len(values):
+            results[key] = None
+        elif name in SUMMARY_OPERATIONS:
+            results[key] = scalar(SUMMARY_OPERATIONS[name](values))
+        elif name.startswith('p'):
+            results[key] = scalar(np.percentile(values, float(name[1:])))
+        elif name == 'rolling_mean':
+            results[key] = series_json(
+                *rolling_mean(times, values, parse_duration(argument)), epoch)
+        elif name == 'rolling_std':
+            results[key] = series_json(
+                *rolling_std(times, values, parse_duration(argument)), epoch)
+        elif name == 'rate':
+            results[key] = series_json(*rate(times, values), epoch)
+        elif name == 'histogram':
+            results[key] = histogram(values, int(argument or DEFAULT_HISTOGRAM_BINS))
+    return results
@@ -0,0 +1,708 @@
+import datetime
+import itertools
+import json
+import re
+import struct
+import sys
+import zlib
+from array import array
+from collections import namedtuple
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import and_, delete, exists, func, or_, select, text, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .database import db_session
+from .models import Sensor, SensorDataBlock, SensorDataReadable
+from .readings import EPOCH, READING_COLUMNS, reading_to_json
+
+# Version of the payload format, stored in the first byte of every payload
+PAYLOAD_FORMAT = 1
+
+# How the values of a block are encoded. Values are stored as text, so they
+# are only encoded as integer deltas of scaled decimals when every value of
+# the block is a decimal with the same number of places that formats back
+# to exactly the same text, e.g. '21.50'.
+TEXT_VALUES = 0
+DECIMAL_VALUES = 1
+DECIMAL_PATTERN = re.compile(r'-?(0|[1-9][0-9]{0,14})(\.[0-9]{1,6})?$')
+
+# Bound on the magnitude of scaled decimals, so that they and the deltas
+# between them, at most 2 * 10 ** 18, fit in 64 bit integers
+DECIMAL_LIMIT = 10 ** 18
+
+# Format version, value encoding, decimal places and number of readings
+HEADER = struct.Struct('<BBBI')
+
+# Blocks are written once and read many times, so they're compressed hard
+COMPRESSION_LEVEL = 9
+
+# Number of blocks written per transaction by `archive_readings`
+BLOCKS_PER_TRANSACTION = 100
+
+# Number of blocks read at a time when streaming archived readings
+STREAM_BATCH_SIZE = 100
+
+# Reading decoded from a block, with the fields of READING_COLUMNS
+ArchivedReading = namedtuple('ArchivedReading', ['id', 'sensor_id', 'value', 'units', 'datetime'])
+
+
+def window_start(dtime, window):
+    """ window_start
+
+    Returns the start of the window of length `window` holding a datetime,
+    with windows aligned to the epoch.
+    """
+    return EPOCH + (dtime - EPOCH) // window * window
+
+
+def to_micros(delta):
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def delta_encode(numbers):
+    """ delta_encode
+
+    Returns the differences between consecutive integers, the first relative
+    to 0, as little endian bytes of 64 bit integers.
+    """
+    deltas = array('q')
+    previous = 0
+    for number in numbers:
+        deltas.append(number - previous)
+        previous = number
+    if sys.byteorder != 'little':
+        deltas.byteswap()
+    return deltas.tobytes()
+
+
+def delta_decode(data, offset, count):
+    """ delta_decode
+
+    Reads `count` delta encoded integers from `data` at `offset`.
+
+    Returns:
+        list of the integers
+    """
+    deltas = array('q')
+    deltas.frombytes(data[offset:offset + count * deltas.itemsize])
+    if sys.byteorder != 'little':
+        deltas.byteswap()
+    return list(itertools.accumulate(deltas))
+
+
+def format_decimal(number, decimals):
+    """ format_decimal
+
+    Formats an integer scaled by 10 ** `decimals` as a decimal, e.g. 2150 with
+    2 places as '21.50'.
+    """
+    sign = '-' if number < 0 else ''
+    digits = str(abs(number)).rjust(decimals + 1, '0')
+    if not decimals:
+        return sign + digits
+    return f'{sign}{digits[:-decimals]}.{digits[-decimals:]}'
+
+
+def decimal_places(values):
+    """ decimal_places
+
+    Returns the number of decimal places shared by every value, if each
+    value can be stored as a scaled integer below DECIMAL_LIMIT and
+    formatted back to the same text, otherwise None.
+    """
+    decimals = None
+    for value in values:
+        if not DECIMAL_PATTERN.match(value):
+            return None
+        _, _, fraction = value.partition('.')
+        if decimals is None:
+            decimals = len(fraction)
+        number = int(value.replace('.', ''))
+        if len(fraction) != decimals or abs(number) >= DECIMAL_LIMIT or \
+                format_decimal(number, decimals) != value:
+            return None
+    return decimals
+
+
+def encode_block(readings, start):
+    """ encode_block
+
+    Packs readings into a compressed payload. Ids, and datetimes as
+    microseconds from the start of the block, are delta encoded, as are the
+    values when they're decimals. Units are run-length encoded.
+
+    Parameters:
+        readings - readings with `id`, `value`, `units` and `datetime` fields,
+                   in chronological order
+        start - start of the block's window
+
+    Returns:
+        bytes of the payload
+    """
+    values = [reading.value for reading in readings]
+    decimals = decimal_places(values)
+    parts = [
+        HEADER.pack(PAYLOAD_FORMAT, TEXT_VALUES if decimals is None else DECIMAL_VALUES,
+                    decimals or 0, len(readings)),
+        delta_encode(reading.id for reading in readings),
+        delta_encode(to_micros(reading.datetime - start) for reading in readings),
+    ]
+    text = {'units': [[units, len(list(group))] for units, group in
+                      itertools.groupby(reading.units for reading in readings)]}
+    if decimals is None:
+        text['values'] = values
+    else:
+        parts.append(delta_encode(int(value.replace('.', '')) for value in values))
+    parts.append(json.dumps(text, separators=(',', ':')).encode())
+    return zlib.compress(b''.join(parts), COMPRESSION_LEVEL)
+
+
+def decode_block(sensor_id, start, payload):
+    """ decode_block
+
+    Unpacks the readings of a block.
+
+    Parameters:
+        sensor_id - id of the block's sensor
+        start - start of the block's window
+        payload - bytes of the payload
+
+    Returns:
+        list of ArchivedReading in chronological order
+    """
+    data = zlib.decompress(payload)
+    version, encoding, decimals, count = HEADER.unpack_from(data)
+    if version != PAYLOAD_FORMAT:
+        raise ValueError(f'Unsupported block format {version}')
+
+    offset = HEADER.size
+    ids = delta_decode(data, offset, count)
+    offset += count * 8
+    micros = delta_decode(data, offset, count)
+    offset += count * 8
+    if encoding == DECIMAL_VALUES:
+        values = [format_decimal(number, decimals)
+                  for number in delta_decode(data, offset, count)]
+        offset += count * 8
+    text = json.loads(data[offset:])
+    if encoding == TEXT_VALUES:
+        values = text['values']
+    units = itertools.chain.from_iterable(
+        itertools.repeat(name, length) for name, length in text['units'])
+
+    return [ArchivedReading(id, sensor_id, value, unit,
+                            start + datetime.timedelta(microseconds=micro))
+            for id, value, unit, micro in zip(ids, values, units, micros)]
+
+
+def block_fields(readings, start):
+    """ block_fields
+
+    Returns the fields of a block holding readings, other than its sensor and
+    window: the number of readings, the range of their ids and the payload.
+    """
+    ids = [reading.id for reading in readings]
+    return {'count': len(readings), 'first_id': min(ids), 'last_id': max(ids),
+            'payload': encode_block(readings, start)}
+
+
+def write_block(session, block_id, start, readings):
+    """ write_block
+
+    Rewrites a block with the given readings, deleting it when none are left.
+    """
+    if readings:
+        session.execute(update(SensorDataBlock)
+                        .where(SensorDataBlock.id == block_id)
+                        .values(**block_fields(readings, start)))
+    else:
+        session.execute(delete(SensorDataBlock).where(SensorDataBlock.id == block_id))
+
+
+def in_range(reading, datetime_from, datetime_to):
+    return ((datetime_from is None or reading.datetime >= datetime_from)
+            and (datetime_to is None or reading.datetime <= datetime_to))
+
+
+def block_condition(sensor_ids=None, datetime_from=None, datetime_to=None):
+    """ block_condition
+
+    SQL condition selecting the blocks of a sensor id, or of a collection of
+    sensor ids or statement selecting them, that overlap an optional
+    datetime range.
+    """
+    conditions = []
+    if isinstance(sensor_ids, int):
+        conditions.append(SensorDataBlock.sensor_id == sensor_ids)
+    elif sensor_ids is not None:
+        conditions.append(SensorDataBlock.sensor_id.in_(sensor_ids))
+    if datetime_to:
+        conditions.append(SensorDataBlock.start <= datetime_to)
+    if datetime_from:
+        conditions.append(SensorDataBlock.end > datetime_from)
+    return and_(True, *conditions)
+
+
+def iter_archived(session, sensor_ids=None, datetime_from=None, datetime_to=None):
+    """ iter_archived
+
+    Streams the archived readings within an optional datetime range, block by
+    block, so that memory use doesn't grow with the size of the archive.
+
+    Parameters:
+        session - database session used for the query
+        sensor_ids - optional collection of sensor ids, or statement selecting them
+        datetime_from - datetime object representing the time 'from'
+        datetime_to - datetime object representing the time 'to'
+
+    Returns:
+        iterator of ArchivedReading, ordered by sensor and datetime
+    """
+    statement = (select(SensorDataBlock.sensor_id, SensorDataBlock.start,
+                        SensorDataBlock.payload)
+                 .where(block_condition(sensor_ids, datetime_from, datetime_to))
+                 .order_by(SensorDataBlock.sensor_id, SensorDataBlock.start)
+                 .execution_options(yield_per=STREAM_BATCH_SIZE))
+    for sensor_id, start, payload in session.execute(statement):
+        for reading in decode_block(sensor_id, start, payload):
+            if in_range(reading, datetime_from, datetime_to):
+                yield reading
+
+
+def unique_readings(readings):
+    """ unique_readings
+
+    Drops the readings of a sensor, sorted by datetime and id, that duplicate
+    an earlier reading at the same datetime, keeping the earliest write as
+    ingestion does.
+    """
+    return [reading for previous, reading in zip(itertools.chain([None], readings), readings)
+            if previous is None or previous.datetime != reading.datetime]
+
+
+def merge_readings(rows, archived, limit=None):
+    """ merge_readings
+
+    Merges a sensor's reading rows with its archived readings in chronological
+    order, keeping the latest `limit` readings when a limit is given. Readings
+    written again after they were archived are only returned once.
+    """
+    if not archived:
+        return rows
+    merged = unique_readings(sorted(itertools.chain(rows, archived),
+                                    key=lambda reading: (reading.datetime, reading.id)))
+    return merged[-limit:] if limit else merged
+
+
+def archived_keys(session, readings):
+    """ archived_keys
+
+    Finds the readings that a sensor already has an archived reading for at
+    the same datetime. Only the blocks of the readings' sensors overlapping
+    their datetimes are decoded, and new readings are usually more recent
+    than any block.
+
+    Parameters:
+        session - database session used for the query
+        readings - list of dictionaries of the readings' fields
+
+    Returns:
+        set of the (sensor id, datetime) pairs of the archived readings
+    """
+    keys = {(reading['sensor_id'], reading['datetime']) for reading in readings}
+    if not keys:
+        return set()
+    datetimes = [dtime for _, dtime in keys]
+    archived = set()
+    for sensor_id, start, payload in session.execute(
+            select(SensorDataBlock.sensor_id, SensorDataBlock.start, SensorDataBlock.payload)
+            .where(block_condition(sorted({sensor_id for sensor_id, _ in keys}),
+                                   min(datetimes), max(datetimes)))):
+        archived.update(key for key in ((sensor_id, reading.datetime) for reading
+                                        in decode_block(sensor_id, start, payload))
+                        if key in keys)
+    return archived
+
+
+def archived_sensor_ids(session, datetime_from=None, datetime_to=None):
+    """ archived_sensor_ids
+
+    Returns the ids of the sensors with archived readings within an optional
+    datetime range. Blocks lying within the range hold such readings, so
+    only the blocks overlapping its ends are decoded.
+    """
+    sensor_ids = set()
+    for sensor_id, start, end, payload in session.execute(
+            select(SensorDataBlock.sensor_id, SensorDataBlock.start, SensorDataBlock.end,
+                   SensorDataBlock.payload)
+            .where(block_condition(None, datetime_from, datetime_to))):
+        if sensor_id in sensor_ids:
+            continue
+        if ((datetime_from is None or start >= datetime_from)
+                and (datetime_to is None or end <= datetime_to)
+                or any(in_range(reading, datetime_from, datetime_to)
+                       for reading in decode_block(sensor_id, start, payload))):
+            sensor_ids.add(sensor_id)
+    return sensor_ids
+
+
+def archived_to_json(reading, sensor_name):
+    """ archived_to_json
+
+    Serializes an archived reading to the same JSON object as
+    `SensorDataReadable.to_json`.
+    """
+    return dict(reading_to_json(reading), sensor=sensor_name, sensor_id=reading.sensor_id)
+
+
+def merge_archived_by_sensor(session, grouped, sensor_ids=None, datetime_from=None,
+                             datetime_to=None):
+    """ merge_archived_by_sensor
+
+    Adds the archived readings within a range to readings grouped by sensor.
+    See `api.readings.query_readings_by_sensor`.
+
+    Returns:
+        dictionary mapping sensor ids to lists of readings
+    """
+    archived = {}
+    for reading in iter_archived(session, sensor_ids, datetime_from, datetime_to):
+        archived.setdefault(reading.sensor_id, []).append(reading)
+    for sensor_id, readings in archived.items():
+        grouped[sensor_id] = merge_readings(grouped.get(sensor_id, []), readings)
+    return grouped
+
+
+def merge_archived_ranges(session, specs, results):
+    """ merge_archived_ranges
+
+    Adds the archived readings of (sensor, range, limit) specifications to
+    the readings queried for them, using a single query for the blocks. See
+    `api.readings.query_reading_ranges`.
+
+    Returns:
+        list containing a list of readings for each spec, in chronological order
+    """
+    ranges = []
+    for spec, rows in zip(specs, results):
+        datetime_from = spec.get('datetime_from')
+        limit = spec.get('limit')
+        if limit and len(rows) >= limit:
+            # Only archived readings at or after the oldest reading found can
+            # be among the latest `limit`
+            datetime_from = max(filter(None, (datetime_from, rows[0].datetime)))
+        ranges.append((spec['sensor_id'], datetime_from, spec.get('datetime_to')))
+
+    blocks = session.execute(
+        select(SensorDataBlock.sensor_id, SensorDataBlock.start, SensorDataBlock.end,
+               SensorDataBlock.payload)
+        .where(or_(*(block_condition(*spec_range) for spec_range in ranges)))
+        .order_by(SensorDataBlock.sensor_id, SensorDataBlock.start)).all()
+    if not blocks:
+        return results
+
+    decoded = {}
+    merged = []
+    for (sensor_id, datetime_from, datetime_to), spec, rows in zip(ranges, specs, results):
+        archived = []
+        for block in blocks:
+            if block.sensor_id != sensor_id or \
+                    (datetime_to and block.start > datetime_to) or \
+                    (datetime_from and block.end <= datetime_from):
+                continue
+            key = (block.sensor_id, block.start)
+            if key not in decoded:
+                decoded[key] = decode_block(block.sensor_id, block.start, block.payload)
+            archived.extend(reading for reading in decoded[key]
+                            if in_range(reading, datetime_from, datetime_to))
+        merged.append(merge_readings(rows, archived, spec.get('limit')))
+    return merged
+
+
+def select_id_blocks(id):
+    """ select_id_blocks
+
+    Builds a SELECT statement of the blocks whose range of ids holds an id.
+    """
+    return (select(SensorDataBlock.id, SensorDataBlock.sensor_id, SensorDataBlock.start,
+                   SensorDataBlock.payload)
+            .where(SensorDataBlock.first_id <= id, SensorDataBlock.last_id >= id))
+
+
+def find_archived(session, id):
+    """ find_archived
+
+    Finds an archived reading by id. Only the blocks whose range of ids
+    holds the id are decoded.
+
+    Returns:
+        ArchivedReading, or None if no archived reading has the id
+    """
+    for _, sensor_id, start, payload in session.execute(select_id_blocks(id)):
+        for reading in decode_block(sensor_id, start, payload):
+            if reading.id == id:
+                return reading
+    return None
+
+
+def delete_archived_reading(session, id):
+    """ delete_archived_reading
+
+    Deletes an archived reading by id, rewriting its block without it.
+
+    Returns:
+        the deleted ArchivedReading, or None if no archived reading has the id
+    """
+    for block_id, sensor_id, start, payload in session.execute(select_id_blocks(id)).all():
+        readings = decode_block(sensor_id, start, payload)
+        kept = [reading for reading in readings if reading.id != id]
+        if len(kept) < len(readings):
+            write_block(session, block_id, start, kept)
+            return next(reading for reading in readings if reading.id == id)
+    return None
+
+
+def delete_archived(session, sensor_id, datetime_from=None, datetime_to=None):
+    """ delete_archived
+
+    Deletes the archived readings of a sensor within an optional datetime
+    range. Blocks lying within the range are deleted without being decoded,
+    and only the blocks overlapping its ends are rewritten.
+
+    Returns:
+        number of deleted readings
+    """
+    condition = block_condition(sensor_id, datetime_from, datetime_to)
+    # A block's readings are before its end, so blocks ending at or before
+    # the end of the range lie within it
+    within = and_(condition,
+                  SensorDataBlock.start >= datetime_from if datetime_from else True,
+                  SensorDataBlock.end <= datetime_to if datetime_to else True)
+    deleted = session.scalar(select(func.coalesce(func.sum(SensorDataBlock.count), 0))
+                             .where(within))
+    session.execute(delete(SensorDataBlock).where(within))
+
+    for block_id, start, payload in session.execute(
+            select(SensorDataBlock.id, SensorDataBlock.start, SensorDataBlock.payload)
+            .where(condition)).all():
+        readings = decode_block(sensor_id, start, payload)
+        kept = [reading for reading in readings
+                if not in_range(reading, datetime_from, datetime_to)]
+        if len(kept) < len(readings):
+            write_block(session, block_id, start, kept)
+            deleted += len(readings) - len(kept)
+    session.commit()
+    return deleted
+
+
+def convert_values(session, values, scale, offset):
+    """ convert_values
+
+    Converts values with `api.bulk.scale_values`, in SQL, so that archived
+    readings are converted exactly as the readings in the table are.
+
+    Returns:
+        list of the converted values, or None for values that aren't numbers
+    """
+    from .bulk import scale_values
+    from .stats import is_numeric
+    table = func.json_each(json.dumps(values)).table_valued('key', 'value')
+    converted = [None] * len(values)
+    for key, value, numeric in session.execute(
+            select(table.c.key, scale_values(scale, offset, table.c.value),
+                   is_numeric(table.c.value))):
+        if numeric:
+            converted[key] = value
+    return converted
+
+
+def update_archived(session, sensor_id, datetime_from, datetime_to, changes):
+    """ update_archived
+
+    Applies the changes of a PATCH request for sensor data to the archived
+    readings of a sensor within an optional datetime range, rewriting only
+    the blocks holding readings that change. See `api.routes.ListAPI.patch`.
+
+    Parameters:
+        session - database session used for the update
+        sensor_id - id of the sensor
+        datetime_from - datetime object representing the time 'from'
+        datetime_to - datetime object representing the time 'to'
+        changes - dictionary with optional `value`, `units`, `scale` and
+                  `offset` keys
+
+    Returns:
+        number of updated readings
+    """
+    scaled = 'scale' in changes or 'offset' in changes
+    # Converted values replace the values, see `api.bulk.scale_values`
+    replaced = {key: changes[key] for key in (('units',) if scaled else ('value', 'units'))
+                if key in changes}
+    updated = 0
+    for block_id, start, payload in session.execute(
+            select(SensorDataBlock.id, SensorDataBlock.start, SensorDataBlock.payload)
+            .where(block_condition(sensor_id, datetime_from, datetime_to))).all():
+        readings = decode_block(sensor_id, start, payload)
+        indexes = [index for index, reading in enumerate(readings)
+                   if in_range(reading, datetime_from, datetime_to)]
+        if not indexes:
+            continue
+        if scaled:
+            converted = convert_values(session, [readings[index].value for index in indexes],
+                                       changes.get('scale', 1), changes.get('offset', 0))
+        changed = 0
+        for position, index in enumerate(indexes):
+            fields = dict(replaced)
+            if scaled:
+                if converted[position] is not None:
+                    fields['value'] = converted[position]
+                elif 'units' not in changes:
+                    # Only the readings that are converted count as updated
+                    continue
+            readings[index] = readings[index]._replace(**fields)
+            changed += 1
+        if changed:
+            write_block(session, block_id, start, readings)
+            updated += changed
+    session.commit()
+    return updated
+
+
+def has_stable_ids(session):
+    """ has_stable_ids
+
+    Returns whether the sensor data table never reuses the ids of deleted
+    rows, which archived readings rely on to keep their ids.
+    """
+    definition = session.scalar(
+        text('SELECT sql FROM sqlite_master WHERE type = :type AND name = :name'),
+        {'type': 'table', 'name': SensorDataReadable.__tablename__})
+    return definition is not None and 'AUTOINCREMENT' in definition.upper()
+
+
+def archive_sensor(session, sensor_id, cutoff, window):
+    """ archive_sensor
+
+    Packs a sensor's readings before `cutoff` into one block per window,
+    merging them into existing blocks of the same windows.
+
+    Returns:
+        number of blocks written
+    """
+    written = 0
+    while True:
+        first = session.scalar(
+            select(func.min(SensorDataReadable.datetime))
+            .where(SensorDataReadable.sensor_id == sensor_id,
+                   SensorDataReadable.datetime < cutoff))
+        if first is None:
+            break
+        start = window_start(first, window)
+        end = start + window
+        # Deleting with RETURNING archives exactly the rows that are removed
+        readings = session.execute(
+            delete(SensorDataReadable)
+            .where(SensorDataReadable.sensor_id == sensor_id,
+                   SensorDataReadable.datetime >= start,
+                   SensorDataReadable.datetime < end)
+            .returning(*READING_COLUMNS)
+            .execution_options(synchronize_session=False)).all()
+        existing = session.scalar(
+            select(SensorDataBlock.payload)
+            .where(SensorDataBlock.sensor_id == sensor_id, SensorDataBlock.start == start))
+        if existing is not None:
+            readings += decode_block(sensor_id, start, existing)
+        readings.sort(key=lambda reading: (reading.datetime, reading.id))
+        readings = unique_readings(readings)
+
+        fields = block_fields(readings, start)
+        statement = sqlite_insert(SensorDataBlock).values(
+            sensor_id=sensor_id, start=start, end=end, **fields)
+        session.execute(statement.on_conflict_do_update(
+            index_elements=[SensorDataBlock.sensor_id, SensorDataBlock.start],
+            set_={name: statement.excluded[name] for name in ['end', *fields]}))
+        written += 1
+        if written % BLOCKS_PER_TRANSACTION == 0:
+            session.commit()
+    session.commit()
+    return written
+
+
+def archive_readings(session, cutoff, window, keep=None):
+    """ archive_readings
+
+    Packs the readings in windows that closed before `cutoff` into blocks of
+    one window per sensor, committing every BLOCKS_PER_TRANSACTION blocks.
+
+    Parameters:
+        session - database session used for archiving
+        cutoff - datetime before which readings are archived
+        window - timedelta of the windows of the blocks
+        keep - optional timedelta before each sensor's latest reading that
+               isn't archived, e.g. the window of the hot tier
+
+    Returns:
+        number of blocks written
+    """
+    cutoff = window_start(cutoff, window)
+    sensor_ids = session.scalars(
+        select(Sensor.id)
+        .where(exists().where(SensorDataReadable.sensor_id == Sensor.id,
+                              SensorDataReadable.datetime < cutoff))
+        .order_by(Sensor.id)).all()
+
+    written = 0
+    for sensor_id in sensor_ids:
+        sensor_cutoff = cutoff
+        if keep:
+            latest = session.scalar(
+                select(func.max(SensorDataReadable.datetime))
+                .where(SensorDataReadable.sensor_id == sensor_id))
+            sensor_cutoff = min(cutoff, window_start(latest - keep, window))
+        written += archive_sensor(session, sensor_id, sensor_cutoff, window)
+    return written
+
+
+@click.command('archive_readings')
+@with_appcontext
+@click.option('--older-than', default=30, show_default=True, type=click.IntRange(min=1),
+              help='Archive readings older than this many days')
+@click.option('--window', default=1, show_default=True, type=click.IntRange(min=1),
+              help='Number of hours of a sensor\'s readings packed into each block')
+def archive_readings_command(older_than, window):
+    """ archive_readings
+
+    Packs readings older than `older_than` days into compressed blocks of
+    `window` hours per sensor. Readings within the hot tier's window of each
+    sensor's latest reading are never archived.
+
+    Parameters:
+        older_than - number of days after which readings are archived
+        window - number of hours of readings per block
+    """
+    if not has_stable_ids(db_session):
+        raise click.ClickException(
+            'The sensor_data_readable table of this database was created without '
+            'AUTOINCREMENT, so it can reuse the ids of archived readings.')
+
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    hot_tier_hours = current_app.config['HOT_TIER_HOURS']
+    written = archive_readings(
+        db_session, now - datetime.timedelta(days=older_than),
+        datetime.timedelta(hours=window),
+        datetime.timedelta(hours=hot_tier_hours) if hot_tier_hours else None)
+    click.echo(f'Wrote {written} blocks of archived readings.')
+
+
+def init_app(app):
+    """ init_app
+
+    Parameters:
+        app - Flask app instance
+
+    Registers the `archive_readings_command` with the application.
+    """
+    app.cli.add_command(archive_readings_command)
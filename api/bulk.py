@@ -0,0 +1,264 @@
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import (Float, Integer, String, and_, case, cast, delete, exists,
+                        select, text, update)
+
+from .archive import decode_block, unique_readings, write_block
+from .database import db_session
+from .models import SensorDataBlock, SensorDataReadable
+from .stats import is_numeric, refresh_sensor_stats
+
+# Unique index that keeps a sensor to one reading per datetime
+READINGS_KEY_INDEX = 'ix_sensor_data_readable_sensor_id_datetime'
+
+
+def delete_readings_in_chunks(session, condition, chunk_size, on_progress=None):
+    """ delete_readings_in_chunks
+
+    Deletes the sensor data matching `condition` with set-based DELETE
+    statements of at most `chunk_size` rows, committing after each chunk so
+    that no single transaction holds the write lock for long.
+
+    Parameters:
+        session - database session used for the deletes
+        condition - SQL expression selecting the readings to delete
+        chunk_size - maximum number of rows deleted per transaction
+        on_progress - optional callback receiving the number of rows deleted per chunk
+
+    Returns:
+        total number of deleted rows
+    """
+    total = 0
+    while True:
+        chunk = (select(SensorDataReadable.id)
+                 .where(condition)
+                 .limit(chunk_size)
+                 .scalar_subquery())
+        result = session.execute(
+            delete(SensorDataReadable)
+            .where(SensorDataReadable.id.in_(chunk))
+            .execution_options(synchronize_session=False))
+        session.commit()
+
+        total += result.rowcount
+        if on_progress:
+            on_progress(result.rowcount)
+        if result.rowcount < chunk_size:
+            return total
+
+
+def update_readings_in_chunks(session, condition, values, chunk_size):
+    """ update_readings_in_chunks
+
+    Updates the sensor data matching `condition` with set-based UPDATE
+    statements covering at most `chunk_size` rows each, walking the matching
+    rows in id order and committing after each chunk.
+
+    Parameters:
+        session - database session used for the updates
+        condition - SQL expression selecting the readings to update
+        values - dictionary of column names to new values or SQL expressions
+        chunk_size - maximum number of rows updated per transaction
+
+    Returns:
+        total number of updated rows
+    """
+    total = 0
+    previous_id = 0
+    while True:
+        # Id of the last row in the next chunk, or None if fewer rows remain
+        last_id = session.scalar(
+            select(SensorDataReadable.id)
+            .where(condition, SensorDataReadable.id > previous_id)
+            .order_by(SensorDataReadable.id)
+            .offset(chunk_size - 1)
+            .limit(1))
+
+        chunk_condition = [condition, SensorDataReadable.id > previous_id]
+        if last_id is not None:
+            chunk_condition.append(SensorDataReadable.id <= last_id)
+        result = session.execute(
+            update(SensorDataReadable)
+            .where(*chunk_condition)
+            .values(values)
+            .execution_options(synchronize_session=False))
+        session.commit()
+
+        total += result.rowcount
+        if last_id is None:
+            return total
+        previous_id = last_id
+
+
+def scale_values(scale, offset, value=SensorDataReadable.value):
+    """ scale_values
+
+    Builds the SQL expression converting numeric values to `value * scale + offset`.
+    Integer values whose converted value is whole stay integers, e.g. '10'
+    scaled by 1.5 becomes '15' rather than '15.0', and values that aren't
+    numbers, see `api.stats.is_numeric`, are kept, e.g. 'v2'.
+
+    Parameters:
+        scale - number the values are multiplied by
+        offset - number added to the scaled values
+        value - text column of the values, by default of sensor data
+
+    Returns:
+        SQL expression of the new values
+    """
+    number = cast(value, Float) * scale + offset
+    whole = cast(number, Integer)
+    return case(
+        (~is_numeric(value), value),
+        (and_(~value.op('GLOB', is_comparison=True)('*[.eE]*'), number == whole),
+         cast(whole, String)),
+        else_=cast(number, String))
+
+
+def is_duplicate_reading():
+    """ is_duplicate_reading
+
+    SQL expression selecting the readings for which the same sensor has an
+    earlier reading at the same datetime, probing the (sensor_id, datetime)
+    index once per reading.
+    """
+    earlier = SensorDataReadable.__table__.alias('earlier')
+    return exists().where(earlier.c.sensor_id == SensorDataReadable.sensor_id,
+                          earlier.c.datetime == SensorDataReadable.datetime,
+                          earlier.c.id < SensorDataReadable.id)
+
+
+def ensure_unique_readings_index(session):
+    """ ensure_unique_readings_index
+
+    Replaces the (sensor_id, datetime) index of databases created before it
+    was unique. The readings must not contain duplicates.
+
+    Returns:
+        whether the index was replaced
+    """
+    table = SensorDataReadable.__tablename__
+    indexes = {row[1]: row[2] for row in
+               session.execute(text(f"PRAGMA index_list('{table}')"))}
+    if indexes.get(READINGS_KEY_INDEX):
+        return False
+
+    index = next(index for index in SensorDataReadable.__table__.indexes
+                 if index.name == READINGS_KEY_INDEX)
+    session.execute(text(f'DROP INDEX IF EXISTS {READINGS_KEY_INDEX}'))
+    index.create(bind=session.connection())
+    session.commit()
+    return True
+
+
+def dedupe_archived_readings(session, chunk_size):
+    """ dedupe_archived_readings
+
+    Deletes the readings written again after an archived reading of the same
+    sensor at the same datetime, and the duplicates that were then packed
+    into the same block. Archived readings are the earlier writes, so they
+    are kept. Every block is decoded, one at a time.
+
+    Parameters:
+        session - database session used for the deletes
+        chunk_size - maximum number of rows deleted per transaction
+
+    Returns:
+        sensor_ids - set of the ids of the sensors that had duplicates
+        deleted - total number of deleted readings
+    """
+    sensor_ids = set()
+    deleted = 0
+    for block_id in session.scalars(select(SensorDataBlock.id).order_by(SensorDataBlock.id)).all():
+        sensor_id, start, end, payload = session.execute(
+            select(SensorDataBlock.sensor_id, SensorDataBlock.start, SensorDataBlock.end,
+                   SensorDataBlock.payload)
+            .where(SensorDataBlock.id == block_id)).one()
+        readings = decode_block(sensor_id, start, payload)
+        unique = unique_readings(readings)
+        if len(unique) < len(readings):
+            write_block(session, block_id, start, unique)
+            session.commit()
+            sensor_ids.add(sensor_id)
+            deleted += len(readings) - len(unique)
+
+        datetimes = {reading.datetime for reading in unique}
+        ids = [id for id, dtime in session.execute(
+            select(SensorDataReadable.id, SensorDataReadable.datetime)
+            .where(SensorDataReadable.sensor_id == sensor_id,
+                   SensorDataReadable.datetime >= start,
+                   SensorDataReadable.datetime < end)) if dtime in datetimes]
+        for first in range(0, len(ids), chunk_size):
+            deleted += delete_readings_in_chunks(
+                session, SensorDataReadable.id.in_(ids[first:first + chunk_size]), chunk_size)
+        if ids:
+            sensor_ids.add(sensor_id)
+    return sensor_ids, deleted
+
+
+def dedupe_readings(session, chunk_size):
+    """ dedupe_readings
+
+    Deletes the readings that duplicate an earlier reading of the same sensor
+    at the same datetime, keeping the earliest write as ingestion does, in
+    chunks of at most `chunk_size` rows. Duplicates of archived readings are
+    deleted too, see `dedupe_archived_readings`. The statistics of the
+    affected sensors are then recomputed.
+
+    Parameters:
+        session - database session used for the deletes
+        chunk_size - maximum number of rows deleted per transaction
+
+    Returns:
+        total number of deleted rows
+    """
+    sensor_ids = set(session.scalars(
+        select(SensorDataReadable.sensor_id)
+        .where(is_duplicate_reading())
+        .distinct()).all())
+    deleted = 0
+    if sensor_ids:
+        deleted = delete_readings_in_chunks(session, is_duplicate_reading(), chunk_size)
+    archived_sensor_ids, archived_deleted = dedupe_archived_readings(session, chunk_size)
+    sensor_ids |= archived_sensor_ids
+    deleted += archived_deleted
+    if not sensor_ids:
+        return 0
+    refresh_sensor_stats(session, sensor_ids)
+    return deleted
+
+
+@click.command('dedupe_readings')
+@with_appcontext
+@click.option('--chunk-size', '-c', default=None, type=click.IntRange(min=1),
+              help='Maximum number of rows deleted per transaction '
+                   '(defaults to BULK_CHUNK_SIZE)')
+def dedupe_readings_command(chunk_size):
+    """ dedupe_readings
+
+    Deletes duplicate readings of a sensor at the same datetime from an
+    existing database, including duplicates of archived readings, then makes
+    the (sensor_id, datetime) index unique so that ingestion skips them from
+    then on. Databases created before the index was unique must be
+    deduplicated before readings can be posted.
+
+    Parameters:
+        chunk_size - maximum number of rows deleted per transaction
+    """
+    chunk_size = chunk_size or current_app.config['BULK_CHUNK_SIZE']
+    deleted = dedupe_readings(db_session, chunk_size)
+    click.echo(f'Deleted {deleted} duplicate readings.')
+    if ensure_unique_readings_index(db_session):
+        click.echo(f'Created the unique index {READINGS_KEY_INDEX}.')
+
+
+def init_app(app):
+    """ init_app
+
+    Parameters:
+        app - Flask app instance
+
+    Registers the `dedupe_readings_command` with the application.
+    """
+    app.cli.add_command(dedupe_readings_command)
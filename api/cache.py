@@ -0,0 +1,296 @@
+import functools
+import threading
+from collections import OrderedDict
+
+from flask import current_app, request
+from sqlalchemy import event, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .database import AppSession, read_session
+from .models import (AlertRule, Building, Room, Sensor, SensorDataBlock, SensorDataReadable,
+                     DataVersion)
+
+# Parent of each model. Responses embed a record's children, and children
+# embed the name of their parent, so changes propagate along this hierarchy.
+PARENTS = {
+    Room: Building,
+    Sensor: Room,
+    SensorDataReadable: Sensor,
+}
+
+# Models whose records are also removed by `ON DELETE CASCADE` when records
+# of a model are deleted, besides its descendants
+DELETE_CASCADES = {
+    Building: [AlertRule],
+    Room: [AlertRule],
+    Sensor: [AlertRule],
+}
+
+# Models whose responses are cached, by table name
+VERSIONED_MODELS = {model.__tablename__: model
+                    for model in (Building, Room, Sensor, SensorDataReadable, AlertRule)}
+# Archived readings are served as sensor data, so changing their blocks
+# changes the same responses as changing the readings
+VERSIONED_MODELS[SensorDataBlock.__tablename__] = SensorDataReadable
+
+# Suffix of the data versions counting only updates and deletes, after which
+# copies of a table can't be brought up to date by reading its new rows
+REWRITES_SUFFIX = '.rewrites'
+
+# Approximate memory used by a cache entry besides its body
+ENTRY_OVERHEAD = 256
+
+
+def get_ancestors(model):
+    """ get_ancestors
+
+    Returns the models whose records contain records of `model`.
+    """
+    ancestors = []
+    while model in PARENTS:
+        model = PARENTS[model]
+        ancestors.append(model)
+    return ancestors
+
+
+def get_descendants(model):
+    """ get_descendants
+
+    Returns the models whose records are contained in records of `model`.
+    """
+    descendants = []
+    for child, parent in PARENTS.items():
+        if parent == model:
+            descendants.append(child)
+            descendants.extend(get_descendants(child))
+    return descendants
+
+
+def get_affected_models(model, operation):
+    """ get_affected_models
+
+    Returns the models whose responses change when records of `model` are changed.
+    Inserting records changes the model and its ancestors, while updates and
+    deletes (which cascade) also change its descendants. Deletes also change
+    the models in `DELETE_CASCADES`.
+
+    Parameters:
+        model - model of the changed records
+        operation - 'insert', 'update' or 'delete'
+    """
+    affected = [model] + get_ancestors(model)
+    if operation != 'insert':
+        affected += get_descendants(model)
+    if operation == 'delete':
+        affected += DELETE_CASCADES.get(model, [])
+    return affected
+
+
+def mark_changed(session, table_name, operation):
+    model = VERSIONED_MODELS.get(table_name)
+    if model:
+        names = session.info.setdefault('changed_versions', set())
+        names.update(affected.__tablename__
+                     for affected in get_affected_models(model, operation))
+        if operation != 'insert':
+            names.update(rewritten.__tablename__ + REWRITES_SUFFIX
+                         for rewritten in [model] + get_descendants(model))
+
+
+def track_execute(orm_execute_state):
+    """ track_execute
+
+    Records the models changed by INSERT, UPDATE and DELETE statements
+    executed through a session.
+    """
+    if orm_execute_state.is_insert:
+        operation = 'insert'
+    elif orm_execute_state.is_update:
+        operation = 'update'
+    elif orm_execute_state.is_delete:
+        operation = 'delete'
+    else:
+        return
+    table = getattr(orm_execute_state.statement, 'table', None)
+    if table is not None:
+        mark_changed(orm_execute_state.session, table.name, operation)
+
+
+def track_flush(session, flush_context):
+    """ track_flush
+
+    Records the models changed by flushing added, modified and deleted instances.
+    """
+    for instances, operation in ((session.new, 'insert'),
+                                 (session.dirty, 'update'),
+                                 (session.deleted, 'delete')):
+        for instance in instances:
+            mark_changed(session, instance.__tablename__, operation)
+
+
+def bump_versions(session):
+    """ bump_versions
+
+    Increments the data versions of the changed models in the transaction
+    being committed, so the new versions are visible exactly when the changes are.
+    """
+    # Pending instances are only flushed after this event
+    session.flush()
+    changed = session.info.pop('changed_versions', None)
+    if not changed:
+        return
+    statement = sqlite_insert(DataVersion)
+    statement = statement.on_conflict_do_update(
+        index_elements=[DataVersion.name],
+        set_={'version': DataVersion.version + 1})
+    session.execute(statement, [{'name': name, 'version': 1} for name in sorted(changed)])
+
+
+def discard_changes(session, transaction):
+    if transaction.parent is None:
+        session.info.pop('changed_versions', None)
+
+
+def get_versions(session):
+    """ get_versions
+
+    Returns a dictionary mapping table names to their data versions.
+    """
+    return dict(session.execute(select(DataVersion.name, DataVersion.version)).all())
+
+
+class ResponseCache:
+    """ ResponseCache
+
+    Thread safe LRU cache of response bodies, bounded by their total size in bytes.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """ get
+
+        Returns the cached entry for `key`, or None, and counts the hit or miss.
+        """
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key, entry, size):
+        """ set
+
+        Stores an entry of `size` bytes, evicting the least recently used
+        entries until the cache fits within `max_bytes`.
+        """
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key)[1]
+            self.entries[key] = (entry, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        """ stats
+
+        Returns the cache's counters as a JSON object.
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else None,
+            }
+
+
+def get_response_cache(app=None):
+    """ get_response_cache
+
+    Returns the response cache of the given app, or of the current app,
+    or None if caching is disabled.
+    """
+    app = app or current_app
+    return app.extensions.get('response_cache')
+
+
+def cached(view):
+    """ cached
+
+    Decorates the `get` method of a view holding a `model`, caching its
+    successful responses. Responses are keyed by the request's path, query
+    parameters and body, and the data version of the model, so they are
+    invalidated as soon as a change to the model is committed.
+    """
+    @functools.wraps(view)
+    def wrapper(self, *args, **kwargs):
+        cache = get_response_cache()
+        if cache is None:
+            return view(self, *args, **kwargs)
+
+        version = get_versions(read_session).get(self.model.__tablename__, 0)
+        key = (request.path, tuple(sorted(request.args.items(multi=True))),
+               request.get_data(), version)
+        entry = cache.get(key)
+        if entry is not None:
+            body, status, mimetype = entry
+            response = current_app.response_class(body, status, mimetype=mimetype)
+            response.headers['X-Cache'] = 'HIT'
+            return response
+
+        response = current_app.make_response(view(self, *args, **kwargs))
+        if response.status_code == 200 and not response.is_streamed:
+            body = response.get_data()
+            cache.set(key, (body, response.status_code, response.mimetype),
+                      len(body) + ENTRY_OVERHEAD)
+        response.headers['X-Cache'] = 'MISS'
+        return response
+    return wrapper
+
+
+def init_app(app):
+    """ init_app
+
+    Parameters:
+        app - Flask app instance
+
+    Creates the app's response cache, when `RESPONSE_CACHE_ENABLED` is set,
+    and registers the session events maintaining the data versions. The
+    versions are maintained even if caching is disabled, since other
+    processes writing to the same database may cache responses.
+    """
+    if app.config['RESPONSE_CACHE_ENABLED']:
+        app.extensions['response_cache'] = ResponseCache(
+            app.config['RESPONSE_CACHE_MAX_BYTES'])
+
+    for name, listener in (('do_orm_execute', track_execute),
+                           ('after_flush', track_flush),
+                           ('before_commit', bump_versions),
+                           ('after_transaction_end', discard_changes)):
+        if not event.contains(AppSession, name, listener):
+            event.listen(AppSession, name, listener)
@@ -0,0 +1,110 @@
+import zlib
+
+from flask import current_app, request
+
+# Content encodings supported by the app, in order of preference
+SUPPORTED_ENCODINGS = ('gzip', 'deflate')
+
+# zlib window bits for each content encoding; adding 16 writes a gzip header
+WBITS = {
+    'gzip': 16 + zlib.MAX_WBITS,
+    'deflate': zlib.MAX_WBITS,
+}
+
+
+def negotiate_encoding(accept_encodings):
+    """ negotiate_encoding
+
+    Selects the content encoding to use based on the request's
+    `Accept-Encoding` header, respecting quality values.
+
+    Parameters:
+        accept_encodings - werkzeug Accept object of the request
+
+    Returns:
+        name of the encoding, or None if no supported encoding is accepted
+    """
+    return accept_encodings.best_match(SUPPORTED_ENCODINGS)
+
+
+def compress_chunks(chunks, encoding, level):
+    """ compress_chunks
+
+    Incrementally compresses an iterable of response chunks, so streamed
+    responses never have to be held in memory as a whole.
+
+    Parameters:
+        chunks - iterable of bytes or strings
+        encoding - name of the content encoding
+        level - zlib compression level
+
+    Returns:
+        generator of compressed chunks
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, WBITS[encoding])
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def compress_response(response):
+    """ compress_response
+
+    Compresses the response body when the client accepts gzip or deflate.
+    Small bodies, already encoded responses and responses with a mimetype
+    that isn't listed in `COMPRESS_MIMETYPES` are left untouched.
+
+    Parameters:
+        response - response object
+
+    Returns:
+        the (possibly compressed) response
+    """
+    config = current_app.config
+
+    if (not config['COMPRESS_ENABLED']
+            or response.status_code < 200
+            or response.status_code in (204, 304)
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in config['COMPRESS_MIMETYPES']):
+        return response
+
+    min_size = config['COMPRESS_MIN_SIZE']
+    if not response.is_streamed and len(response.get_data()) < min_size:
+        return response
+    if response.content_length is not None and response.content_length < min_size:
+        return response
+
+    # The response differs depending on the request's Accept-Encoding header,
+    # so caches need to store separate copies
+    response.vary.add('Accept-Encoding')
+
+    encoding = negotiate_encoding(request.accept_encodings)
+    if not encoding:
+        return response
+
+    level = config['COMPRESS_LEVEL']
+    if response.is_streamed:
+        response.response = compress_chunks(response.response, encoding, level)
+        response.headers.pop('Content-Length', None)
+    else:
+        response.set_data(b''.join(
+            compress_chunks([response.get_data()], encoding, level)))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_app(app):
+    """ init_app
+
+    Parameters:
+        app - Flask app instance
+
+    Registers `compress_response` to run after every request.
+    """
+    app.after_request(compress_response)
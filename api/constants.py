@@ -8,9 +8,12 @@ class StatusCode(IntEnum):
     Enum class that defines some HTTP status codes
     """
     OK = 200
+    ACCEPTED = 202
     NO_CONTENT = 204
     BAD_REQUEST = 400
     NOT_FOUND = 404
+    METHOD_NOT_ALLOWED = 405
+    INTERNAL_SERVER_ERROR = 500
 
 
 # Maps URL names to Model class for registering endpoints
@@ -19,6 +22,7 @@ URL_MODEL_MAPPING = {
     'rooms': Room,
     'sensors': Sensor,
     'sensor_data': SensorDataReadable,
+    'alert_rules': AlertRule,
 }
 
 DATETIME_FORMAT_STRING = '%Y-%m-%d %H:%M:%S'
@@ -1,29 +1,359 @@
-import json
 import os
+import sqlite3
+import tempfile
+import threading
+import time
+import urllib.parse
+import weakref
 
 import click
-import datetime
 from flask import current_app
-from sqlalchemy import create_engine, insert
-from sqlalchemy.orm import scoped_session, sessionmaker, declarative_base
-from sqlalchemy.exc import IntegrityError
+from flask.globals import app_ctx
+from flask.cli import with_appcontext
+from sqlalchemy import URL, create_engine, event, insert
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.pool import NullPool, QueuePool, SingletonThreadPool, StaticPool
+from sqlalchemy.orm import Session, scoped_session, sessionmaker, declarative_base
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
 
 # Defines the path where test data is located
 TEST_DATA_JSON_RELATIVE_PATH = 'api/test_data/test_data.json'
 test_data_path = os.path.join(os.getcwd(), TEST_DATA_JSON_RELATIVE_PATH)
 
-# NOTE: Might need to include convert_unicode=True parameter
-# This converts all Unicode values to raw bytes and from raw byte values back to Python Unicode
-engine = create_engine('sqlite:///' + current_app.config['DATABASE'])
-db_session = scoped_session(sessionmaker(autocommit=False,
-                                         autoflush=False,
-                                         bind=engine))
+# Default number of records bulk inserted per statement when seeding
+DEFAULT_CHUNK_SIZE = 5000
+
+# Maps the names accepted by `DATABASE_POOL_CLASS` to SQLAlchemy pool classes
+POOL_CLASSES = {
+    'QueuePool': QueuePool,
+    'NullPool': NullPool,
+    'StaticPool': StaticPool,
+    'SingletonThreadPool': SingletonThreadPool,
+}
+
+# Maps app config keys to the `create_engine` pool arguments they set
+POOL_OPTIONS = {
+    'DATABASE_POOL_SIZE': 'pool_size',
+    'DATABASE_POOL_TIMEOUT': 'pool_timeout',
+    'DATABASE_POOL_RECYCLE': 'pool_recycle',
+    'DATABASE_MAX_OVERFLOW': 'max_overflow',
+}
+
+# Command rebuilding the tables of databases created before their foreign
+# keys cascaded deletes
+REPAIR_FOREIGN_KEYS_COMMAND = 'flask --app api repair_foreign_keys'
+
+# DatabaseState instances of every app, whose engines are reset after a fork
+_database_states = weakref.WeakSet()
+
+
+def enable_foreign_keys(dbapi_connection, connection_record):
+    """ enable_foreign_keys
+
+    SQLite doesn't enforce foreign keys unless enabled for every connection.
+    This is required for `ON DELETE CASCADE` to remove child records.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA foreign_keys=ON')
+    cursor.close()
+
+
+def get_database_url(config):
+    """ get_database_url
+
+    Returns `DATABASE_URL` if it is set, otherwise the URL of the SQLite
+    database file at `DATABASE`.
+    """
+    return config.get('DATABASE_URL') or URL.create('sqlite', database=config['DATABASE'])
+
+
+def create_app_engine(config, url=None, **options):
+    """ create_app_engine
+
+    Creates an engine from the app configuration:
+        DATABASE_URL - database URL, defaults to the SQLite file at `DATABASE`
+        DATABASE_ECHO - whether executed SQL is logged
+        DATABASE_POOL_CLASS - name of the connection pool class, e.g. 'NullPool'
+        DATABASE_POOL_SIZE, DATABASE_POOL_TIMEOUT, DATABASE_POOL_RECYCLE,
+        DATABASE_MAX_OVERFLOW - pool tuning
+        DATABASE_CONNECT_ARGS - dictionary of arguments passed to the DBAPI's connect()
+        SLOW_QUERY_THRESHOLD - milliseconds after which statements are recorded as slow
+
+    Parameters:
+        config - app configuration
+        url - optional URL overriding `DATABASE_URL`
+        options - optional `create_engine` arguments overriding the configuration
+
+    Returns:
+        the new engine
+    """
+    engine_options = {'echo': config.get('DATABASE_ECHO', False)}
+    pool_class = config.get('DATABASE_POOL_CLASS')
+    if pool_class:
+        engine_options['poolclass'] = POOL_CLASSES[pool_class] \
+            if isinstance(pool_class, str) else pool_class
+    for key, option in POOL_OPTIONS.items():
+        if config.get(key) is not None:
+            engine_options[option] = config[key]
+    if config.get('DATABASE_CONNECT_ARGS'):
+        engine_options['connect_args'] = dict(config['DATABASE_CONNECT_ARGS'])
+    engine_options.update(options)
+
+    engine = create_engine(url or get_database_url(config), **engine_options)
+    if engine.dialect.name == 'sqlite':
+        event.listen(engine, 'connect', enable_foreign_keys)
+    if config.get('SLOW_QUERY_THRESHOLD') is not None:
+        from .slow_queries import track_slow_queries
+        track_slow_queries(engine, config['SLOW_QUERY_THRESHOLD'])
+    return engine
+
+
+def refresh_replica(database_path, replica_path):
+    """ refresh_replica
+
+    Copies the primary database to the replica path using SQLite's online
+    backup API. The copy is written to a temporary file and then atomically
+    moved over the replica, so readers never see a partially written replica.
+
+    Parameters:
+        database_path - path to the primary database
+        replica_path - path to the replica database
+    """
+    # Each refresh writes its own temporary file, so that workers refreshing
+    # the same replica at once don't write to the same copy
+    descriptor, temporary_path = tempfile.mkstemp(
+        prefix=os.path.basename(replica_path) + '.', suffix='.tmp',
+        dir=os.path.dirname(replica_path) or None)
+    os.close(descriptor)
+    try:
+        source = sqlite3.connect(database_path)
+        destination = sqlite3.connect(temporary_path)
+        try:
+            source.backup(destination)
+        finally:
+            destination.close()
+            source.close()
+        os.replace(temporary_path, replica_path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+
+
+def read_only_url(database_path):
+    """ read_only_url
+
+    Returns the URL of read-only connections to a SQLite database file. The
+    path is percent-encoded in the `file:` URI, so that paths containing
+    characters such as '?', '#' or '%' open the right file.
+    """
+    return URL.create('sqlite', database=f'file:{urllib.parse.quote(database_path)}',
+                      query={'mode': 'ro', 'uri': 'true'})
+
+
+def enable_wal(database_path):
+    """ enable_wal
+
+    Switches a SQLite database file to write-ahead logging. This is stored in
+    the file, so it applies to every connection. In the default rollback
+    journal mode, readers' locks block the writer's commits.
+    """
+    connection = sqlite3.connect(database_path)
+    try:
+        connection.execute('PRAGMA journal_mode=WAL')
+    finally:
+        connection.close()
+
+
+def refresh_replica_periodically(database_path, replica_path, interval, logger):
+    """ refresh_replica_periodically
+
+    Refreshes the replica every `interval` seconds. Meant to run on a daemon thread.
+    """
+    while True:
+        time.sleep(interval)
+        try:
+            refresh_replica(database_path, replica_path)
+        except (sqlite3.Error, OSError) as e:
+            logger.error('Failed to refresh the database replica: %s', e)
+
+
+def create_read_engine(config, logger, engine=None):
+    """ create_read_engine
+
+    Creates the engine used for read only requests, based on `DATABASE_READ_MODE`:
+        'primary' - reads share the primary engine
+        'readonly' - reads use read-only connections to the primary database,
+                     which is switched to WAL mode so that reads and writes
+                     don't block each other
+        'replica' - reads use a copy of the database at `DATABASE_REPLICA`,
+                    refreshed every `DATABASE_REPLICA_REFRESH` seconds
+
+    The 'readonly' and 'replica' modes require the SQLite database file at `DATABASE`.
+
+    Parameters:
+        config - app configuration
+        logger - logger for replica refresh errors
+        engine - the primary engine, returned by the 'primary' mode
+
+    Returns:
+        engine for reads
+    """
+    mode = config.get('DATABASE_READ_MODE', 'primary')
+    if mode == 'primary':
+        return engine
+
+    if mode == 'readonly':
+        enable_wal(config['DATABASE'])
+        return create_app_engine(config, read_only_url(config['DATABASE']))
+
+    if mode == 'replica':
+        replica_path = config['DATABASE_REPLICA']
+        refresh_replica(config['DATABASE'], replica_path)
+        threading.Thread(
+            target=refresh_replica_periodically,
+            args=(config['DATABASE'], replica_path,
+                  config['DATABASE_REPLICA_REFRESH'], logger),
+            daemon=True).start()
+        # Connections aren't pooled, so that new connections open the refreshed replica
+        return create_app_engine(config, read_only_url(replica_path), poolclass=NullPool)
+
+    raise ValueError(f'Unknown DATABASE_READ_MODE: {mode!r}')
+
+
+class DatabaseState:
+    """ DatabaseState
+
+    Holds the engines of an app, stored in `app.extensions['database']`.
+    Engines are created from the app's configuration the first time they are used.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.lock = threading.Lock()
+        self.engine = None
+        self.read_engine = None
+        _database_states.add(self)
+
+    def get_engine(self):
+        if self.engine is None:
+            with self.lock:
+                if self.engine is None:
+                    self.engine = create_app_engine(self.app.config)
+        return self.engine
+
+    def get_read_engine(self):
+        if self.read_engine is None:
+            engine = self.get_engine()
+            with self.lock:
+                if self.read_engine is None:
+                    self.read_engine = create_read_engine(
+                        self.app.config, self.app.logger, engine)
+        return self.read_engine
+
+    def dispose(self):
+        """ dispose
+
+        Closes the pooled connections of the app's engines.
+        """
+        for engine in {self.engine, self.read_engine} - {None}:
+            engine.dispose()
+
+    def reset_after_fork(self):
+        """ reset_after_fork
+
+        Drops the pooled connections inherited from the parent process without
+        closing them, since they are still used by the parent. The child then
+        opens its own connections.
+        """
+        self.lock = threading.Lock()
+        for engine in {self.engine, self.read_engine} - {None}:
+            engine.dispose(close=False)
+
+
+def get_database_state(app=None):
+    """ get_database_state
+
+    Returns the DatabaseState of the given app, or of the current app.
+    """
+    app = app or current_app._get_current_object()
+    return app.extensions['database']
+
+
+def get_engine(app=None):
+    """ get_engine
+
+    Returns the primary engine of the given app, or of the current app.
+    """
+    return get_database_state(app).get_engine()
+
+
+def get_read_engine(app=None):
+    """ get_read_engine
+
+    Returns the engine used for reads by the given app, or by the current app.
+    """
+    return get_database_state(app).get_read_engine()
+
+
+class AppSession(Session):
+    """ AppSession
+
+    Session bound to the engines of the current app, so the same sessions can
+    be used by multiple apps in one process. Sessions created with
+    `info={'read': True}` use the app's read engine.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.info.get('read'):
+            return get_read_engine()
+        return get_engine()
+
+
+def app_context_scope():
+    """ app_context_scope
+
+    Scopes sessions to the current app context, so apps used in the same
+    thread don't share sessions. Falls back to the thread outside app contexts.
+    """
+    try:
+        return id(app_ctx._get_current_object())
+    except RuntimeError:
+        return threading.get_ident()
+
+
+db_session = scoped_session(sessionmaker(class_=AppSession,
+                                         autocommit=False,
+                                         autoflush=False),
+                            scopefunc=app_context_scope)
+# Session used by GET requests, which never writes
+read_session = scoped_session(sessionmaker(class_=AppSession,
+                                           autocommit=False,
+                                           autoflush=False,
+                                           info={'read': True}),
+                              scopefunc=app_context_scope)
 
 Base = declarative_base()
 Base.query = db_session.query_property()
 
 
+def reset_after_fork():
+    """ reset_after_fork
+
+    Runs in child processes after a fork, so that forked workers never share
+    SQLite connections or sessions with their parent.
+    """
+    for state in list(_database_states):
+        state.reset_after_fork()
+    # Sessions are scoped by app context id, so every scope is cleared
+    db_session.registry.registry.clear()
+    read_session.registry.registry.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_after_fork)
+
+
 def init_db():
     """ init_db
 
@@ -33,22 +363,154 @@ def init_db():
     # they will be registered properly on the metadata. Otherwise,
     # you will have to import them first before calling init_db()
     from . import models
-    Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=get_engine())
+
+
+class MissingCascadeError(RuntimeError):
+    """ MissingCascadeError
+
+    Raised when a record with children is deleted from a database created
+    before its foreign keys were declared with `ON DELETE CASCADE`.
+    """
+
+
+def get_missing_cascades(connection):
+    """ get_missing_cascades
+
+    Returns the names of the existing tables whose foreign keys don't cascade
+    deletes in the database although their models declare `ON DELETE CASCADE`.
+    `create_all` doesn't alter existing tables, so databases created before
+    keep the foreign keys they were created with, which are now enforced.
+
+    Parameters:
+        connection - SQLAlchemy connection
+
+    Returns:
+        list of table names, in dependency order
+    """
+    from . import models
+    if connection.dialect.name != 'sqlite':
+        return []
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        expected = {(key.parent.name, key.column.table.name) for key in table.foreign_keys
+                    if (key.ondelete or '').upper() == 'CASCADE'}
+        exists = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (table.name,)).first()
+        if not expected or not exists:
+            continue
+        # Rows are (id, seq, table, from, to, on_update, on_delete, match)
+        cascades = {(row[3], row[2]) for row in connection.exec_driver_sql(
+            f'PRAGMA foreign_key_list("{table.name}")') if row[6].upper() == 'CASCADE'}
+        if expected - cascades:
+            missing.append(table.name)
+    return missing
+
+
+def rebuild_tables(connection, names):
+    """ rebuild_tables
+
+    Recreates tables from their models and copies their rows over, which is
+    how SQLite changes the foreign keys of an existing table. Their indexes,
+    and the search index whose triggers are dropped with them, are recreated.
+    Foreign keys must be disabled on the connection, outside a transaction,
+    so that dropping the old tables doesn't cascade.
+
+    Parameters:
+        connection - SQLAlchemy connection with foreign keys disabled
+        names - names of the tables to rebuild
+    """
+    from .search import SEARCH_MODELS, create_search_index, drop_search_index
+    tables = Base.metadata.tables
+    for name in names:
+        table = tables[name]
+        rebuilt = f'{name}_rebuilt'
+        existing = {row[1] for row in
+                    connection.exec_driver_sql(f'PRAGMA table_info("{name}")')}
+        columns = ', '.join(column.name for column in table.columns if column.name in existing)
+        statement = str(CreateTable(table).compile(dialect=connection.dialect))
+        connection.exec_driver_sql(
+            statement.replace(f'CREATE TABLE {name} ', f'CREATE TABLE {rebuilt} ', 1))
+        connection.exec_driver_sql(
+            f'INSERT INTO {rebuilt} ({columns}) SELECT {columns} FROM {name}')
+        connection.exec_driver_sql(f'DROP TABLE {name}')
+        connection.exec_driver_sql(f'ALTER TABLE {rebuilt} RENAME TO {name}')
+        for index in table.indexes:
+            index.create(bind=connection)
+    if {model.__tablename__ for model in SEARCH_MODELS} & set(names):
+        drop_search_index(None, connection)
+        create_search_index(None, connection)
+
+
+def describe_missing_cascades(missing):
+    """ describe_missing_cascades
+
+    Describes the tables returned by `get_missing_cascades` for error messages.
+    """
+    return (f'The foreign keys of {", ".join(missing)} don\'t cascade deletes, so records '
+            f'with children can\'t be deleted. Run `{REPAIR_FOREIGN_KEYS_COMMAND}` to '
+            f'rebuild the tables.')
+
+
+def delete_cascading(session, statement):
+    """ delete_cascading
+
+    Executes a DELETE statement of records whose children are removed by
+    `ON DELETE CASCADE`.
+
+    Parameters:
+        session - database session used for the delete
+        statement - DELETE statement
+
+    Returns:
+        number of deleted records
+
+    Raises:
+        MissingCascadeError if the database's foreign keys don't cascade deletes
+    """
+    try:
+        return session.execute(statement).rowcount
+    except IntegrityError as e:
+        session.rollback()
+        missing = get_missing_cascades(session.connection())
+        if not missing:
+            raise
+        raise MissingCascadeError(describe_missing_cascades(missing)) from e
+
+
+def check_foreign_keys(app):
+    """ check_foreign_keys
+
+    Logs an error at startup when deletes of buildings, rooms or sensors with
+    children will fail, because the database's foreign keys don't cascade.
+    """
+    try:
+        with get_engine(app).connect() as connection:
+            missing = get_missing_cascades(connection)
+    except SQLAlchemyError as e:
+        app.logger.warning('Could not check the foreign keys: %s', e)
+        return
+    if missing:
+        app.logger.error(describe_missing_cascades(missing))
 
 
 def shutdown_session(exception=None):
     """ shutdown_session
 
-    Removes the database session at the end of the request or
+    Removes the database sessions at the end of the request or
     when the application shutsdown
     """
     db_session.remove()
+    read_session.remove()
 
 
 def bulk_create_from_json_list(json_list, model):
     """ bulk_create_from_json_list
 
-    Helper function for bulk creating model instances from JSON.
+    Helper function for bulk creating model instances from JSON. Sensor data
+    that duplicates an existing reading of the same sensor and datetime is
+    skipped, and left out of the sensor statistics and alerts.
 
     Parameters:
         json_list - list of JSON serialized objects of model instances
@@ -57,27 +519,113 @@ def bulk_create_from_json_list(json_list, model):
     Returns:
         success - whether the instances were created successfully
         message - error message if creation fails
+        created - number of instances created
     """
     success = True
     message = ''
+    created = 0
     try:
-        db_session.execute(
-            insert(model),
-            json_list
-        )
+        if model.__name__ == 'SensorDataReadable':
+            # Keeps the sensor statistics and alerts in the same transaction as the readings
+            from .alerts import evaluate_alerts
+            from .readings import insert_readings
+            from .stats import update_sensor_stats
+            inserted = insert_readings(db_session, json_list)
+            update_sensor_stats(db_session, inserted)
+            evaluate_alerts(db_session, inserted)
+            created = len(inserted)
+        else:
+            db_session.execute(
+                insert(model),
+                json_list
+            )
+            created = len(json_list)
         db_session.commit()
     except IntegrityError as e:
+        db_session.rollback()
         success = False
         message = e
-    return success, message
+        created = 0
+    return success, message, created
+
+
+def get_droppable_indexes():
+    """ get_droppable_indexes
+
+    Returns the non-unique indexes defined on the models. These can safely be
+    dropped before a large load and rebuilt afterwards, which is much faster
+    than updating them for every inserted row. Unique indexes are kept, since
+    inserts depend on them, e.g. readings skip duplicates with `ON CONFLICT`
+    on the (sensor_id, datetime) index.
+    """
+    from . import models
+    return [index for table in Base.metadata.sorted_tables
+            for index in table.indexes if not index.unique]
+
+
+def load_seed_file(path, chunk_size=DEFAULT_CHUNK_SIZE, on_read=None):
+    """ load_seed_file
+
+    Streams records from a JSON or NDJSON seed file into the database,
+    bulk inserting them in chunks of `chunk_size` records. Each chunk is
+    committed separately, so a failing chunk doesn't discard the others.
+
+    Parameters:
+        path - path to the seed file
+        chunk_size - maximum number of records inserted per statement
+        on_read - optional callback receiving the number of bytes read
+
+    Returns:
+        created - mapping of model names to the number of records created
+        errors - list of (model name, error message) pairs
+    """
+    from .constants import URL_MODEL_MAPPING
+    from .loader import iter_chunks, iter_seed_records, parse_datetime
+    # Creates a mapping between model names and classes
+    models = {cls.__name__: cls for cls in URL_MODEL_MAPPING.values()}
+
+    created = {}
+    errors = []
+    with open(path, 'rb') as seed_file:
+        records = iter_seed_records(seed_file, path, on_read)
+        for name, chunk in iter_chunks(records, chunk_size):
+            cls = models.get(name)
+            if not cls:
+                errors.append((name, f'Unknown model {name!r}'))
+                continue
+
+            # Convert date/time field into a datetime object for SensorDataReadable
+            if cls.__name__ == 'SensorDataReadable':
+                for entry in chunk:
+                    entry['datetime'] = parse_datetime(entry['datetime'])
+
+            success, message, count = bulk_create_from_json_list(chunk, cls)
+            if success:
+                created[name] = created.get(name, 0) + count
+            else:
+                errors.append((name, message))
+    return created, errors
 
 
 @click.command('init_db')
+@with_appcontext
 @click.option('--dummy', '-d', is_flag=True, default=False, show_default=True,
               help='Initialize the databse with dummy data')
+@click.option('--file', '-f', 'seed_path', default=None,
+              type=click.Path(exists=True, dir_okay=False),
+              help='JSON or NDJSON (.ndjson/.jsonl) seed file to load')
+@click.option('--chunk-size', '-c', default=DEFAULT_CHUNK_SIZE, show_default=True,
+              type=click.IntRange(min=1),
+              help='Number of records inserted per statement')
+@click.option('--drop-indexes', is_flag=True, default=False, show_default=True,
+              help='Drop non-unique indexes during the load and rebuild them afterwards. '
+                   'Unique indexes, such as the (sensor_id, datetime) index of '
+                   'readings, are kept')
+@click.option('--progress', '-p', is_flag=True, default=False, show_default=True,
+              help='Display a progress bar while loading data')
 @click.option('--verbose', '-v', default=True, show_default=True,
               help='Whether status changes should be printed')
-def init_db_command(dummy, verbose):
+def init_db_command(dummy, seed_path, chunk_size, drop_indexes, progress, verbose):
     """ init_db
 
     Initializes the database's tables using the models defined in `api.models`.
@@ -85,6 +633,10 @@ def init_db_command(dummy, verbose):
 
     Parameters:
         dummy - whether the database should be initialized with dummy data
+        seed_path - path to a seed file to load instead of the dummy data
+        chunk_size - number of records inserted per statement
+        drop_indexes - whether indexes are dropped and rebuilt around the load
+        progress - whether a progress bar is displayed
         verbose - whether initialization should print status changes to the terminal
     """
     # Clears the existing data and create new table
@@ -92,38 +644,70 @@ def init_db_command(dummy, verbose):
     if verbose:
         click.echo('Database Initialized.')
 
-    if dummy:
-        from .constants import URL_MODEL_MAPPING
-        # Creates a mapping between model names and classes
-        models = {cls.__name__: cls for cls in URL_MODEL_MAPPING.values()}
+    if dummy and not seed_path:
+        seed_path = TEST_DATA_JSON_RELATIVE_PATH
 
+    if seed_path:
         if verbose:
-            click.echo('Adding dummy data to database.')
-        with open(TEST_DATA_JSON_RELATIVE_PATH, 'r') as json_file:
-            data_json = json.load(json_file)
-
-            for name, cls in models.items():
-                if name in data_json:
-                    # Convert date/time field into a datetime object for SensorDataReadable
-                    if name == 'SensorDataReadable':
-                        for i, entry in enumerate(data_json[name]):
-                            format = '%Y-%m-%d %H:%M:%S'
-                            dtime = entry['datetime']
-                            dt_object = datetime.datetime.strptime(
-                                dtime, format)
-                            data_json[name][i]['datetime'] = dt_object
-
-                    # Bulk creates records
-                    success, message = bulk_create_from_json_list(
-                        data_json[name], cls)
-                    output = f'\t{name} records created successfully.'
-                    if not success:
-                        output = f'\tAn error occurred creating {name} records:\n{message}'
-                    if verbose:
-                        click.echo(output)
+            click.echo(f'Adding data from {seed_path} to database.')
+
+        indexes = get_droppable_indexes() if drop_indexes else []
+        for index in indexes:
+            index.drop(bind=get_engine(), checkfirst=True)
+
+        # The indexes are rebuilt even if the load fails, so that the
+        # database isn't left without them
+        try:
+            if progress:
+                with click.progressbar(length=os.path.getsize(seed_path),
+                                       label='Loading records') as bar:
+                    created, errors = load_seed_file(
+                        seed_path, chunk_size, on_read=bar.update)
+            else:
+                created, errors = load_seed_file(seed_path, chunk_size)
+        except KeyError as e:
+            raise click.ClickException(f'Failed to load {seed_path}: a record has no {e} field')
+        except (OSError, ValueError, TypeError) as e:
+            raise click.ClickException(f'Failed to load {seed_path}: {e}')
+        finally:
+            if indexes and verbose:
+                click.echo('Rebuilding indexes.')
+            for index in indexes:
+                index.create(bind=get_engine(), checkfirst=True)
 
         if verbose:
-            click.echo('Completed adding dummy data.')
+            for name, count in created.items():
+                click.echo(f'\t{count} {name} records created successfully.')
+            for name, message in errors:
+                click.echo(f'\tAn error occurred creating {name} records:\n{message}')
+            click.echo('Completed adding data.')
+
+
+@click.command('repair_foreign_keys')
+@with_appcontext
+def repair_foreign_keys_command():
+    """ repair_foreign_keys
+
+    Rebuilds the tables of a database created before its foreign keys were
+    declared with `ON DELETE CASCADE`, keeping their rows, in a single
+    transaction. Deleting a record with children fails until then.
+    """
+    with get_engine().connect() as connection:
+        # Foreign keys can only be disabled outside a transaction
+        connection.exec_driver_sql('PRAGMA foreign_keys=OFF')
+        try:
+            missing = get_missing_cascades(connection)
+            if missing:
+                connection.exec_driver_sql('BEGIN')
+                rebuild_tables(connection, missing)
+                connection.commit()
+        finally:
+            connection.rollback()
+            connection.exec_driver_sql('PRAGMA foreign_keys=ON')
+    if missing:
+        click.echo(f'Rebuilt the tables {", ".join(missing)}.')
+    else:
+        click.echo('The foreign keys already cascade deletes.')
 
 
 def init_app(app):
@@ -133,7 +717,10 @@ def init_app(app):
         app - Flask app instance
 
     Initializes the app instance by registering the `shutdown_session` and
-    `init_db_command` functions with the application context.
+    `init_db_command` functions with the application context. The app's
+    engines are created lazily from its configuration.
     """
+    app.extensions['database'] = DatabaseState(app)
     app.teardown_appcontext(shutdown_session)
     app.cli.add_command(init_db_command)
+    app.cli.add_command(repair_foreign_keys_command)
@@ -0,0 +1,52 @@
+from flask import Blueprint, jsonify
+
+from .cache import get_response_cache
+from .hot_tier import get_hot_tier
+from .slow_queries import get_slow_query_log
+
+# Endpoints exposing internal state for diagnostics. The blueprint is only
+# registered in debug mode or when `DEBUG_ENDPOINTS` is set.
+bp = Blueprint('debug', __name__, url_prefix='/_debug')
+
+
+@bp.route('/cache')
+def cache_stats():
+    """ cache_stats
+
+    Returns the counters of the response cache, or null if caching is disabled.
+    """
+    cache = get_response_cache()
+    return jsonify(cache.stats() if cache else None)
+
+
+@bp.route('/hot_tier')
+def hot_tier_stats():
+    """ hot_tier_stats
+
+    Returns the size of the in-memory hot tier, or null if it is disabled.
+    """
+    hot_tier = get_hot_tier()
+    return jsonify(hot_tier.stats() if hot_tier else None)
+
+
+@bp.route('/slow_queries')
+def slow_queries():
+    """ slow_queries
+
+    Returns the most recent slow statements with their parameters, duration,
+    endpoint and query plan, newest first, or null if they aren't recorded.
+    """
+    log = get_slow_query_log()
+    return jsonify(log.recent() if log else None)
+
+
+def init_app(app):
+    """ init_app
+
+    Parameters:
+        app - Flask app instance
+
+    Registers the debug endpoints in debug mode or when `DEBUG_ENDPOINTS` is set.
+    """
+    if app.debug or app.config['DEBUG_ENDPOINTS']:
+        app.register_blueprint(bp)
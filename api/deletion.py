@@ -0,0 +1,144 @@
+import itertools
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import delete, func, select
+
+from .bulk import delete_readings_in_chunks
+from .database import db_session, delete_cascading
+from .models import Building, Room, Sensor, SensorDataReadable
+
+
+def select_subtree_sensor_ids(model, id):
+    """ select_subtree_sensor_ids
+
+    Builds a SELECT statement for the ids of the sensors belonging to a record.
+
+    Parameters:
+        model - Building, Room or Sensor
+        id - id of the record
+
+    Returns:
+        SELECT statement of sensor ids
+    """
+    if model == Building:
+        return (select(Sensor.id)
+                .join(Room, Sensor.room_id == Room.id)
+                .where(Room.building_id == id))
+    if model == Room:
+        return select(Sensor.id).where(Sensor.room_id == id)
+    return select(Sensor.id).where(Sensor.id == id)
+
+
+class DeletionJob:
+    """ DeletionJob
+
+    Tracks the progress of a record and its subtree being deleted in the background.
+    """
+    _ids = itertools.count(1)
+
+    def __init__(self, model, record_id, total):
+        self.id = next(self._ids)
+        self.model = model
+        self.record_id = record_id
+        self.status = 'pending'
+        self.total = total
+        self.deleted = 0
+        self.error = None
+        # time.monotonic() of when the job completed or failed
+        self.finished_at = None
+
+    def _progress(self, count):
+        self.deleted += count
+
+    def run(self, app):
+        """ run
+
+        Deletes the subtree's readings in chunks and then the record itself,
+        whose remaining children are removed by `ON DELETE CASCADE`.
+
+        Parameters:
+            app - Flask app instance
+        """
+        with app.app_context():
+            self.status = 'running'
+            try:
+                sensor_ids = select_subtree_sensor_ids(self.model, self.record_id)
+                delete_readings_in_chunks(
+                    db_session,
+                    SensorDataReadable.sensor_id.in_(sensor_ids),
+                    app.config['BULK_CHUNK_SIZE'],
+                    self._progress)
+                delete_cascading(
+                    db_session, delete(self.model).where(self.model.id == self.record_id))
+                db_session.commit()
+                self.status = 'completed'
+            except Exception as e:
+                db_session.rollback()
+                self.status = 'failed'
+                self.error = str(e)
+            finally:
+                self.finished_at = time.monotonic()
+
+    def to_json(self):
+        """ to_json
+
+        Serializes the DeletionJob instance to a JSON object.
+        """
+        return {
+            "id": self.id,
+            "model": self.model.__name__,
+            "record_id": self.record_id,
+            "status": self.status,
+            "deleted": self.deleted,
+            "total": self.total,
+            "error": self.error,
+        }
+
+
+def get_deletion_jobs(app):
+    """ get_deletion_jobs
+
+    Returns the app's deletion jobs by id, after evicting the jobs that
+    finished more than `DELETION_JOB_TTL` seconds ago.
+    """
+    jobs = app.extensions.setdefault('deletion_jobs', {})
+    expired = time.monotonic() - app.config['DELETION_JOB_TTL']
+    for job_id, job in list(jobs.items()):
+        if job.finished_at is not None and job.finished_at < expired:
+            jobs.pop(job_id, None)
+    return jobs
+
+
+def start_deletion_job(model, record_id):
+    """ start_deletion_job
+
+    Starts deleting a record and its subtree on a background thread.
+
+    Parameters:
+        model - Building, Room or Sensor
+        record_id - id of the record
+
+    Returns:
+        the started DeletionJob
+    """
+    total = db_session.scalar(
+        select(func.count(SensorDataReadable.id))
+        .where(SensorDataReadable.sensor_id.in_(
+            select_subtree_sensor_ids(model, record_id))))
+    job = DeletionJob(model, record_id, total)
+
+    app = current_app._get_current_object()
+    get_deletion_jobs(app)[job.id] = job
+    threading.Thread(target=job.run, args=(app,), daemon=True).start()
+    return job
+
+
+def get_deletion_job(job_id):
+    """ get_deletion_job
+
+    Returns the deletion job with the given id, or None if it doesn't exist
+    or has expired.
+    """
+    return get_deletion_jobs(current_app).get(job_id)
@@ -0,0 +1,467 @@
+import bisect
+import datetime
+import math
+import threading
+from array import array
+
+from flask import current_app
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from .cache import REWRITES_SUFFIX, get_versions
+from .database import read_session
+from .models import SensorDataReadable
+from .readings import EPOCH, fetch_tuples, query_reading_ranges
+from .stats import parse_numeric
+
+# Number of readings a sensor's buffer holds before it first grows
+INITIAL_CAPACITY = 64
+# Bytes used per buffered reading: epoch, value and id (8 each) plus a unit code (2)
+READING_BYTES = 26
+# Smallest epoch, used as the start of buffers holding a sensor's every reading
+MIN_EPOCH = -(1 << 63)
+
+
+def to_epoch_micros(value):
+    """ to_epoch_micros
+
+    Converts a naive datetime, assumed to be in UTC, to integer epoch microseconds.
+    """
+    delta = value - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def format_number(number):
+    """ format_number
+
+    Returns the shortest string representing a float, without a trailing '.0'.
+    """
+    text = repr(number)
+    return text[:-2] if text.endswith('.0') else text
+
+
+class HotReading:
+    """ HotReading
+
+    A reading served from the hot tier, with the fields of the rows selected
+    with `READING_COLUMNS`.
+    """
+    __slots__ = ('id', 'sensor_id', 'value', 'units', 'datetime')
+
+    def __init__(self, id, sensor_id, value, units, dtime):
+        self.id = id
+        self.sensor_id = sensor_id
+        self.value = value
+        self.units = units
+        self.datetime = dtime
+
+
+class EpochView:
+    """ EpochView
+
+    Sequence of a buffer's epochs in chronological order, for bisecting the ring.
+    """
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+
+    def __len__(self):
+        return self.buffer.size
+
+    def __getitem__(self, index):
+        buffer = self.buffer
+        return buffer.epochs[(buffer.head + index) % buffer.capacity]
+
+
+class SensorBuffer:
+    """ SensorBuffer
+
+    Ring buffer of a sensor's most recent readings in chronological order,
+    stored in parallel typed arrays rather than one object per reading. Values
+    are stored as floats, and the original strings of values that a float
+    doesn't render back exactly are kept aside. The buffer holds every reading
+    of the sensor from `start` onwards.
+    """
+
+    def __init__(self, capacity, start=MIN_EPOCH):
+        self.capacity = capacity
+        self.epochs = array('q', [0]) * capacity
+        self.values = array('d', [0.0]) * capacity
+        self.ids = array('q', [0]) * capacity
+        self.units = array('H', [0]) * capacity
+        self.exceptions = {}
+        self.head = 0
+        self.size = 0
+        self.start = start
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self):
+        return self.capacity * READING_BYTES
+
+    def last_epoch(self):
+        return self.epochs[(self.head + self.size - 1) % self.capacity]
+
+    def items(self):
+        """ items
+
+        Returns the buffered (epoch, id, value, unit code) tuples in chronological order.
+        """
+        indexes = [(self.head + i) % self.capacity for i in range(self.size)]
+        return [(self.epochs[i], self.ids[i], self.values[i], self.units[i]) for i in indexes]
+
+    def resize(self, capacity, items=None):
+        """ resize
+
+        Reallocates the arrays with room for `capacity` readings, optionally
+        replacing the buffered readings with `items`.
+        """
+        items = self.items() if items is None else items
+        self.capacity = capacity
+        self.head = 0
+        self.size = len(items)
+        self.epochs = array('q', [item[0] for item in items])
+        self.ids = array('q', [item[1] for item in items])
+        self.values = array('d', [item[2] for item in items])
+        self.units = array('H', [item[3] for item in items])
+        padding = capacity - self.size
+        self.epochs.extend(array('q', [0]) * padding)
+        self.ids.extend(array('q', [0]) * padding)
+        self.values.extend(array('d', [0.0]) * padding)
+        self.units.extend(array('H', [0]) * padding)
+
+    def pop_oldest(self):
+        """ pop_oldest
+
+        Drops the oldest reading, after which the buffer no longer holds every
+        reading at its time.
+        """
+        index = self.head
+        self.exceptions.pop(self.ids[index], None)
+        self.start = max(self.start, self.epochs[index] + 1)
+        self.head = (index + 1) % self.capacity
+        self.size -= 1
+
+    def append(self, epoch, id, value, unit):
+        """ append
+
+        Adds a reading to the end of the buffer, overwriting the oldest
+        reading when the buffer is full.
+        """
+        if self.size == self.capacity:
+            self.pop_oldest()
+        index = (self.head + self.size) % self.capacity
+        self.epochs[index] = epoch
+        self.ids[index] = id
+        self.values[index] = value
+        self.units[index] = unit
+        self.size += 1
+
+    def insert(self, epoch, id, value, unit):
+        """ insert
+
+        Adds a reading that arrived out of order, by rebuilding the buffer.
+        """
+        items = self.items()
+        bisect.insort(items, (epoch, id, value, unit))
+        if len(items) > self.capacity:
+            dropped = items.pop(0)
+            self.exceptions.pop(dropped[1], None)
+            self.start = max(self.start, dropped[0] + 1)
+        self.resize(self.capacity, items)
+
+    def trim(self, cutoff):
+        """ trim
+
+        Drops the readings older than the `cutoff` epoch.
+        """
+        while self.size and self.epochs[self.head] < cutoff:
+            self.pop_oldest()
+        self.start = max(self.start, cutoff)
+
+    def covers(self, epoch_from, epoch_to, limit):
+        """ covers
+
+        Returns whether the buffer holds every reading a range query needs.
+        Without a start of the range, the buffer must hold at least `limit`
+        readings up to its end.
+        """
+        if epoch_from is not None:
+            return epoch_from >= self.start
+        if not limit:
+            return False
+        end = self.size if epoch_to is None else bisect.bisect_right(EpochView(self), epoch_to)
+        return end >= limit
+
+    def select(self, epoch_from, epoch_to, limit):
+        """ select
+
+        Returns the buffer positions of the readings in a range, in
+        chronological order. When a limit is given, the latest `limit`
+        readings in the range are selected.
+        """
+        view = EpochView(self)
+        lo = 0 if epoch_from is None else bisect.bisect_left(view, epoch_from)
+        hi = self.size if epoch_to is None else bisect.bisect_right(view, epoch_to)
+        if limit:
+            lo = max(lo, hi - limit)
+        return [(self.head + i) % self.capacity for i in range(lo, hi)]
+
+
+class HotTier:
+    """ HotTier
+
+    In-memory copy of the last `window_hours` of readings of each sensor,
+    relative to the sensor's latest reading, used to answer range queries
+    without reading the database. Units are dictionary encoded, so that each
+    reading stores a small integer code rather than a string.
+
+    The tier is kept in sync with the database using the data versions. New
+    readings are read incrementally by id, and the tier is reloaded after
+    readings are updated or deleted.
+    """
+
+    def __init__(self, window_hours, max_readings_per_sensor, max_bytes):
+        self.window = int(window_hours * 3600 * 1000000)
+        self.max_readings_per_sensor = max_readings_per_sensor
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.buffers = {}
+        # Sensors whose readings didn't fit in the memory cap
+        self.skipped = set()
+        self.unit_codes = {}
+        self.unit_names = []
+        self.nbytes = 0
+        self.max_id = 0
+        self.version = None
+        self.rewrites_version = None
+
+    def encode_unit(self, units):
+        code = self.unit_codes.get(units)
+        if code is None:
+            code = self.unit_codes[units] = len(self.unit_names)
+            self.unit_names.append(units)
+        return code
+
+    def reserve(self, buffer, capacity):
+        """ reserve
+
+        Grows a buffer to `capacity` readings if the memory cap allows it.
+        """
+        added = (capacity - buffer.capacity) * READING_BYTES
+        if self.nbytes + added > self.max_bytes:
+            return False
+        buffer.resize(capacity)
+        self.nbytes += added
+        return True
+
+    def add(self, id, sensor_id, value, units, dtime):
+        """ add
+
+        Adds a reading to its sensor's buffer, creating the buffer for sensors
+        that have no readings yet. Readings older than the buffered range are ignored.
+        """
+        if sensor_id in self.skipped:
+            return
+        buffer = self.buffers.get(sensor_id)
+        if buffer is None:
+            capacity = min(INITIAL_CAPACITY, self.max_readings_per_sensor)
+            if self.nbytes + capacity * READING_BYTES > self.max_bytes:
+                self.skipped.add(sensor_id)
+                return
+            buffer = self.buffers[sensor_id] = SensorBuffer(capacity)
+            self.nbytes += buffer.nbytes
+
+        epoch = to_epoch_micros(dtime)
+        if epoch < buffer.start:
+            return
+        if buffer.size == buffer.capacity and buffer.capacity < self.max_readings_per_sensor:
+            self.reserve(buffer, min(buffer.capacity * 2, self.max_readings_per_sensor))
+
+        number = parse_numeric(value)
+        if number is None:
+            number = math.nan
+        if format_number(number) != value:
+            buffer.exceptions[id] = value
+
+        unit = self.encode_unit(units)
+        if buffer.size and epoch < buffer.last_epoch():
+            buffer.insert(epoch, id, number, unit)
+        else:
+            buffer.append(epoch, id, number, unit)
+        buffer.trim(buffer.last_epoch() - self.window)
+
+    def load(self, rows):
+        for id, sensor_id, value, units, dtime in rows:
+            if isinstance(dtime, str):
+                dtime = datetime.datetime.fromisoformat(dtime)
+            self.add(id, sensor_id, value, units, dtime)
+            self.max_id = max(self.max_id, id)
+
+    def select_window(self):
+        """ select_window
+
+        Builds the statement selecting each sensor's readings within the
+        window of its latest reading.
+        """
+        window = datetime.timedelta(microseconds=self.window)
+        latest = (select(SensorDataReadable.sensor_id,
+                         func.max(SensorDataReadable.datetime).label('latest'))
+                  .group_by(SensorDataReadable.sensor_id)
+                  .subquery())
+        return (select(SensorDataReadable.id, SensorDataReadable.sensor_id,
+                       SensorDataReadable.value, SensorDataReadable.units,
+                       SensorDataReadable.datetime)
+                .join(latest, SensorDataReadable.sensor_id == latest.c.sensor_id)
+                .where(SensorDataReadable.datetime
+                       >= func.datetime(latest.c.latest, f'-{window.total_seconds()} seconds'))
+                .order_by(SensorDataReadable.sensor_id, SensorDataReadable.datetime,
+                          SensorDataReadable.id))
+
+    def sync(self, session):
+        """ sync
+
+        Brings the tier up to date with the database, reading only the readings
+        added since the last sync unless readings were updated or deleted.
+
+        Parameters:
+            session - database session used for the queries
+        """
+        table = SensorDataReadable.__tablename__
+        with self.lock:
+            versions = get_versions(session)
+            version = versions.get(table, 0)
+            rewrites_version = versions.get(table + REWRITES_SUFFIX, 0)
+            if self.version is None or rewrites_version != self.rewrites_version:
+                self.reset()
+                statement = self.select_window()
+            elif version != self.version:
+                statement = (select(SensorDataReadable.id, SensorDataReadable.sensor_id,
+                                    SensorDataReadable.value, SensorDataReadable.units,
+                                    SensorDataReadable.datetime)
+                             .where(SensorDataReadable.id > self.max_id)
+                             .order_by(SensorDataReadable.id))
+            else:
+                return
+            self.load(fetch_tuples(session, statement))
+            self.version, self.rewrites_version = version, rewrites_version
+
+    def query(self, spec):
+        """ query
+
+        Answers a range query from memory.
+
+        Parameters:
+            spec - dictionary with `sensor_id` and optional `datetime_from`,
+                   `datetime_to` and `limit` keys
+
+        Returns:
+            list of HotReading in chronological order, or None if the range
+            isn't fully held in memory
+        """
+        sensor_id = spec['sensor_id']
+        epoch_from, epoch_to = (None if spec.get(key) is None else to_epoch_micros(spec[key])
+                                for key in ('datetime_from', 'datetime_to'))
+        limit = spec.get('limit')
+        with self.lock:
+            buffer = self.buffers.get(sensor_id)
+            if buffer is None or not buffer.covers(epoch_from, epoch_to, limit):
+                return None
+            readings = []
+            for index in buffer.select(epoch_from, epoch_to, limit):
+                id = buffer.ids[index]
+                value = buffer.exceptions.get(id)
+                if value is None:
+                    value = format_number(buffer.values[index])
+                readings.append(HotReading(
+                    id, sensor_id, value, self.unit_names[buffer.units[index]],
+                    EPOCH + datetime.timedelta(microseconds=buffer.epochs[index])))
+            return readings
+
+    def stats(self):
+        with self.lock:
+            return {
+                'sensors': len(self.buffers),
+                'readings': sum(len(buffer) for buffer in self.buffers.values()),
+                'bytes': self.nbytes,
+                'max_bytes': self.max_bytes,
+                'skipped_sensors': len(self.skipped),
+            }
+
+
+def get_hot_tier(app=None):
+    """ get_hot_tier
+
+    Returns the app's hot tier, or None if it is disabled.
+    """
+    app = app or current_app
+    return app.extensions.get('hot_tier')
+
+
+def sync_hot_tier(session):
+    """ sync_hot_tier
+
+    Reads newly committed readings into the current app's hot tier, if it is enabled.
+    """
+    hot_tier = get_hot_tier()
+    if hot_tier:
+        hot_tier.sync(session)
+
+
+def warm_hot_tier(app):
+    """ warm_hot_tier
+
+    Loads the recent readings into the app's hot tier at startup, so the
+    first queries don't have to. Databases without tables are skipped.
+    """
+    hot_tier = get_hot_tier(app)
+    if not hot_tier:
+        return
+    with app.app_context():
+        try:
+            hot_tier.sync(read_session)
+        except SQLAlchemyError as e:
+            app.logger.warning('Could not warm the hot tier: %s', e)
+        finally:
+            read_session.remove()
+
+
+def query_ranges(session, specs):
+    """ query_ranges
+
+    Queries the readings for several (sensor, range, limit) specifications,
+    answering the ones held in the hot tier from memory and the rest with a
+    single statement. See `query_reading_ranges`.
+    """
+    results = [None] * len(specs)
+    hot_tier = get_hot_tier()
+    if hot_tier:
+        hot_tier.sync(session)
+        results = [hot_tier.query(spec) for spec in specs]
+
+    missing = [index for index, rows in enumerate(results) if rows is None]
+    if missing:
+        rows = query_reading_ranges(session, [specs[index] for index in missing])
+        for index, spec_rows in zip(missing, rows):
+            results[index] = spec_rows
+    return results
+
+
+def init_app(app):
+    """ init_app
+
+    Parameters:
+        app - Flask app instance
+
+    Creates the app's hot tier when `HOT_TIER_HOURS` is set.
+    """
+    if app.config['HOT_TIER_HOURS']:
+        app.extensions['hot_tier'] = HotTier(
+            app.config['HOT_TIER_HOURS'],
+            app.config['HOT_TIER_MAX_READINGS_PER_SENSOR'],
+            app.config['HOT_TIER_MAX_BYTES'])
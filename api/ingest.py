@@ -0,0 +1,311 @@
+import datetime
+import socket
+import socketserver
+import threading
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from .database import bulk_create_from_json_list, db_session
+from .hot_tier import sync_hot_tier
+from .models import Sensor, SensorDataReadable
+from .readings import EPOCH, MissingReadingsIndexError
+
+# Default port the ingestion listener binds to for both TCP and UDP
+DEFAULT_PORT = 8089
+# Default maximum number of readings inserted per statement
+DEFAULT_BATCH_SIZE = 5000
+# Default number of seconds pending readings are held before being written
+DEFAULT_FLUSH_INTERVAL = 1.0
+# Number of bytes read from a socket at a time
+RECEIVE_SIZE = 1 << 16
+
+
+def parse_line(line):
+    """ parse_line
+
+    Parses a single line protocol reading of the form `sensor_id value units epoch`,
+    e.g. `3 21.5 C 1679270400`, where epoch is the number of seconds since
+    1970-01-01 UTC.
+
+    Parameters:
+        line - bytes or string of the line
+
+    Returns:
+        dictionary of the reading's fields
+    """
+    if isinstance(line, bytes):
+        line = line.decode()
+    fields = line.split()
+    if len(fields) != 4:
+        raise ValueError(f'Expected 4 fields but found {len(fields)}')
+
+    sensor_id, value, units, epoch = fields
+    return {
+        'sensor_id': int(sensor_id),
+        'value': value,
+        'units': units,
+        'datetime': EPOCH + datetime.timedelta(seconds=float(epoch)),
+    }
+
+
+def parse_lines(lines):
+    """ parse_lines
+
+    Parses a batch of line protocol readings, skipping blank lines.
+
+    Parameters:
+        lines - iterable of bytes or strings
+
+    Returns:
+        readings - list of parsed readings
+        errors - list of (line, error message) pairs for lines that couldn't be parsed
+    """
+    readings = []
+    errors = []
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            readings.append(parse_line(line))
+        except (ValueError, UnicodeDecodeError, OverflowError) as e:
+            errors.append((line, str(e)))
+    return readings, errors
+
+
+def find_unknown_sensors(readings):
+    """ find_unknown_sensors
+
+    Checks that the sensors of a batch of readings exist using a single query.
+
+    Parameters:
+        readings - list of readings
+
+    Returns:
+        set of sensor ids that have no sensor record
+    """
+    sensor_ids = {reading['sensor_id'] for reading in readings}
+    existing = db_session.scalars(
+        select(Sensor.id).where(Sensor.id.in_(sensor_ids)))
+    return sensor_ids.difference(existing)
+
+
+def ingest_readings(readings):
+    """ ingest_readings
+
+    Bulk inserts a batch of already parsed readings. This is the write path
+    shared by batch POST requests to '/sensor_data' and the ingestion listener.
+    Readings a sensor already has are skipped, so retried batches are
+    idempotent. The new readings are added to the hot tier, if it is enabled.
+
+    Parameters:
+        readings - list of readings whose sensors are known to exist
+
+    Returns:
+        success - whether the readings were created successfully
+        message - error message if creation fails
+        created - number of readings created
+    """
+    if not readings:
+        return True, '', 0
+    success, message, created = bulk_create_from_json_list(readings, SensorDataReadable)
+    if success:
+        sync_hot_tier(db_session)
+    return success, message, created
+
+
+class LineProtocolWriter:
+    """ LineProtocolWriter
+
+    Parses and writes batches of line protocol readings received by the
+    listeners. Writes are serialized, since SQLite only allows a single writer.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.lock = threading.Lock()
+
+    def write(self, lines):
+        """ write
+
+        Parses a batch of lines and inserts the valid readings. Invalid lines and
+        readings for unknown sensors are logged and dropped. Database errors,
+        e.g. when the database is locked, are logged and the batch is dropped,
+        so that the listeners keep serving.
+
+        Parameters:
+            lines - list of bytes
+        """
+        readings, errors = parse_lines(lines)
+        logger = self.app.logger
+        for line, message in errors:
+            logger.warning('Dropped invalid line %r: %s', line, message)
+
+        with self.lock, self.app.app_context():
+            try:
+                if readings:
+                    unknown = find_unknown_sensors(readings)
+                    if unknown:
+                        logger.warning('Dropped readings for unknown sensors: %s',
+                                       sorted(unknown))
+                        readings = [reading for reading in readings
+                                    if reading['sensor_id'] not in unknown]
+
+                success, message, created = ingest_readings(readings)
+            except (SQLAlchemyError, MissingReadingsIndexError):
+                db_session.rollback()
+                logger.exception('Failed to write %d readings', len(readings))
+                return
+            if not success:
+                logger.error('Failed to write %d readings: %s', len(readings), message)
+            elif created < len(readings):
+                logger.info('Skipped %d duplicate readings', len(readings) - created)
+
+
+class LineProtocolTCPHandler(socketserver.BaseRequestHandler):
+    """ LineProtocolTCPHandler
+
+    Reads newline separated readings from a TCP connection, writing them in
+    batches of up to `batch_size` readings, or whenever the connection has been
+    idle for `flush_interval` seconds.
+    """
+
+    def handle(self):
+        server = self.server
+        self.request.settimeout(server.flush_interval)
+        pending = []
+        remainder = b''
+        while True:
+            try:
+                data = self.request.recv(RECEIVE_SIZE)
+            except socket.timeout:
+                if pending:
+                    server.writer.write(pending)
+                    pending = []
+                continue
+            if not data:
+                break
+
+            lines = (remainder + data).split(b'\n')
+            remainder = lines.pop()
+            pending.extend(lines)
+            if len(pending) >= server.batch_size:
+                server.writer.write(pending)
+                pending = []
+
+        pending.append(remainder)
+        server.writer.write(pending)
+
+
+class LineProtocolTCPServer(socketserver.ThreadingTCPServer):
+    """ LineProtocolTCPServer
+
+    Threaded TCP server handling one connection per thread.
+    """
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, writer, batch_size, flush_interval):
+        self.writer = writer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        super().__init__(address, LineProtocolTCPHandler)
+
+
+def serve_udp(sock, writer, batch_size, flush_interval):
+    """ serve_udp
+
+    Receives datagrams of newline separated readings on a bound UDP socket,
+    writing them in batches of up to `batch_size` readings, or every
+    `flush_interval` seconds.
+
+    Parameters:
+        sock - bound UDP socket
+        writer - LineProtocolWriter instance
+        batch_size - maximum number of readings written at a time
+        flush_interval - maximum number of seconds readings are held before being written
+    """
+    sock.settimeout(flush_interval)
+    pending = []
+    last_flush = time.monotonic()
+    while True:
+        try:
+            data, _ = sock.recvfrom(RECEIVE_SIZE)
+            pending.extend(data.split(b'\n'))
+        except socket.timeout:
+            pass
+
+        now = time.monotonic()
+        if pending and (len(pending) >= batch_size or now - last_flush >= flush_interval):
+            writer.write(pending)
+            pending = []
+            last_flush = now
+
+
+@click.command('ingest')
+@with_appcontext
+@click.option('--host', default='127.0.0.1', show_default=True,
+              help='Address the listener binds to')
+@click.option('--port', default=DEFAULT_PORT, show_default=True, type=int,
+              help='Port the listener binds to')
+@click.option('--protocol', default='both', show_default=True,
+              type=click.Choice(['tcp', 'udp', 'both']),
+              help='Transport protocols to listen on')
+@click.option('--batch-size', default=DEFAULT_BATCH_SIZE, show_default=True,
+              type=click.IntRange(min=1),
+              help='Maximum number of readings inserted per statement')
+@click.option('--flush-interval', default=DEFAULT_FLUSH_INTERVAL, show_default=True,
+              type=click.FloatRange(min=0, min_open=True),
+              help='Maximum number of seconds readings are held before being written')
+def ingest_command(host, port, protocol, batch_size, flush_interval):
+    """ ingest
+
+    Starts a listener accepting sensor readings in a compact line protocol,
+    one `sensor_id value units epoch` reading per line, over TCP and/or UDP.
+
+    Parameters:
+        host - address the listener binds to
+        port - port the listener binds to
+        protocol - 'tcp', 'udp' or 'both'
+        batch_size - maximum number of readings inserted per statement
+        flush_interval - maximum number of seconds readings are held before being written
+    """
+    writer = LineProtocolWriter(current_app._get_current_object())
+    threads = []
+
+    if protocol in ('tcp', 'both'):
+        tcp_server = LineProtocolTCPServer(
+            (host, port), writer, batch_size, flush_interval)
+        threads.append(threading.Thread(target=tcp_server.serve_forever, daemon=True))
+        click.echo(f'Listening for TCP readings on {host}:{port}')
+
+    if protocol in ('udp', 'both'):
+        udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        udp_socket.bind((host, port))
+        threads.append(threading.Thread(
+            target=serve_udp, args=(udp_socket, writer, batch_size, flush_interval),
+            daemon=True))
+        click.echo(f'Listening for UDP readings on {host}:{port}')
+
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        click.echo('Stopping ingestion listener.')
+
+
+def init_app(app):
+    """ init_app
+
+    Parameters:
+        app - Flask app instance
+
+    Registers the `ingest_command` with the application.
+    """
+    app.cli.add_command(ingest_command)
@@ -0,0 +1,217 @@
+import codecs
+import datetime
+import json
+
+# Number of bytes read from a seed file at a time
+READ_BLOCK_SIZE = 1 << 16
+
+# File extensions that are treated as newline delimited JSON
+NDJSON_EXTENSIONS = ('.ndjson', '.jsonl')
+
+
+class SeedFormatError(ValueError):
+    """ SeedFormatError
+
+    Raised when a seed file does not follow the expected structure.
+    """
+
+
+def parse_datetime(value):
+    """ parse_datetime
+
+    Parses an ISO 8601 formatted date/time string, e.g. `2023-03-01 00:00:00`.
+    `datetime.fromisoformat` is implemented in C and is considerably faster
+    than `datetime.strptime` for large numbers of readings.
+
+    Parameters:
+        value - date/time string
+
+    Returns:
+        datetime object
+    """
+    return datetime.datetime.fromisoformat(value)
+
+
+class JSONStreamReader:
+    """ JSONStreamReader
+
+    Incrementally parses a seed file of the form `{"Model": [{...}, ...], ...}`,
+    yielding one record at a time so that the whole file never has to be held
+    in memory.
+    """
+
+    def __init__(self, fp, on_read=None, block_size=READ_BLOCK_SIZE):
+        """
+        Parameters:
+            fp - file object opened in binary mode
+            on_read - optional callback receiving the number of bytes read
+            block_size - number of bytes read from `fp` at a time
+        """
+        self.fp = fp
+        self.on_read = on_read
+        self.block_size = block_size
+        self.text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self.json_decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        """ _fill
+
+        Reads the next block of the file into the buffer, discarding
+        the part of the buffer that has already been consumed.
+        """
+        data = self.fp.read(self.block_size)
+        if self.on_read and data:
+            self.on_read(len(data))
+        self.buffer = self.buffer[self.pos:] + \
+            self.text_decoder.decode(data, final=not data)
+        self.pos = 0
+        self.eof = not data
+
+    def _next_char(self, consume=True):
+        """ _next_char
+
+        Returns the next non-whitespace character, or None at the end of the file.
+        """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                char = self.buffer[self.pos]
+                if consume:
+                    self.pos += 1
+                return char
+            if self.eof:
+                return None
+            self._fill()
+
+    def _expect(self, expected):
+        char = self._next_char()
+        if char not in expected:
+            raise SeedFormatError(
+                f'Expected one of {expected!r} but found {char!r}')
+        return char
+
+    def _decode_value(self):
+        """ _decode_value
+
+        Decodes the next JSON value, reading more of the file until the
+        value is complete.
+        """
+        self._next_char(consume=False)
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(
+                    self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                if self.eof:
+                    raise SeedFormatError(str(e)) from e
+                self._fill()
+                continue
+
+            # A value ending exactly at the end of the buffer (e.g. a number)
+            # may continue in the next block.
+            if end == len(self.buffer) and not self.eof:
+                self._fill()
+                continue
+
+            self.pos = end
+            return value
+
+    def __iter__(self):
+        """ __iter__
+
+        Yields (model name, record) pairs in file order.
+        """
+        self._expect('{')
+        if self._next_char(consume=False) == '}':
+            return
+
+        while True:
+            name = self._decode_value()
+            if not isinstance(name, str):
+                raise SeedFormatError(f'Expected a model name but found {name!r}')
+            self._expect(':')
+            self._expect('[')
+            if self._next_char(consume=False) == ']':
+                self._next_char()
+            else:
+                while True:
+                    yield name, self._decode_value()
+                    if self._expect(',]') == ']':
+                        break
+            if self._expect(',}') == '}':
+                break
+
+
+def iter_ndjson_records(fp, on_read=None):
+    """ iter_ndjson_records
+
+    Reads a newline delimited JSON seed file, where every line is a record
+    with an additional `model` key naming the model it belongs to, e.g.
+    `{"model": "Building", "name": "building", "description": "desc"}`.
+
+    Parameters:
+        fp - file object opened in binary mode
+        on_read - optional callback receiving the number of bytes read
+
+    Returns:
+        generator of (model name, record) pairs
+    """
+    for line_number, line in enumerate(fp, start=1):
+        if on_read:
+            on_read(len(line))
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            name = record.pop('model')
+        except (json.JSONDecodeError, KeyError, AttributeError, TypeError) as e:
+            raise SeedFormatError(
+                f'Invalid record on line {line_number}: {e}') from e
+        yield name, record
+
+
+def iter_seed_records(fp, path, on_read=None):
+    """ iter_seed_records
+
+    Selects the reader for a seed file based on its extension.
+
+    Parameters:
+        fp - file object opened in binary mode
+        path - path of the seed file
+        on_read - optional callback receiving the number of bytes read
+
+    Returns:
+        generator of (model name, record) pairs
+    """
+    if path.lower().endswith(NDJSON_EXTENSIONS):
+        return iter_ndjson_records(fp, on_read)
+    return iter(JSONStreamReader(fp, on_read))
+
+
+def iter_chunks(records, chunk_size):
+    """ iter_chunks
+
+    Groups consecutive records of the same model into lists of at most
+    `chunk_size` records.
+
+    Parameters:
+        records - iterable of (model name, record) pairs
+        chunk_size - maximum number of records per chunk
+
+    Returns:
+        generator of (model name, list of records) pairs
+    """
+    current_name = None
+    chunk = []
+    for name, record in records:
+        if chunk and (name != current_name or len(chunk) >= chunk_size):
+            yield current_name, chunk
+            chunk = []
+        current_name = name
+        chunk.append(record)
+    if chunk:
+        yield current_name, chunk
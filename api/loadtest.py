@@ -0,0 +1,487 @@
+import datetime
+import http.client
+import itertools
+import json
+import random
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from .constants import DATETIME_FORMAT_STRING
+
+# Kinds of requests a load test sends:
+#   read - the latest readings of a sensor
+#   ingest - a batch of new readings for a sensor
+#   listing - the buildings, the rooms of a building or the sensors of a room
+OPERATIONS = ('read', 'ingest', 'listing')
+DEFAULT_MIX = 'read=80,ingest=15,listing=5'
+
+# Latency percentiles reported by load tests
+PERCENTILES = (50, 95, 99)
+
+# Number of readings returned by read requests
+READ_LIMIT = 100
+
+
+def parse_mix(text):
+    """ parse_mix
+
+    Parses a request mix such as `read=80,ingest=15,listing=5` into the
+    relative weights of the operations. Operations left out aren't sent.
+    """
+    mix = {}
+    for item in filter(None, text.split(',')):
+        operation, _, weight = item.partition('=')
+        operation = operation.strip()
+        if operation not in OPERATIONS:
+            raise ValueError(f'Unknown operation {operation!r}, expected one of '
+                             f'{", ".join(OPERATIONS)}')
+        try:
+            mix[operation] = float(weight)
+        except ValueError:
+            raise ValueError(f'Invalid weight for {operation}: {weight!r}')
+        if mix[operation] < 0:
+            raise ValueError(f'The weight of {operation} must not be negative')
+    if not any(mix.values()):
+        raise ValueError('The mix must give a positive weight to an operation')
+    return mix
+
+
+def percentile(values, percent):
+    """ percentile
+
+    Returns the nearest-rank percentile of sorted values, or None if there are none.
+    """
+    if not values:
+        return None
+    rank = max(1, -(-len(values) * percent // 100))
+    return values[int(rank) - 1]
+
+
+class Workload:
+    """ Workload
+
+    Generates the requests of a load test from a mix of operations, over the
+    buildings, rooms and sensors of the target.
+    """
+
+    def __init__(self, mix, sensors, rooms, batch_size):
+        """
+        Parameters:
+            mix - dictionary of the relative weights of the operations
+            sensors - list of (sensor id, room id) tuples
+            rooms - list of (room id, building id) tuples
+            batch_size - number of readings posted by ingest requests
+        """
+        self.operations = list(mix)
+        self.weights = [mix[operation] for operation in self.operations]
+        self.sensors = sensors
+        self.buildings = dict(rooms)
+        self.batch_size = batch_size
+        # Every posted reading gets its own second, so retried or concurrent
+        # batches never repeat the datetime of a sensor's reading
+        self.start = datetime.datetime.now().replace(microsecond=0)
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+
+    def next_datetime(self):
+        with self.lock:
+            seconds = next(self.counter)
+        return (self.start + datetime.timedelta(seconds=seconds)).strftime(
+            DATETIME_FORMAT_STRING)
+
+    def next_request(self, rng):
+        """ next_request
+
+        Picks the next request of the mix.
+
+        Parameters:
+            rng - random.Random instance of the calling thread
+
+        Returns:
+            operation, method, path and JSON body (or None) of the request
+        """
+        operation = rng.choices(self.operations, self.weights)[0]
+        sensor_id, room_id = rng.choice(self.sensors)
+        if operation == 'read':
+            return (operation, 'GET',
+                    f'/sensor_data/?sensor_id={sensor_id}&order=-datetime&limit={READ_LIMIT}',
+                    None)
+        if operation == 'ingest':
+            body = [{
+                'value': f'{rng.uniform(15, 30):.2f}',
+                'units': 'C',
+                'sensor_id': sensor_id,
+                'datetime': self.next_datetime(),
+            } for _ in range(self.batch_size)]
+            return operation, 'POST', '/sensor_data/', body
+        path = rng.choice(('/buildings/', f'/sensors/?room_id={room_id}',
+                           f'/rooms/?building_id={self.buildings.get(room_id, 0)}'))
+        return operation, 'GET', path, None
+
+
+class ClientTarget:
+    """ ClientTarget
+
+    Sends requests to an app in process, with a test client per thread.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def request(self, method, path, body):
+        """ request
+
+        Returns the status code and JSON body of a response.
+        """
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        response = client.open(path, method=method, json=body)
+        return response.status_code, response.get_json(silent=True)
+
+
+class HTTPTarget:
+    """ HTTPTarget
+
+    Sends requests to a server, with a connection per thread that is kept
+    open while the server allows it.
+    """
+
+    def __init__(self, url, timeout=30):
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ValueError(f'Invalid server URL: {url}')
+        self.connection_class = (http.client.HTTPSConnection if parts.scheme == 'https'
+                                 else http.client.HTTPConnection)
+        self.host = parts.hostname
+        self.port = parts.port
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def request(self, method, path, body):
+        """ request
+
+        Returns the status code and JSON body of a response.
+        """
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.local.connection = self.connection_class(
+                self.host, self.port, timeout=self.timeout)
+        headers = {'Accept': 'application/json'}
+        data = None
+        if body is not None:
+            data = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        try:
+            connection.request(method, self.prefix + path, data, headers)
+            response = connection.getresponse()
+            content = response.read()
+        except Exception:
+            connection.close()
+            self.local.connection = None
+            raise
+        if response.will_close:
+            connection.close()
+            self.local.connection = None
+        try:
+            return response.status, json.loads(content)
+        except ValueError:
+            return response.status, None
+
+
+def discover(target):
+    """ discover
+
+    Lists the sensors and rooms of the target that requests are sent for.
+
+    Returns:
+        sensors - list of (sensor id, room id) tuples
+        rooms - list of (room id, building id) tuples
+    """
+    lists = []
+    for path, parent in (('/sensors/', 'room_id'), ('/rooms/', 'building_id')):
+        path = f'{path}?fields=id,{parent}'
+        status, records = target.request('GET', path, None)
+        if status != 200:
+            raise RuntimeError(f'GET {path} returned {status}')
+        lists.append([(record['id'], record[parent]) for record in records])
+    return lists[0], lists[1]
+
+
+class LoadRecorder:
+    """ LoadRecorder
+
+    Thread safe record of the latencies of a load test, kept in total and
+    for the current reporting interval.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.totals = {}
+        self.interval = []
+        self.interval_errors = 0
+
+    def add(self, operation, latency, ok):
+        with self.lock:
+            latencies, errors = self.totals.setdefault(operation, ([], [0]))
+            latencies.append(latency)
+            if not ok:
+                errors[0] += 1
+                self.interval_errors += 1
+            self.interval.append(latency)
+
+    def take_interval(self):
+        """ take_interval
+
+        Returns the sorted latencies and number of errors since the last
+        call, and starts a new interval.
+        """
+        with self.lock:
+            latencies, errors = self.interval, self.interval_errors
+            self.interval, self.interval_errors = [], 0
+        return sorted(latencies), errors
+
+    def summary(self, elapsed):
+        """ summary
+
+        Returns the requests, errors, throughput and latency percentiles of
+        each operation, and of all of them, over the whole test.
+        """
+        with self.lock:
+            totals = {operation: (sorted(latencies), errors[0])
+                      for operation, (latencies, errors) in self.totals.items()}
+        combined = sorted(itertools.chain.from_iterable(
+            latencies for latencies, _ in totals.values()))
+        totals['total'] = (combined, sum(errors for _, errors in totals.values()))
+        return {operation: latency_summary(latencies, errors, elapsed)
+                for operation, (latencies, errors) in totals.items()}
+
+
+def latency_summary(latencies, errors, elapsed):
+    """ latency_summary
+
+    Summarizes sorted latencies, in seconds, measured over `elapsed` seconds.
+    """
+    summary = {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+    }
+    for percent in PERCENTILES:
+        value = percentile(latencies, percent)
+        summary[f'p{percent}_ms'] = None if value is None else value * 1000
+    summary['max_ms'] = latencies[-1] * 1000 if latencies else None
+    return summary
+
+
+def format_ms(value):
+    return f'{value:9.1f}' if value is not None else f'{"-":>9}'
+
+
+def format_interval(elapsed, interval, latencies, errors):
+    """ format_interval
+
+    Formats a line of the report of a load test for an interval.
+    """
+    values = [percentile(latencies, percent) for percent in PERCENTILES]
+    values.append(latencies[-1] if latencies else None)
+    return (f'{elapsed:7.1f} {len(latencies) / interval:9.1f} {errors:7} '
+            + ' '.join(format_ms(None if value is None else value * 1000)
+                       for value in values))
+
+
+def interval_header():
+    return (f'{"time s":>7} {"req/s":>9} {"errors":>7} '
+            + ' '.join(f'{f"p{percent} ms":>9}' for percent in PERCENTILES)
+            + f' {"max ms":>9}')
+
+
+def run_load(target, workload, duration, concurrency, rate=None, interval=1.0,
+             report=None, seed=None):
+    """ run_load
+
+    Sends the requests of a workload to a target for `duration` seconds.
+
+    Without a rate, `concurrency` threads each send their next request as
+    soon as the previous one completes (a closed loop). With a rate,
+    requests arrive as a Poisson process of `rate` requests per second
+    regardless of how quickly they complete (an open loop), and are sent by
+    up to `concurrency` threads. Latencies of an open loop are measured from
+    the scheduled arrival of a request, so that time spent waiting for a
+    free thread counts towards them once the target saturates.
+
+    Parameters:
+        target - ClientTarget or HTTPTarget instance
+        workload - Workload instance
+        duration - number of seconds requests are sent for
+        concurrency - number of threads sending requests
+        rate - arrival rate of an open loop, in requests per second, or None
+        interval - number of seconds between the lines passed to `report`
+        report - function called with each line of the report over time
+        seed - seed of the random choices of requests
+
+    Returns:
+        recorder - LoadRecorder of the test
+        elapsed - number of seconds the test took
+        backlog - number of arrivals of an open loop that were never sent
+    """
+    recorder = LoadRecorder()
+    seeds = random.Random(seed)
+    local = threading.local()
+    lock = threading.Lock()
+
+    def send(scheduled=None):
+        rng = getattr(local, 'rng', None)
+        if rng is None:
+            with lock:
+                rng = local.rng = random.Random(seeds.random())
+        operation, method, path, body = workload.next_request(rng)
+        started = time.perf_counter()
+        try:
+            status, _ = target.request(method, path, body)
+            ok = status < 400
+        except Exception:
+            ok = False
+        recorder.add(operation, time.perf_counter() - (scheduled or started), ok)
+
+    stop = threading.Event()
+    start = time.perf_counter()
+    deadline = start + duration
+
+    def reporter():
+        last = start
+        if report:
+            report(interval_header())
+        while not stop.wait(max(0.0, last + interval - time.perf_counter())):
+            now = time.perf_counter()
+            latencies, errors = recorder.take_interval()
+            if report:
+                report(format_interval(now - start, now - last, latencies, errors))
+            last = now
+
+    reporting = threading.Thread(target=reporter, daemon=True)
+    reporting.start()
+
+    backlog = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        if rate is None:
+            def loop():
+                while time.perf_counter() < deadline:
+                    send()
+
+            for future in [executor.submit(loop) for _ in range(concurrency)]:
+                future.result()
+        else:
+            arrivals = random.Random(seeds.random())
+            scheduled = start
+            futures = []
+            while True:
+                scheduled += arrivals.expovariate(rate)
+                if scheduled >= deadline:
+                    break
+                time.sleep(max(0.0, scheduled - time.perf_counter()))
+                futures.append(executor.submit(send, scheduled))
+            # Arrivals still queued at the end of the test are dropped
+            backlog = sum(future.cancel() for future in futures)
+
+    elapsed = time.perf_counter() - start
+    stop.set()
+    reporting.join()
+    return recorder, elapsed, backlog
+
+
+@click.command('loadtest')
+@with_appcontext
+@click.option('--url', default=None,
+              help='URL of a running server, e.g. http://127.0.0.1:5000 '
+                   '(the app is tested in process when omitted)')
+@click.option('--mix', default=DEFAULT_MIX, show_default=True,
+              help='Relative weights of the read, ingest and listing requests')
+@click.option('--duration', '-d', default=10.0, show_default=True,
+              type=click.FloatRange(min=0, min_open=True),
+              help='Number of seconds requests are sent for')
+@click.option('--concurrency', '-c', default=8, show_default=True,
+              type=click.IntRange(min=1),
+              help='Number of threads sending requests')
+@click.option('--rate', '-r', default=None,
+              type=click.FloatRange(min=0, min_open=True),
+              help='Open loop arrival rate in requests per second '
+                   '(each thread sends requests back to back when omitted)')
+@click.option('--batch-size', default=10, show_default=True,
+              type=click.IntRange(min=1),
+              help='Number of readings posted by each ingest request')
+@click.option('--interval', default=1.0, show_default=True,
+              type=click.FloatRange(min=0, min_open=True),
+              help='Number of seconds between lines of the report')
+@click.option('--seed', default=None, type=int,
+              help='Seed of the random choices of requests')
+def loadtest_command(url, mix, duration, concurrency, rate, batch_size, interval, seed):
+    """ loadtest
+
+    Drives a mix of sensor reading queries, ingest posts and hierarchy
+    listings against a server or the app in process, reporting throughput
+    and latency percentiles over time and in total. Raising the rate or
+    concurrency until latencies climb finds the saturation point of a
+    database and worker configuration.
+
+    Parameters:
+        url - URL of a running server, or None to test the app in process
+        mix - relative weights of the operations, e.g. 'read=80,ingest=15,listing=5'
+        duration - number of seconds requests are sent for
+        concurrency - number of threads sending requests
+        rate - open loop arrival rate in requests per second, or None
+        batch_size - number of readings posted by each ingest request
+        interval - number of seconds between lines of the report
+        seed - seed of the random choices of requests
+    """
+    try:
+        weights = parse_mix(mix)
+        target = HTTPTarget(url) if url else ClientTarget(current_app._get_current_object())
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+    try:
+        sensors, rooms = discover(target)
+    except (OSError, RuntimeError) as e:
+        raise click.ClickException(f'Could not list the sensors of the target: {e}')
+    if not sensors:
+        raise click.ClickException('The target has no sensors to send requests for.')
+
+    workload = Workload(weights, sensors, rooms, batch_size)
+    click.echo(f'Sending {mix} to {url or "the app in process"} for {duration:g}s with '
+               f'{concurrency} threads'
+               + (f' at {rate:g} requests/s' if rate else ''))
+    recorder, elapsed, backlog = run_load(target, workload, duration, concurrency,
+                                          rate, interval, click.echo, seed)
+
+    click.echo()
+    click.echo(f'{"operation":<10} {"requests":>9} {"errors":>7} {"req/s":>9} '
+               + ' '.join(f'{f"p{percent} ms":>9}' for percent in PERCENTILES)
+               + f' {"max ms":>9}')
+    for operation, summary in recorder.summary(elapsed).items():
+        click.echo(f'{operation:<10} {summary["requests"]:>9} {summary["errors"]:>7} '
+                   f'{summary["throughput"]:>9.1f} '
+                   + ' '.join(format_ms(summary[f'p{percent}_ms']) for percent in PERCENTILES)
+                   + f' {format_ms(summary["max_ms"])}')
+    if backlog:
+        click.echo(f'{backlog} arrivals were never sent: the target is saturated '
+                   f'at this rate and concurrency.')
+
+
+def init_app(app):
+    """ init_app
+
+    Parameters:
+        app - Flask app instance
+
+    Registers the `loadtest_command` with the application.
+    """
+    app.cli.add_command(loadtest_command)
@@ -1,7 +1,8 @@
 from datetime import datetime
 from typing import List
-from sqlalchemy import Column, String, DateTime, ForeignKey, Integer
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import (CheckConstraint, Column, String, DateTime, Float, ForeignKey,
+                        Index, Integer, LargeBinary)
+from sqlalchemy.orm import Mapped, mapped_column, object_session, relationship
 
 from api.database import Base
 
@@ -17,7 +18,8 @@ class Building(Base):
     name = Column(String(255), nullable=False)
     description = Column(String(255), nullable=False)
     rooms: Mapped[List["Room"]] = relationship(
-        "Room", back_populates="building", foreign_keys="Room.building_id", cascade='all, delete')
+        "Room", back_populates="building", foreign_keys="Room.building_id",
+        cascade='all, delete', passive_deletes=True)
 
     __mapper_args__ = {'polymorphic_identity': 'building'}
 
@@ -65,10 +67,12 @@ class Room(Base):
     name = Column(String(255), nullable=False)
     description = Column(String(255), nullable=False)
     sensors: Mapped[List["Sensor"]] = relationship(
-        "Sensor", back_populates="room", foreign_keys="Sensor.room_id", cascade='all, delete')
-    building_id: Mapped[int] = mapped_column(ForeignKey("building.id"))
+        "Sensor", back_populates="room", foreign_keys="Sensor.room_id",
+        cascade='all, delete', passive_deletes=True)
+    building_id: Mapped[int] = mapped_column(
+        ForeignKey("building.id", ondelete='CASCADE'))
     building: Mapped["Building"] = relationship(
-        back_populates="rooms", foreign_keys=building_id, cascade='all, delete')
+        back_populates="rooms", foreign_keys=building_id)
 
     __mapper_args__ = {'polymorphic_identity': 'room'}
 
@@ -119,10 +123,11 @@ class Sensor(Base):
     name = Column(String(255), nullable=False)
     description = Column(String(255), nullable=False)
     data: Mapped[List["SensorDataReadable"]] = relationship(
-        "SensorDataReadable", back_populates="sensor", foreign_keys="SensorDataReadable.sensor_id", cascade='all, delete')
-    room_id: Mapped[int] = mapped_column(ForeignKey("room.id"))
+        "SensorDataReadable", back_populates="sensor", foreign_keys="SensorDataReadable.sensor_id",
+        cascade='all, delete', passive_deletes=True)
+    room_id: Mapped[int] = mapped_column(ForeignKey("room.id", ondelete='CASCADE'))
     room: Mapped["Room"] = relationship(
-        back_populates="sensors", foreign_keys=room_id, cascade='all, delete')
+        back_populates="sensors", foreign_keys=room_id)
 
     __mapper_args__ = {'polymorphic_identity': 'sensor'}
 
@@ -149,11 +154,18 @@ class Sensor(Base):
         """ to_json
 
         Serializes the Sensor instance to a JSON object, where each key/value
-        pair corresponds to the Sensor's fields.
+        pair corresponds to the Sensor's fields. The data includes the
+        sensor's archived readings.
         """
 
+        # Avoid circular import
+        from .archive import archived_to_json, iter_archived, merge_readings
+
         # This will need to change to prevent "dumping" a large partition of the database into JSON
-        data_json = [data.to_json() for data in self.data]
+        archived = list(iter_archived(object_session(self), self.id))
+        data_json = [data.to_json() if isinstance(data, SensorDataReadable)
+                     else archived_to_json(data, self.name)
+                     for data in merge_readings(self.data, archived)]
         return {
             "name": self.name,
             "description": self.description,
@@ -175,9 +187,19 @@ class SensorDataReadable(Base):
     value = Column(String(255), nullable=False)
     units = Column(String(255), nullable=False)
     datetime = Column(DateTime, nullable=False)
-    sensor_id: Mapped[int] = mapped_column(ForeignKey("sensor.id"))
+    sensor_id: Mapped[int] = mapped_column(ForeignKey("sensor.id", ondelete='CASCADE'))
     sensor: Mapped["Sensor"] = relationship(
-        back_populates="data", foreign_keys=sensor_id, cascade='all, delete')
+        back_populates="data", foreign_keys=sensor_id)
+
+    # Composite index used for querying a sensor's readings over a time range.
+    # It is unique, so a sensor has at most one reading per datetime and
+    # retried writes are dropped by `insert_readings`. Ids are never reused,
+    # since archived readings keep theirs (see `api.archive`).
+    __table_args__ = (
+        Index('ix_sensor_data_readable_sensor_id_datetime', 'sensor_id', 'datetime',
+              unique=True),
+        {'sqlite_autoincrement': True},
+    )
 
     __mapper_args__ = {'polymorphic_identity': 'sdr'}
 
@@ -219,3 +241,225 @@ class SensorDataReadable(Base):
             "units": self.units,
             "datetime": datetime.strftime(self.datetime, DATETIME_FORMAT_STRING)
         }
+
+
+class SensorStats(Base):
+    """ SensorStats
+
+    Model class holding incrementally maintained statistics of a sensor's data.
+    Only values that can be parsed as numbers contribute to `total`, `min` and `max`.
+    """
+    __tablename__ = "sensor_stats"
+
+    sensor_id: Mapped[int] = mapped_column(
+        ForeignKey("sensor.id", ondelete='CASCADE'), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    numeric_count = Column(Integer, nullable=False, default=0)
+    total = Column(Float, nullable=False, default=0.0)
+    min = Column(Float)
+    max = Column(Float)
+    first_value = Column(String(255))
+    first_datetime = Column(DateTime)
+    last_value = Column(String(255))
+    last_datetime = Column(DateTime)
+
+    def __repr__(self):
+        """ __repr__
+
+        String representation of the SensorStats instance
+        """
+        return f'<SensorStats(sensor_id={self.sensor_id},count={self.count})>'
+
+    def to_json(self):
+        """ to_json
+
+        Serializes the SensorStats instance to a JSON object, where each key/value
+        pair corresponds to a statistic of the sensor's data.
+        """
+        from .constants import DATETIME_FORMAT_STRING
+
+        def reading_json(value, dtime):
+            if dtime is None:
+                return None
+            return {
+                "value": value,
+                "datetime": datetime.strftime(dtime, DATETIME_FORMAT_STRING)
+            }
+
+        return {
+            "count": self.count or 0,
+            "numeric_count": self.numeric_count or 0,
+            "min": self.min,
+            "max": self.max,
+            "avg": self.total / self.numeric_count if self.numeric_count else None,
+            "first": reading_json(self.first_value, self.first_datetime),
+            "last": reading_json(self.last_value, self.last_datetime)
+        }
+
+
+class SensorDataBlock(Base):
+    """ SensorDataBlock
+
+    Model class holding the archived readings of a sensor within a closed time
+    window, packed into a single compressed payload. See `api.archive`.
+    """
+    __tablename__ = "sensor_data_block"
+
+    id = Column(Integer, primary_key=True)
+    sensor_id: Mapped[int] = mapped_column(ForeignKey("sensor.id", ondelete='CASCADE'))
+    # Window of the block, from `start` up to but excluding `end`
+    start = Column(DateTime, nullable=False)
+    end = Column(DateTime, nullable=False)
+    count = Column(Integer, nullable=False)
+    # Smallest and largest id of the block's readings
+    first_id = Column(Integer, nullable=False)
+    last_id = Column(Integer, nullable=False)
+    payload = Column(LargeBinary, nullable=False)
+
+    # Indexes used for finding the blocks of a sensor overlapping a time
+    # range, and the blocks that can hold a reading id
+    __table_args__ = (
+        Index('ix_sensor_data_block_sensor_id_start', 'sensor_id', 'start', unique=True),
+        Index('ix_sensor_data_block_first_id_last_id', 'first_id', 'last_id'),
+    )
+
+    def __repr__(self):
+        """ __repr__
+
+        String representation of the SensorDataBlock instance
+        """
+        return (f'<SensorDataBlock(sensor_id={self.sensor_id},start={self.start},'
+                f'count={self.count})>')
+
+
+class AlertRule(Base):
+    """ AlertRule
+
+    Model class representing a threshold rule evaluated against the readings
+    of a sensor, or of every sensor in a room or building. Exactly one of
+    `sensor_id`, `room_id` and `building_id` is set.
+
+    A rule fires once readings have been past `threshold` (`operator` is
+    'above' or 'below') for at least `duration` seconds, and resolves once a
+    reading is back past the threshold by at least `hysteresis`.
+    """
+    __tablename__ = "alert_rule"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(255), nullable=False)
+    sensor_id = Column(Integer, ForeignKey("sensor.id", ondelete='CASCADE'), index=True)
+    room_id = Column(Integer, ForeignKey("room.id", ondelete='CASCADE'), index=True)
+    building_id = Column(Integer, ForeignKey("building.id", ondelete='CASCADE'), index=True)
+    operator = Column(String(16), nullable=False)
+    threshold = Column(Float, nullable=False)
+    duration = Column(Integer, nullable=False, default=0)
+    hysteresis = Column(Float, nullable=False, default=0.0)
+    states: Mapped[List["AlertState"]] = relationship(
+        "AlertState", back_populates="rule",
+        cascade='all, delete', passive_deletes=True)
+
+    __table_args__ = (
+        CheckConstraint(
+            "(sensor_id IS NOT NULL) + (room_id IS NOT NULL) + (building_id IS NOT NULL) = 1",
+            name='ck_alert_rule_single_scope'),
+        CheckConstraint("operator IN ('above', 'below')", name='ck_alert_rule_operator'),
+    )
+
+    def __repr__(self):
+        """ __repr__
+
+        String representation of the AlertRule instance
+        """
+        return f'<AlertRule(id={self.id},name={self.name!r})>'
+
+    def to_json(self):
+        """ to_json
+
+        Serializes the AlertRule instance to a JSON object, where each key/value
+        pair corresponds to the AlertRule's fields.
+        """
+        return {
+            "id": self.id,
+            "name": self.name,
+            "sensor_id": self.sensor_id,
+            "room_id": self.room_id,
+            "building_id": self.building_id,
+            "operator": self.operator,
+            "threshold": self.threshold,
+            "duration": self.duration,
+            "hysteresis": self.hysteresis
+        }
+
+
+class AlertState(Base):
+    """ AlertState
+
+    Model class holding the state of an alert rule for one of its sensors,
+    which is 'ok', 'pending' (past the threshold for less than the rule's
+    duration) or 'firing'.
+    """
+    __tablename__ = "alert_state"
+
+    rule_id: Mapped[int] = mapped_column(
+        ForeignKey("alert_rule.id", ondelete='CASCADE'), primary_key=True)
+    sensor_id: Mapped[int] = mapped_column(
+        ForeignKey("sensor.id", ondelete='CASCADE'), primary_key=True)
+    status = Column(String(16), nullable=False, default='ok', index=True)
+    value = Column(String(255))
+    since = Column(DateTime)
+    triggered_at = Column(DateTime)
+    resolved_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    rule: Mapped["AlertRule"] = relationship("AlertRule", back_populates="states")
+
+    def __repr__(self):
+        """ __repr__
+
+        String representation of the AlertState instance
+        """
+        return (f'<AlertState(rule_id={self.rule_id},sensor_id={self.sensor_id},'
+                f'status={self.status!r})>')
+
+    def to_json(self):
+        """ to_json
+
+        Serializes the AlertState instance to a JSON object, including the
+        fields of its rule needed to display the alert.
+        """
+        from .constants import DATETIME_FORMAT_STRING
+
+        def format_datetime(dtime):
+            return datetime.strftime(dtime, DATETIME_FORMAT_STRING) if dtime else None
+
+        return {
+            "rule_id": self.rule_id,
+            "rule": self.rule.name,
+            "sensor_id": self.sensor_id,
+            "status": self.status,
+            "operator": self.rule.operator,
+            "threshold": self.rule.threshold,
+            "value": self.value,
+            "since": format_datetime(self.since),
+            "triggered_at": format_datetime(self.triggered_at),
+            "resolved_at": format_datetime(self.resolved_at),
+            "updated_at": format_datetime(self.updated_at)
+        }
+
+
+class DataVersion(Base):
+    """ DataVersion
+
+    Model class counting the committed changes to a table, which is used
+    to invalidate cached responses built from that table.
+    """
+    __tablename__ = "data_version"
+
+    name = Column(String(255), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        """ __repr__
+
+        String representation of the DataVersion instance
+        """
+        return f'<DataVersion(name={self.name!r},version={self.version})>'
@@ -0,0 +1,108 @@
+import cProfile
+import functools
+import marshal
+import pstats
+
+from flask import current_app, jsonify, request
+
+# Phases the time of a profiled request is split into, with the patterns of
+# the modules and built-in functions whose own time counts towards them.
+# Time spent anywhere else, e.g. routing and the views, counts as 'other'.
+PHASES = (
+    ('validation', ('jsonschema', 'referencing', 'rpds', 'pyrsistent',
+                    'api/validators.py', 'api/schemas.py')),
+    ('query', ('sqlalchemy', 'sqlite3')),
+    ('serialization', ('api/models.py', 'api/readings.py', 'api/query.py', 'strftime')),
+    ('json_encoding', ('json/', '_json', 'flask/json')),
+)
+
+# Number of functions listed in profile reports
+TOP_FUNCTIONS = 30
+
+
+def wants_profile():
+    """ wants_profile
+
+    Returns the requested profile format, 'json' or 'pstats', from the
+    `_profile` query parameter or the `X-Profile` header, or None if
+    profiling isn't requested or enabled.
+    """
+    if not current_app.config['PROFILING_ENABLED']:
+        return None
+    value = request.args.get('_profile') or request.headers.get('X-Profile')
+    if not value or value in ('0', 'false'):
+        return None
+    return 'pstats' if value == 'pstats' else 'json'
+
+
+def get_phase(filename, function):
+    """ get_phase
+
+    Returns the phase a function's own time counts towards.
+    """
+    location = f'{filename}:{function}'.replace('\\', '/')
+    for phase, patterns in PHASES:
+        if any(pattern in location for pattern in patterns):
+            return phase
+    return 'other'
+
+
+def profile_report(stats, status_code):
+    """ profile_report
+
+    Summarizes the statistics of a profiled request, splitting the total time
+    into phases and listing the functions with the highest cumulative time.
+
+    Parameters:
+        stats - pstats.Stats of the request
+        status_code - status code of the profiled response
+
+    Returns:
+        dictionary of the report
+    """
+    phases = {phase: 0.0 for phase, _ in PHASES}
+    phases['other'] = 0.0
+    functions = []
+    for (filename, line, function), (_, calls, own, cumulative, _) in stats.stats.items():
+        phases[get_phase(filename, function)] += own
+        functions.append({
+            "function": f'{filename}:{line}({function})' if line else function,
+            "calls": calls,
+            "own_ms": round(own * 1000, 3),
+            "cumulative_ms": round(cumulative * 1000, 3),
+        })
+    functions.sort(key=lambda entry: entry['cumulative_ms'], reverse=True)
+    return {
+        "status": status_code,
+        "total_ms": round(stats.total_tt * 1000, 3),
+        "phases": {phase: round(seconds * 1000, 3) for phase, seconds in phases.items()},
+        "functions": functions[:TOP_FUNCTIONS],
+    }
+
+
+def profiled(view):
+    """ profiled
+
+    Decorates a view function so that, when `PROFILING_ENABLED` is set,
+    requests with `?_profile=1` or an `X-Profile: 1` header run under
+    cProfile. The response is replaced by a JSON report of the profile, or by
+    a file readable with `pstats.Stats` for `?_profile=pstats`.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        profile_format = wants_profile()
+        if profile_format is None:
+            return view(*args, **kwargs)
+
+        profiler = cProfile.Profile()
+        response = profiler.runcall(
+            lambda: current_app.make_response(view(*args, **kwargs)))
+        profiler.create_stats()
+
+        if profile_format == 'pstats':
+            profile = current_app.response_class(
+                marshal.dumps(profiler.stats), mimetype='application/octet-stream')
+            profile.headers['Content-Disposition'] = 'attachment; filename=profile.pstats'
+            return profile
+        return jsonify(profile_report(pstats.Stats(profiler), response.status_code))
+    return wrapper
@@ -0,0 +1,334 @@
+import datetime
+from collections import namedtuple
+from operator import attrgetter
+
+from sqlalchemy import DateTime, Float, Integer, cast, select
+
+from .archive import iter_archived
+from .constants import DATETIME_FORMAT_STRING
+from .models import AlertRule, Building, Room, Sensor, SensorDataReadable
+from .stats import is_numeric, parse_numeric
+
+# Comparison operators, appended to a column name with an underscore, e.g.
+# `value_gte=20`. A column name without an operator tests for equality.
+OPERATORS = {
+    'eq': lambda column, value: column == value,
+    'ne': lambda column, value: column != value,
+    'gt': lambda column, value: column > value,
+    'gte': lambda column, value: column >= value,
+    'lt': lambda column, value: column < value,
+    'lte': lambda column, value: column <= value,
+    'in': lambda column, values: column.in_(values),
+}
+# The same comparisons of values in Python, e.g. of archived readings
+COMPARISONS = {
+    'eq': lambda field, value: field == value,
+    'ne': lambda field, value: field != value,
+    'gt': lambda field, value: field > value,
+    'gte': lambda field, value: field >= value,
+    'lt': lambda field, value: field < value,
+    'lte': lambda field, value: field <= value,
+    'in': lambda field, values: field in values,
+}
+ORDERED = ('eq', 'ne', 'gt', 'gte', 'lt', 'lte', 'in')
+EQUALITY = ('eq', 'ne', 'in')
+
+# Kind of condition each operator places on a column: an exact match or
+# one end of a range. `ne` doesn't narrow the rows to read.
+BOUNDS = {'eq': 'eq', 'in': 'eq', 'gt': 'from', 'gte': 'from', 'lt': 'to', 'lte': 'to'}
+
+# Columns of each model that can be filtered on, with their operators.
+# Columns that aren't indexed are only accepted together with one of the
+# REQUIRED_FILTERS, so that no query scans a whole table of readings.
+FILTERS = {
+    Building: {'id': ORDERED, 'name': EQUALITY},
+    Room: {'id': ORDERED, 'building_id': EQUALITY, 'name': EQUALITY},
+    Sensor: {'id': ORDERED, 'room_id': EQUALITY, 'name': EQUALITY},
+    SensorDataReadable: {'id': ORDERED, 'sensor_id': EQUALITY, 'datetime': ORDERED,
+                         'value': ORDERED, 'units': EQUALITY},
+    AlertRule: {'id': ORDERED, 'sensor_id': EQUALITY, 'room_id': EQUALITY,
+                'building_id': EQUALITY, 'operator': EQUALITY},
+}
+
+# Indexed columns and the BOUNDS they must be filtered with, of which at
+# least one must be used per model: a sensor, or ids by value or by a range
+# with both ends
+REQUIRED_FILTERS = {
+    SensorDataReadable: (('sensor_id', {'eq'}), ('id', {'eq'}), ('id', {'from', 'to'})),
+}
+
+# Columns each model can be sorted by, with `-` prefixed for descending order
+ORDER_COLUMNS = {
+    Building: ('id', 'name'),
+    Room: ('id', 'name', 'building_id'),
+    Sensor: ('id', 'name', 'room_id'),
+    SensorDataReadable: ('id', 'datetime'),
+    AlertRule: ('id', 'name'),
+}
+
+# Query parameters of collection requests that aren't part of the query language
+OPTIONS = ('format', 'timestamps', '_profile')
+
+# Query parameters that control the query rather than filter it
+RESERVED_PARAMETERS = ('fields', 'order', 'limit', 'offset') + OPTIONS
+
+# Validated query parameters: (column, operator, value) filters, selected
+# fields, (column, descending) orders ending with the primary key, limit and offset
+ParsedQuery = namedtuple('ParsedQuery', ['filters', 'fields', 'order', 'limit', 'offset'])
+
+
+def is_query(args):
+    """ is_query
+
+    Returns whether request arguments use the query language.
+    """
+    return any(name not in OPTIONS for name in args)
+
+
+def parse_parameter(name):
+    """ parse_parameter
+
+    Splits a filter parameter into its column name and operator.
+    """
+    column, _, operator = name.rpartition('_')
+    if column and operator in OPERATORS:
+        return column, operator
+    return name, 'eq'
+
+
+def parse_value(model, column, text):
+    """ parse_value
+
+    Converts the text of a filter to the type of the column it compares to.
+    Sensor data values are stored as text, so they are compared as numbers.
+    """
+    column_type = model.__table__.columns[column].type
+    try:
+        if model == SensorDataReadable and column == 'value':
+            return float(text)
+        if isinstance(column_type, Integer):
+            return int(text)
+        if isinstance(column_type, DateTime):
+            return datetime.datetime.strptime(text, DATETIME_FORMAT_STRING)
+    except ValueError:
+        raise ValueError(f'Invalid value for {column}: {text!r}')
+    return text
+
+
+def describe_required_filters(required):
+    """ describe_required_filters
+
+    Describes a model's REQUIRED_FILTERS for error messages.
+    """
+    descriptions = []
+    for column, bounds in required:
+        if bounds == {'eq'}:
+            descriptions.append(f'{column} (or {column}_in)')
+        else:
+            descriptions.append(f'both {column}_gt(e) and {column}_lt(e)')
+    return ', '.join(descriptions[:-1]) + ' or ' + descriptions[-1]
+
+
+def parse_query(model, args, max_limit, max_offset=None):
+    """ parse_query
+
+    Parses and validates the query parameters of a request for a collection.
+
+    Parameters:
+        model - model of the collection
+        args - werkzeug MultiDict of the query parameters
+        max_limit - maximum number of rows a query can return
+        max_offset - optional maximum number of rows a query can skip
+
+    Returns:
+        ParsedQuery
+    """
+    table = model.__table__
+    filters = FILTERS.get(model, {})
+
+    parsed = []
+    filtered = {}
+    for name, text in args.items(multi=True):
+        if name in RESERVED_PARAMETERS:
+            continue
+        column, operator = parse_parameter(name)
+        if operator not in filters.get(column, ()):
+            raise ValueError(f'Unsupported filter: {name}')
+        if operator == 'in':
+            value = [parse_value(model, column, item) for item in text.split(',')]
+        else:
+            value = parse_value(model, column, text)
+        parsed.append((column, operator, value))
+        filtered.setdefault(column, set()).add(BOUNDS.get(operator))
+
+    required = REQUIRED_FILTERS.get(model)
+    if required and not any(bounds <= filtered.get(column, set())
+                            for column, bounds in required):
+        raise ValueError(f'Filtering on {describe_required_filters(required)} is required.')
+
+    fields = [field for field in args.get('fields', '').split(',') if field]
+    if not fields:
+        fields = list(table.columns.keys())
+    unknown = [field for field in fields if field not in table.columns]
+    if unknown:
+        raise ValueError(f'Unknown fields: {", ".join(unknown)}')
+
+    order = []
+    descending = False
+    for item in filter(None, args.get('order', '').split(',')):
+        column = item.lstrip('-')
+        if column not in ORDER_COLUMNS.get(model, ()):
+            raise ValueError(f'Unsupported order: {item}')
+        descending = item.startswith('-')
+        order.append((column, descending))
+    # Orders by the primary key last, so that pages are stable. SQLite
+    # indexes end with the rowid, so following the direction of the last
+    # column lets an index still provide the order.
+    order.append((table.primary_key.columns.values()[0].name, descending))
+
+    try:
+        limit = int(args.get('limit', max_limit))
+        offset = int(args.get('offset', 0))
+    except ValueError:
+        raise ValueError('limit and offset must be integers')
+    if not 0 < limit <= max_limit or offset < 0:
+        raise ValueError(f'limit must be between 1 and {max_limit}, '
+                         f'and offset must not be negative')
+    if max_offset is not None and offset > max_offset:
+        # SQLite reads and discards the skipped rows, so deep pages are
+        # requested by filtering on the last id or datetime instead
+        raise ValueError(f'offset must be at most {max_offset}, '
+                         f'filter on id or datetime to page further')
+
+    return ParsedQuery(parsed, fields, order, limit, offset)
+
+
+def select_query(model, query):
+    """ select_query
+
+    Builds the single parameterized SELECT statement of a parsed query.
+    """
+    table = model.__table__
+    conditions = []
+    filtered = set()
+    for column, operator, value in query.filters:
+        expression = table.columns[column]
+        if model == SensorDataReadable and column == 'value':
+            expression = cast(expression, Float)
+            if column not in filtered:
+                conditions.append(is_numeric(table.c.value))
+        conditions.append(OPERATORS[operator](expression, value))
+        filtered.add(column)
+
+    return (select(*(table.columns[field] for field in query.fields))
+            .where(*conditions)
+            .order_by(*(table.columns[column].desc() if descending else table.columns[column]
+                        for column, descending in query.order))
+            .limit(query.limit)
+            .offset(query.offset))
+
+
+def compile_query(model, args, max_limit, max_offset=None):
+    """ compile_query
+
+    Compiles the query parameters of a request for a collection into a single
+    parameterized SELECT statement, selecting only the requested columns, e.g.
+    `?sensor_id=3&value_gte=20&units=C&order=-datetime&fields=id,value,datetime&limit=500`.
+
+    Parameters:
+        model - model of the collection
+        args - werkzeug MultiDict of the query parameters
+        max_limit - maximum number of rows a query can return
+        max_offset - optional maximum number of rows a query can skip
+
+    Returns:
+        statement - SELECT statement
+        fields - names of the selected columns
+    """
+    query = parse_query(model, args, max_limit, max_offset)
+    return select_query(model, query), query.fields
+
+
+def matches_filters(model, record, filters):
+    """ matches_filters
+
+    Returns whether a record, e.g. an archived reading, passes the filters of
+    a parsed query, comparing them as the SELECT statement does.
+    """
+    for column, operator, value in filters:
+        field = getattr(record, column)
+        if model == SensorDataReadable and column == 'value':
+            field = parse_numeric(field)
+            if field is None:
+                return False
+        if not COMPARISONS[operator](field, value):
+            return False
+    return True
+
+
+def query_archived(session, model, query):
+    """ query_archived
+
+    Finds the archived readings passing the filters of a parsed sensor data
+    query. Only the blocks of the sensors filtered on with `eq` or `in`, and
+    within the filtered datetime range, are decoded, so queries that filter
+    on ids alone don't include archived readings.
+
+    Returns:
+        list of ArchivedReading
+    """
+    if model != SensorDataReadable:
+        return []
+    sensor_ids = None
+    datetime_from = datetime_to = None
+    for column, operator, value in query.filters:
+        if column == 'sensor_id' and operator in ('eq', 'in'):
+            values = set(value) if operator == 'in' else {value}
+            sensor_ids = values if sensor_ids is None else sensor_ids & values
+        elif column == 'datetime' and operator in ('eq', 'gt', 'gte'):
+            datetime_from = max(filter(None, (datetime_from, value)))
+        if column == 'datetime' and operator in ('eq', 'lt', 'lte'):
+            datetime_to = min(filter(None, (datetime_to, value)))
+    if sensor_ids is None:
+        return []
+    return [reading for reading in
+            iter_archived(session, sorted(sensor_ids), datetime_from, datetime_to)
+            if matches_filters(model, reading, query.filters)]
+
+
+def row_to_json(fields, row):
+    """ row_to_json
+
+    Serializes a row selected by `compile_query` to a JSON object.
+    """
+    return {field: value.strftime(DATETIME_FORMAT_STRING)
+            if isinstance(value, datetime.datetime) else value
+            for field, value in zip(fields, row)}
+
+
+def run_query(session, model, args, max_limit, max_offset=None):
+    """ run_query
+
+    Queries a collection with the query parameters of a request. See
+    `compile_query`. Archived readings are merged into sensor data queries
+    that filter on sensor_id, see `query_archived`.
+
+    Returns:
+        list of JSON objects of the selected columns
+    """
+    query = parse_query(model, args, max_limit, max_offset)
+    archived = query_archived(session, model, query)
+    if not archived:
+        return [row_to_json(query.fields, row)
+                for row in session.execute(select_query(model, query))]
+
+    # Selects every column of the rows up to the end of the page, so that
+    # they can be sorted together with the archived readings
+    columns = list(model.__table__.columns.keys())
+    rows = session.execute(select_query(model, query._replace(
+        fields=columns, limit=query.offset + query.limit, offset=0))).all()
+    records = rows + archived
+    for column, descending in reversed(query.order):
+        records.sort(key=attrgetter(column), reverse=descending)
+    return [row_to_json(query.fields, [getattr(record, field) for field in query.fields])
+            for record in records[query.offset:query.offset + query.limit]]
@@ -0,0 +1,255 @@
+import datetime
+
+from sqlalchemy import literal, select, union_all
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import OperationalError
+
+from .constants import DATETIME_FORMAT_STRING
+from .models import SensorDataReadable
+
+# Reference point for converting naive (UTC) datetimes to epoch seconds
+EPOCH = datetime.datetime(1970, 1, 1)
+
+# Maximum number of specifications queried by a single compound SELECT of
+# `query_reading_ranges`, below SQLite's limit of 500 compound members
+RANGES_PER_STATEMENT = 250
+
+# Columns selected when reading sensor data without building ORM objects
+READING_COLUMNS = (
+    SensorDataReadable.id,
+    SensorDataReadable.sensor_id,
+    SensorDataReadable.value,
+    SensorDataReadable.units,
+    SensorDataReadable.datetime,
+)
+
+
+class MissingReadingsIndexError(RuntimeError):
+    """ MissingReadingsIndexError
+
+    Raised when readings are inserted into a database created before the
+    (sensor_id, datetime) index was unique, which `ON CONFLICT` requires.
+    """
+
+
+def insert_readings(session, readings):
+    """ insert_readings
+
+    Inserts sensor data with a single statement, skipping readings of a
+    sensor at a datetime it already has a reading for, e.g. when a device
+    retries after a timeout. Each duplicate costs a probe of the unique
+    (sensor_id, datetime) index rather than a query before the insert, and
+    the earliest write of a reading is kept. Readings that were archived
+    since are skipped too, see `api.archive.archived_keys`.
+
+    Parameters:
+        session - database session used for the insert
+        readings - list of dictionaries of the readings' fields
+
+    Returns:
+        list of rows of the inserted readings, with the READING_COLUMNS
+
+    Raises:
+        MissingReadingsIndexError if the database lacks the unique index
+    """
+    from .archive import archived_keys
+    archived = archived_keys(session, readings)
+    if archived:
+        readings = [reading for reading in readings
+                    if (reading['sensor_id'], reading['datetime']) not in archived]
+        if not readings:
+            return []
+
+    statement = (sqlite_insert(SensorDataReadable)
+                 .on_conflict_do_nothing(
+                     index_elements=[SensorDataReadable.sensor_id,
+                                     SensorDataReadable.datetime])
+                 .returning(*READING_COLUMNS))
+    try:
+        return session.execute(statement, readings).all()
+    except OperationalError as e:
+        if 'ON CONFLICT clause does not match' not in str(e.orig):
+            raise
+        raise MissingReadingsIndexError(
+            'The sensor data table has no unique (sensor_id, datetime) index. '
+            'Run `flask --app api dedupe_readings` to remove duplicate readings '
+            'and create it.') from e
+
+
+def select_readings(sensor_id, datetime_from=None, datetime_to=None, limit=None):
+    """ select_readings
+
+    Builds a Core SELECT statement for a sensor's readings within an optional
+    datetime range. The statement is served by the (sensor_id, datetime) index.
+    When a limit is given, the latest `limit` readings in the range are selected.
+
+    Parameters:
+        sensor_id - id of the sensor
+        datetime_from - datetime object representing the time 'from'
+        datetime_to - datetime object representing the time 'to'
+        limit - maximum number of readings
+
+    Returns:
+        SELECT statement
+    """
+    statement = select(*READING_COLUMNS).where(
+        SensorDataReadable.sensor_id == sensor_id)
+    if datetime_from:
+        statement = statement.where(SensorDataReadable.datetime >= datetime_from)
+    if datetime_to:
+        statement = statement.where(SensorDataReadable.datetime <= datetime_to)
+    if limit:
+        statement = (statement
+                     .order_by(SensorDataReadable.datetime.desc())
+                     .limit(limit))
+    return statement
+
+
+def query_reading_ranges(session, specs):
+    """ query_reading_ranges
+
+    Queries the readings for several (sensor, range, limit) specifications
+    using a UNION ALL statement per RANGES_PER_STATEMENT specifications.
+
+    Parameters:
+        session - database session used for the query
+        specs - list of dictionaries with `sensor_id` and optional
+                `datetime_from`, `datetime_to` and `limit` keys
+
+    Returns:
+        list containing a list of reading rows for each spec, in chronological
+        order, including archived readings within the spec
+    """
+    results = [[] for _ in specs]
+    for first in range(0, len(specs), RANGES_PER_STATEMENT):
+        members = []
+        for index in range(first, min(first + RANGES_PER_STATEMENT, len(specs))):
+            spec = specs[index]
+            statement = select_readings(
+                spec['sensor_id'],
+                spec.get('datetime_from'),
+                spec.get('datetime_to'),
+                spec.get('limit'),
+            ).add_columns(literal(index).label('spec'))
+            # SQLite only allows ORDER BY/LIMIT in a compound member when it
+            # is wrapped in a subquery
+            subquery = statement.subquery()
+            members.append(select(subquery))
+
+        combined = union_all(*members).subquery()
+        statement = select(combined).order_by(combined.c.spec, combined.c.datetime)
+        for row in session.execute(statement):
+            results[row.spec].append(row)
+
+    from .archive import merge_archived_ranges
+    return merge_archived_ranges(session, specs, results)
+
+
+def query_readings_by_sensor(session, sensor_ids=None, datetime_from=None, datetime_to=None):
+    """ query_readings_by_sensor
+
+    Queries readings within an optional datetime range, grouped by sensor and
+    in chronological order, using a single statement.
+
+    Parameters:
+        session - database session used for the query
+        sensor_ids - optional collection of sensor ids to restrict the query to
+        datetime_from - datetime object representing the time 'from'
+        datetime_to - datetime object representing the time 'to'
+
+    Returns:
+        dictionary mapping sensor ids to lists of reading rows, including
+        archived readings
+    """
+    statement = select(*READING_COLUMNS).order_by(
+        SensorDataReadable.sensor_id, SensorDataReadable.datetime, SensorDataReadable.id)
+    if sensor_ids is not None:
+        statement = statement.where(SensorDataReadable.sensor_id.in_(sensor_ids))
+    if datetime_from:
+        statement = statement.where(SensorDataReadable.datetime >= datetime_from)
+    if datetime_to:
+        statement = statement.where(SensorDataReadable.datetime <= datetime_to)
+
+    grouped = {}
+    for row in session.execute(statement):
+        grouped.setdefault(row.sensor_id, []).append(row)
+
+    from .archive import merge_archived_by_sensor
+    return merge_archived_by_sensor(session, grouped, sensor_ids, datetime_from, datetime_to)
+
+
+def fetch_tuples(session, statement):
+    """ fetch_tuples
+
+    Executes a Core statement and returns all of its rows, which unpack as
+    tuples of the selected columns, e.g. to build NumPy arrays from them.
+    The statement is executed by the session, so engine events, such as the
+    slow query log and the profiler, see it.
+
+    Parameters:
+        session - database session used for the query
+        statement - Core SELECT statement
+
+    Returns:
+        list of tuples
+    """
+    return session.execute(statement).all()
+
+
+def to_epoch(value):
+    """ to_epoch
+
+    Converts a naive datetime, assumed to be in UTC, to integer epoch seconds.
+    """
+    return int((value - EPOCH).total_seconds())
+
+
+def reading_to_json(row):
+    """ reading_to_json
+
+    Serializes a reading row selected with `READING_COLUMNS` to a JSON object.
+
+    Parameters:
+        row - result row
+
+    Returns:
+        dictionary of the reading's fields
+    """
+    return {
+        "id": row.id,
+        "value": row.value,
+        "units": row.units,
+        "datetime": datetime.datetime.strftime(row.datetime, DATETIME_FORMAT_STRING)
+    }
+
+
+def readings_to_columnar(sensor_id, sensor_name, rows, epoch=False):
+    """ readings_to_columnar
+
+    Serializes a sensor's readings as parallel arrays, rather than one object
+    per reading. `units` is a single string when every reading shares the
+    same units, otherwise a list with an entry per reading.
+
+    Parameters:
+        sensor_id - id of the sensor
+        sensor_name - name of the sensor
+        rows - reading rows or SensorDataReadable records
+        epoch - whether datetimes are serialized as integer epoch seconds
+
+    Returns:
+        dictionary of the sensor's readings in columnar form
+    """
+    units = [row.units for row in rows]
+    distinct_units = set(units)
+    if epoch:
+        datetimes = [to_epoch(row.datetime) for row in rows]
+    else:
+        datetimes = [datetime.datetime.strftime(row.datetime, DATETIME_FORMAT_STRING)
+                     for row in rows]
+    return {
+        "sensor": sensor_name,
+        "sensor_id": sensor_id,
+        "units": units[0] if len(distinct_units) == 1 else (units or None),
+        "datetime": datetimes,
+        "value": [row.value for row in rows]
+    }
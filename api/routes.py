@@ -1,12 +1,31 @@
 import datetime
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request, url_for
 from flask.views import MethodView
-
-from .database import db_session
+from sqlalchemy import delete, or_, select
+
+from .alerts import ALERT_STATUSES, query_alerts
+from .archive import (archived_sensor_ids, archived_to_json, delete_archived,
+                      delete_archived_reading, find_archived, iter_archived, update_archived)
+from .cache import cached
+from .bulk import (delete_readings_in_chunks, scale_values,
+                   update_readings_in_chunks)
+from .database import (MissingCascadeError, db_session, delete_cascading,
+                       read_session)
+from .deletion import get_deletion_job, start_deletion_job
+from .hot_tier import query_ranges
+from .ingest import find_unknown_sensors, ingest_readings
 from .constants import StatusCode, URL_MODEL_MAPPING, DATETIME_FORMAT_STRING
-from .models import Building, Room, Sensor, SensorDataReadable
-from .validators import generate_validator, get_request_validator
+from .models import AlertRule, Building, Room, Sensor, SensorDataReadable
+from .stats import (get_stats, is_numeric, refresh_sensor_stats,
+                    subtract_readings, summarize_readings)
+from .profiler import profiled
+from .query import is_query, run_query
+from .search import DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT, result_to_json, search
+from .readings import (MissingReadingsIndexError, query_readings_by_sensor, reading_to_json,
+                       readings_to_columnar)
+from .validators import (generate_validator, get_request_validator,
+                         sensor_data_patch_validator, sensor_data_query_validator)
 
 # Views and other code can be registered to the blueprint, rather than
 # the application directly.
@@ -41,6 +60,51 @@ class InvalidAPIUsage(Exception):
         return dict_repr
 
 
+def get_columnar_options(model=SensorDataReadable):
+    """ get_columnar_options
+
+    Reads the `format` and `timestamps` query parameters of the current request.
+    `?format=columnar` requests sensor data as parallel arrays and
+    `?timestamps=epoch` serializes datetimes as integer epoch seconds.
+
+    Parameters:
+        model - the model the request is for
+
+    Returns:
+        columnar - whether the columnar format was requested
+        epoch - whether epoch timestamps were requested
+    """
+    response_format = request.args.get('format', 'json')
+    if response_format not in ('json', 'columnar'):
+        raise InvalidAPIUsage(f'Unknown response format: {response_format}')
+
+    columnar = response_format == 'columnar'
+    if columnar and model not in (Sensor, SensorDataReadable):
+        raise InvalidAPIUsage(
+            'The columnar format is only supported for sensor data.')
+    return columnar, request.args.get('timestamps') == 'epoch'
+
+
+def get_datetime_range_args():
+    """ get_datetime_range_args
+
+    Parses the optional `from` and `to` query parameters of the current request.
+
+    Returns:
+        datetime_from - datetime, or None if `from` isn't given
+        datetime_to - datetime, or None if `to` isn't given
+    """
+    try:
+        return tuple(
+            datetime.datetime.strptime(request.args[name], DATETIME_FORMAT_STRING)
+            if name in request.args else None
+            for name in ('from', 'to'))
+    except ValueError:
+        raise InvalidAPIUsage(
+            f'Datetimes must use the format {DATETIME_FORMAT_STRING}'
+        )
+
+
 class IndexAPI(MethodView):
     """ IndexAPI
 
@@ -59,7 +123,7 @@ class IndexAPI(MethodView):
         # Add validator function
         # self.validator = generate_validator(model)
 
-    def _get_record(self, id):
+    def _get_record(self, id, session=read_session):
         """ _get_record
 
         Private helper function for querying a record. 
@@ -67,10 +131,11 @@ class IndexAPI(MethodView):
 
         Parameters:
             id - id corresponding to a model record
+            session - database session used for the query
         Returns:
             model record        
         """
-        model_record = self.model.query.filter(self.model.id == id).first()
+        model_record = session.query(self.model).filter(self.model.id == id).first()
         if not model_record:
             raise InvalidAPIUsage(
                 f'No {str(self.model)} record exist for id: {id}',
@@ -79,33 +144,103 @@ class IndexAPI(MethodView):
 
         return model_record
 
+    def _get_reading_json(self, id):
+        """ _get_reading_json
+
+        Private helper function for serializing a reading by id, which may
+        have been archived. If no reading has the id, an exception is raised.
+
+        Parameters:
+            id - id of the reading
+        Returns:
+            JSON object of the reading
+        """
+        record = read_session.get(SensorDataReadable, id)
+        if record:
+            return record.to_json()
+        reading = find_archived(read_session, id)
+        if not reading:
+            raise InvalidAPIUsage(
+                f'No {str(self.model)} record exist for id: {id}',
+                status_code=StatusCode.NOT_FOUND
+            )
+        return archived_to_json(reading, read_session.get(Sensor, reading.sensor_id).name)
+
+    @cached
     def get(self, id):
         """ get
 
-        Handles GET requests 
+        Handles GET requests. Readings are found by id whether or not they
+        have been archived.
 
         Parameters:
             id - id corresponding to a model record
         Returns:
             JSON Response of the record
         """
+        columnar, epoch = get_columnar_options(self.model)
+        if columnar and self.model == SensorDataReadable:
+            raise InvalidAPIUsage(
+                'The columnar format is only supported for sensor data series.')
+
+        if self.model == SensorDataReadable:
+            return jsonify(self._get_reading_json(id))
 
         record = self._get_record(id)
+        if columnar:
+            rows = query_readings_by_sensor(read_session, [record.id]).get(record.id, [])
+            return jsonify(readings_to_columnar(record.id, record.name, rows, epoch))
+
         return jsonify(record.to_json())
 
     def delete(self, id):
         """ delete
 
-        Handle DELETE requestss
+        Handle DELETE requestss. The record is removed with a single DELETE
+        statement and its children are removed by `ON DELETE CASCADE`, rather
+        than being loaded into the session first.
+
+        Passing `?background=true` deletes buildings, rooms and sensors in
+        chunks on a background thread instead, which is meant for very large subtrees.
+        Archived readings are deleted by rewriting their block.
 
         Parameters:
             id - id corresponding to a model record
         Returns:
-            empty string with a 204 - No Content status code
+            empty string with a 204 - No Content status code, or
+            the deletion job with a 202 - Accepted status code
         """
-        record = self._get_record(id)
-        db_session.delete(record)
+        if (request.args.get('background') == 'true'
+                and self.model in (Building, Room, Sensor)):
+            record = self._get_record(id, db_session)
+            job = start_deletion_job(self.model, record.id)
+            location = url_for('api.deletion_job', job_id=job.id)
+            return jsonify(job.to_json()), StatusCode.ACCEPTED.value, {'Location': location}
+
+        statement = delete(self.model).where(self.model.id == id)
+        readings = []
+        if self.model == SensorDataReadable:
+            readings = db_session.execute(statement.returning(
+                SensorDataReadable.sensor_id, SensorDataReadable.value,
+                SensorDataReadable.datetime)).all()
+            if not readings:
+                archived = delete_archived_reading(db_session, id)
+                readings = [archived] if archived else []
+            deleted = len(readings)
+        else:
+            deleted = delete_cascading(db_session, statement)
+        if not deleted:
+            db_session.rollback()
+            raise InvalidAPIUsage(
+                f'No {str(self.model)} record exist for id: {id}',
+                status_code=StatusCode.NOT_FOUND
+            )
+        # The statistics are only rescanned when the reading was the sensor's
+        # minimum, maximum, first or last
+        stale = subtract_readings(db_session, readings)
         db_session.commit()
+        if stale:
+            refresh_sensor_stats(db_session, stale)
 
         return '', StatusCode.NO_CONTENT.value
 
@@ -128,6 +263,25 @@ class ListAPI(MethodView):
         # Uses the model to generate a validator function for POST requests
         self.validate = generate_validator(model)
 
+    def _has_sensor_data(self, datetime_from, datetime_to):
+        """ _has_sensor_data
+
+        Helper function for building the condition selecting the sensors
+        with readings, including archived readings, within a datetime range.
+
+        Parameters:
+            datetime_from - datetime object representing the time 'from'
+            datetime_to - datetime object representing the time 'to'
+
+        Returns:
+            SQL condition on the sensor's id
+        """
+        return or_(
+            Sensor.id.in_(select(SensorDataReadable.sensor_id).where(
+                datetime_from <= SensorDataReadable.datetime,
+                datetime_to >= SensorDataReadable.datetime)),
+            Sensor.id.in_(archived_sensor_ids(read_session, datetime_from, datetime_to)))
+
     def _query_from_building(self, datetime_from, datetime_to):
         """ _query_from_building
 
@@ -141,14 +295,11 @@ class ListAPI(MethodView):
         Returns:
             the result of the query
         """
-        return (self.model.query
+        return (read_session.query(self.model)
                 .join(Room, Room.building_id == Building.id)
                 .join(Sensor, Sensor.room_id == Room.id)
-                .join(SensorDataReadable, SensorDataReadable.sensor_id == Sensor.id)
-                .filter(
-                    datetime_from <= SensorDataReadable.datetime,
-                    datetime_to >= SensorDataReadable.datetime
-                ).all())
+                .filter(self._has_sensor_data(datetime_from, datetime_to))
+                .all())
 
     def _query_from_room(self, datetime_from, datetime_to):
         """ _query_from_room
@@ -163,13 +314,10 @@ class ListAPI(MethodView):
         Returns:
             the result of the query
         """
-        return (self.model.query
+        return (read_session.query(self.model)
                 .join(Sensor, Sensor.room_id == Room.id)
-                .join(SensorDataReadable, SensorDataReadable.sensor_id == Sensor.id)
-                .filter(
-                    datetime_from <= SensorDataReadable.datetime,
-                    datetime_to >= SensorDataReadable.datetime
-                ).all())
+                .filter(self._has_sensor_data(datetime_from, datetime_to))
+                .all())
 
     def _query_from_sensor(self, datetime_from, datetime_to):
         """ _query_from_sensor
@@ -184,29 +332,38 @@ class ListAPI(MethodView):
         Returns:
             the result of the query
         """
-        return (self.model.query
-                .join(SensorDataReadable, SensorDataReadable.sensor_id == Sensor.id)
-                .filter(
-                    datetime_from <= SensorDataReadable.datetime,
-                    datetime_to >= SensorDataReadable.datetime
-                ).all())
-
-    def _query_sensor_data(self, datetime_from, datetime_to):
+        return (read_session.query(self.model)
+                .filter(self._has_sensor_data(datetime_from, datetime_to))
+                .all())
+
+    def _query_sensor_data(self, datetime_from=None, datetime_to=None):
         """ _query_sensor_data
 
-        Helper function for querying sensor data with a sepcified datatime range.
+        Helper function for querying sensor data with an optional datatime
+        range, including archived readings, in the order of their ids.
 
         Parameters:
             datetime_from - datetime object representing the time 'from'
             datetime_to - datetime object representing the time 'to'
 
         Returns:
-            the result of the query
+            list of JSON objects of the readings
         """
-        return (self.model.query.filter(
+        query = read_session.query(self.model)
+        if datetime_from and datetime_to:
+            query = query.filter(
                 datetime_from <= SensorDataReadable.datetime,
-                datetime_to >= SensorDataReadable.datetime
-                ).all())
+                datetime_to >= SensorDataReadable.datetime)
+        records = query.order_by(SensorDataReadable.id).all()
+        archived = list(iter_archived(read_session, None, datetime_from, datetime_to))
+        if not archived:
+            return [record.to_json() for record in records]
+
+        sensor_names = dict(read_session.execute(select(Sensor.id, Sensor.name)).all())
+        merged = sorted(records + archived, key=lambda reading: reading.id)
+        return [reading.to_json() if isinstance(reading, SensorDataReadable)
+                else archived_to_json(reading, sensor_names[reading.sensor_id])
+                for reading in merged]
 
     def _get_record_from_t(self, datetime_from, datetime_to):
         """ _get_record
@@ -224,7 +381,6 @@ class ListAPI(MethodView):
             Building: self._query_from_building,
             Room: self._query_from_room,
             Sensor: self._query_from_sensor,
-            SensorDataReadable: self._query_sensor_data
         }
 
         # Selects the query function based on the model
@@ -234,14 +390,29 @@ class ListAPI(MethodView):
 
         return query(datetime_from, datetime_to)
 
+    @cached
     def get(self):
         """ get
 
-        Handles GET requests 
+        Handles GET requests. Query parameters filter, sort and project the
+        records, e.g. `?sensor_id=3&value_gte=20&order=-datetime&fields=id,value`,
+        see `api.query`.
 
         Returns:
             JSON Response of all available records
         """
+        columnar, epoch = get_columnar_options(self.model)
+        if is_query(request.args):
+            if columnar:
+                raise InvalidAPIUsage('The columnar format doesn\'t support filters.')
+            try:
+                return jsonify(run_query(read_session, self.model, request.args,
+                                         current_app.config['QUERY_MAX_LIMIT'],
+                                         current_app.config['QUERY_MAX_OFFSET']))
+            except ValueError as e:
+                raise InvalidAPIUsage(str(e))
+
+        datetime_from = datetime_to = None
         if request.is_json:
             body_json = request.json
             is_valid = get_request_validator(request.json)
@@ -250,22 +421,51 @@ class ListAPI(MethodView):
                     'Invalid raw body structure for request.'
                 )
 
-            datetime_from = body_json.get('dateTimeFrom', None)
-            datetime_to = body_json.get('dateTimeTo', None)
+            body_from = body_json.get('dateTimeFrom', None)
+            body_to = body_json.get('dateTimeTo', None)
 
-            if datetime_from and datetime_to:
+            if body_from and body_to:
                 datetime_from = datetime.datetime.strptime(
-                    datetime_from, DATETIME_FORMAT_STRING)
+                    body_from, DATETIME_FORMAT_STRING)
                 datetime_to = datetime.datetime.strptime(
-                    datetime_to, DATETIME_FORMAT_STRING)
-                records = self._get_record_from_t(datetime_from, datetime_to)
-            else:
-                records = self.model.query.all()
+                    body_to, DATETIME_FORMAT_STRING)
+
+        if columnar:
+            return jsonify(self._get_columnar(datetime_from, datetime_to, epoch))
+
+        if self.model == SensorDataReadable:
+            return jsonify(self._query_sensor_data(datetime_from, datetime_to))
+
+        if datetime_from and datetime_to:
+            records = self._get_record_from_t(datetime_from, datetime_to)
         else:
-            records = self.model.query.all()
+            records = read_session.query(self.model).all()
 
         return jsonify([record.to_json() for record in records])
 
+    def _get_columnar(self, datetime_from, datetime_to, epoch):
+        """ _get_columnar
+
+        Private helper function for querying sensor data in the columnar format.
+        For sensors, every sensor is included even if it has no readings.
+
+        Parameters:
+            datetime_from - datetime object representing the time 'from'
+            datetime_to - datetime object representing the time 'to'
+            epoch - whether datetimes are serialized as epoch seconds
+        Returns:
+            list of columnar sensor data, one entry per sensor
+        """
+        sensor_names = dict(read_session.execute(
+            select(Sensor.id, Sensor.name).order_by(Sensor.id)).all())
+        grouped = query_readings_by_sensor(
+            read_session, datetime_from=datetime_from, datetime_to=datetime_to)
+        sensor_ids = sensor_names if self.model == Sensor else grouped
+
+        return [readings_to_columnar(sensor_id, sensor_names.get(sensor_id),
+                                     grouped.get(sensor_id, []), epoch)
+                for sensor_id in sensor_ids]
+
     def _create_record(self, **kwargs):
         """ _create_record
 
@@ -283,13 +483,17 @@ class ListAPI(MethodView):
     def post(self):
         """ post
 
-        Handles POST requests
+        Handles POST requests. Sensor data can also be created in bulk by
+        posting a list of readings. Posting a reading a sensor already has
+        at the same datetime doesn't create a duplicate.
 
         Returns:
             JSON Response of the newly created record.
         """
 
         json_body = request.json
+        if self.model == SensorDataReadable and isinstance(json_body, list):
+            return self._post_batch(json_body)
 
         is_valid = self.validate(json_body)
         if not is_valid:
@@ -336,13 +540,515 @@ class ListAPI(MethodView):
                     f'No room record exist for id: {sensor_id}',
                     status_code=StatusCode.NOT_FOUND
                 )
-            new_record.sensor = sensor
-            new_record.datetime = dt
+            # Inserted like a batch, so that posting a reading again returns
+            # the stored reading instead of creating a duplicate
+            success, message, _ = ingest_readings(
+                [dict(json_body, sensor_id=sensor.id, datetime=dt)])
+            if not success:
+                raise InvalidAPIUsage(f'Failed to create record: {message}')
+            new_record = db_session.scalars(
+                select(SensorDataReadable)
+                .where(SensorDataReadable.sensor_id == sensor.id,
+                       SensorDataReadable.datetime == dt)).first()
+            if new_record is None:
+                # The reading was archived before it was posted again
+                archived = next(iter_archived(db_session, sensor.id, dt, dt))
+                return jsonify(archived_to_json(archived, sensor.name))
+            return jsonify(new_record.to_json())
+
+        # Create AlertRule object if the sensor, room or building it applies to exists
+        elif self.model == AlertRule:
+            for scope_model, field in ((Sensor, 'sensor_id'), (Room, 'room_id'),
+                                       (Building, 'building_id')):
+                scope_id = json_body.get(field)
+                if scope_id is not None and not db_session.get(scope_model, scope_id):
+                    raise InvalidAPIUsage(
+                        f'No {scope_model.__tablename__} record exist for id: {scope_id}',
+                        status_code=StatusCode.NOT_FOUND
+                    )
             db_session.add(new_record)
 
         db_session.commit()
         return jsonify(new_record.to_json())
 
+    def _post_batch(self, json_list):
+        """ _post_batch
+
+        Private helper function for creating a batch of sensor data records
+        with a single bulk insert.
+
+        Parameters:
+            json_list - list of JSON sensor data records
+        Returns:
+            JSON Response with the number of created records, and of the
+            records skipped as duplicates of existing readings
+        """
+        if not json_list or not all(self.validate(entry) for entry in json_list):
+            raise InvalidAPIUsage(
+                'Invalid raw body structure for request.'
+            )
+
+        try:
+            readings = [dict(entry, datetime=datetime.datetime.strptime(
+                entry['datetime'], DATETIME_FORMAT_STRING)) for entry in json_list]
+        except ValueError:
+            raise InvalidAPIUsage(
+                f'Datetimes must use the format {DATETIME_FORMAT_STRING}'
+            )
+
+        unknown = find_unknown_sensors(readings)
+        if unknown:
+            raise InvalidAPIUsage(
+                f'No sensor record exist for id: {min(unknown)}',
+                status_code=StatusCode.NOT_FOUND
+            )
+
+        success, message, created = ingest_readings(readings)
+        if not success:
+            raise InvalidAPIUsage(f'Failed to create records: {message}')
+
+        return jsonify({"created": created, "duplicates": len(readings) - created})
+
+    def _get_range_condition(self):
+        """ _get_range_condition
+
+        Private helper function for building the condition selecting sensor
+        data from the `sensor_id`, `from` and `to` query parameters. Only
+        supported for sensor data, and `sensor_id` is required so that a
+        request can't affect every reading by accident.
+
+        Returns:
+            SQL expression selecting the readings
+        """
+        if self.model != SensorDataReadable:
+            raise InvalidAPIUsage(
+                f'{request.method} is only supported for sensor data.',
+                status_code=StatusCode.METHOD_NOT_ALLOWED
+            )
+
+        sensor_id = request.args.get('sensor_id', type=int)
+        if sensor_id is None:
+            raise InvalidAPIUsage('The sensor_id query parameter is required.')
+
+        condition = SensorDataReadable.sensor_id == sensor_id
+        datetime_from, datetime_to = get_datetime_range_args()
+        if datetime_from:
+            condition &= SensorDataReadable.datetime >= datetime_from
+        if datetime_to:
+            condition &= SensorDataReadable.datetime <= datetime_to
+        return condition
+
+    def delete(self):
+        """ delete
+
+        Handles DELETE requests, deleting the readings of a sensor within
+        the range given by the `sensor_id`, `from` and `to` query parameters.
+        Archived blocks within the range are deleted whole, and the blocks
+        overlapping its ends are rewritten without the readings in it.
+
+        Returns:
+            JSON Response with the number of deleted records
+        """
+        condition = self._get_range_condition()
+        sensor_id = request.args.get('sensor_id', type=int)
+        deleted = delete_archived(db_session, sensor_id, *get_datetime_range_args())
+        deleted += delete_readings_in_chunks(
+            db_session, condition, current_app.config['BULK_CHUNK_SIZE'])
+        refresh_sensor_stats(db_session, [sensor_id])
+        return jsonify({"deleted": deleted})
+
+    def patch(self):
+        """ patch
+
+        Handles PATCH requests, correcting the readings of a sensor within the
+        range given by the `sensor_id`, `from` and `to` query parameters. The body
+        can replace `value` and `units`, or convert numeric values with
+        `scale` and `offset`, i.e. `value * scale + offset`. Values that aren't
+        numbers are left unchanged by a conversion, and integers stay integers
+        when the converted value is whole. Only the archived blocks holding
+        readings that change are rewritten.
+
+        Returns:
+            JSON Response with the number of updated records
+        """
+        condition = self._get_range_condition()
+        json_body = request.json
+        if not sensor_data_patch_validator(json_body):
+            raise InvalidAPIUsage(
+                'Invalid raw body structure for request.'
+            )
+
+        values = {key: json_body[key] for key in ('value', 'units') if key in json_body}
+        if 'scale' in json_body or 'offset' in json_body:
+            values['value'] = scale_values(json_body.get('scale', 1),
+                                           json_body.get('offset', 0))
+            if 'units' not in json_body:
+                # Only the readings that are converted count as updated
+                condition &= is_numeric(SensorDataReadable.value)
+
+        sensor_id = request.args.get('sensor_id', type=int)
+        updated = update_archived(db_session, sensor_id, *get_datetime_range_args(), json_body)
+        updated += update_readings_in_chunks(
+            db_session, condition, values, current_app.config['BULK_CHUNK_SIZE'])
+        refresh_sensor_stats(db_session, [sensor_id])
+        return jsonify({"updated": updated})
+
+
+class SensorDataQueryAPI(MethodView):
+    """ SensorDataQueryAPI
+
+    Implements batch querying of sensor data, so that the readings of many
+    sensors can be fetched with a single request and a single SQL query.
+    Queries within the hot tier's window are answered from memory.
+
+    POST is the only HTTP request type that is implemented, since the list of
+    queries is passed in the request body.
+    """
+    init_every_request = False
+
+    def post(self):
+        """ post
+
+        Handles POST requests. The body is a list of queries of the form
+        `{"sensor_id": 1, "from": "...", "to": "...", "limit": 100}`, where
+        `from`, `to` and `limit` are optional. When a limit is given, the
+        latest `limit` readings in the range are returned. A request holds
+        at most 200 queries.
+
+        Returns:
+            JSON Response of the readings grouped by query
+        """
+        columnar, epoch = get_columnar_options()
+        json_body = request.json
+        is_valid = sensor_data_query_validator(json_body)
+        if not is_valid:
+            raise InvalidAPIUsage(
+                'Invalid raw body structure for request.'
+            )
+
+        specs = []
+        for query in json_body:
+            spec = {
+                'sensor_id': query['sensor_id'],
+                'limit': query.get('limit'),
+            }
+            try:
+                for key, field in (('datetime_from', 'from'), ('datetime_to', 'to')):
+                    if field in query:
+                        spec[key] = datetime.datetime.strptime(
+                            query[field], DATETIME_FORMAT_STRING)
+            except ValueError:
+                raise InvalidAPIUsage(
+                    f'Datetimes must use the format {DATETIME_FORMAT_STRING}'
+                )
+            specs.append(spec)
+
+        sensor_ids = {spec['sensor_id'] for spec in specs}
+        sensor_names = dict(read_session.execute(
+            select(Sensor.id, Sensor.name).where(Sensor.id.in_(sensor_ids))
+        ).all())
+        missing = sensor_ids - sensor_names.keys()
+        if missing:
+            raise InvalidAPIUsage(
+                f'No sensor record exist for id: {min(missing)}',
+                status_code=StatusCode.NOT_FOUND
+            )
+
+        results = query_ranges(read_session, specs)
+        if columnar:
+            return jsonify([
+                readings_to_columnar(spec['sensor_id'], sensor_names[spec['sensor_id']],
+                                     rows, epoch)
+                for spec, rows in zip(specs, results)])
+
+        return jsonify([{
+            "sensor": sensor_names[spec['sensor_id']],
+            "sensor_id": spec['sensor_id'],
+            "data": [reading_to_json(row) for row in rows]
+        } for spec, rows in zip(specs, results)])
+
+
+class StatsAPI(MethodView):
+    """ StatsAPI
+
+    Implements reading the statistics of a sensor, or the combined statistics
+    of the sensors in a room or building, from the `sensor_stats` table
+    without scanning any sensor data.
+    """
+    init_every_request = False
+
+    def __init__(self, model):
+        self.model = model
+
+    def get(self, id):
+        """ get
+
+        Handles GET requests
+
+        Parameters:
+            id - id corresponding to a model record
+        Returns:
+            JSON Response of the statistics
+        """
+        if not read_session.get(self.model, id):
+            raise InvalidAPIUsage(
+                f'No {str(self.model)} record exist for id: {id}',
+                status_code=StatusCode.NOT_FOUND
+            )
+        return jsonify(get_stats(read_session, self.model, id).to_json())
+
+
+class SummaryAPI(MethodView):
+    """ SummaryAPI
+
+    Implements summarizing the readings of a room, or of each room in a
+    building, within a datetime range, aggregated by SQLite with a single
+    GROUP BY statement rather than serializing every reading.
+    """
+    init_every_request = False
+
+    def __init__(self, model):
+        self.model = model
+
+    @cached
+    def get(self, id):
+        """ get
+
+        Handles GET requests, summarizing the readings between the optional
+        `from` and `to` query parameters.
+
+        Parameters:
+            id - id corresponding to a model record
+        Returns:
+            JSON Response of the average, minimum, maximum and count of the
+            readings of each room per units, and the latest reading of each sensor
+        """
+        record = read_session.get(self.model, id)
+        if not record:
+            raise InvalidAPIUsage(
+                f'No {str(self.model)} record exist for id: {id}',
+                status_code=StatusCode.NOT_FOUND
+            )
+
+        datetime_from, datetime_to = get_datetime_range_args()
+        rooms = summarize_readings(read_session, self.model, id, datetime_from, datetime_to)
+        if self.model == Room:
+            return jsonify(rooms[0])
+        return jsonify({
+            "building": record.name,
+            "building_id": record.id,
+            "rooms": rooms,
+        })
+
+
+class SearchAPI(MethodView):
+    """ SearchAPI
+
+    Implements searching buildings, rooms and sensors by name and description,
+    so clients don't have to download every record to find one.
+    """
+    init_every_request = False
+
+    def get(self):
+        """ get
+
+        Handles GET requests. `?q=` is the text to search for, where every
+        word must match the start of a word in the name or description, and
+        `?limit=` the maximum number of results.
+
+        Returns:
+            JSON Response of the matching records and their paths, best matches first
+        """
+        limit = request.args.get('limit', DEFAULT_SEARCH_LIMIT, type=int)
+        if not 0 < limit <= MAX_SEARCH_LIMIT:
+            raise InvalidAPIUsage(f'limit must be between 1 and {MAX_SEARCH_LIMIT}')
+        try:
+            results = search(read_session, request.args.get('q', ''), limit)
+        except ValueError as e:
+            raise InvalidAPIUsage(str(e))
+        return jsonify([result_to_json(*result) for result in results])
+
+
+class AlertsAPI(MethodView):
+    """ AlertsAPI
+
+    Implements reading the state of the alert rules, which are evaluated
+    as readings are ingested, so clients don't have to poll raw readings.
+    """
+    init_every_request = False
+
+    def get(self):
+        """ get
+
+        Handles GET requests. `?status=` filters the alerts by status
+        ('ok', 'pending' or 'firing') and `?sensor_id=` by sensor.
+
+        Returns:
+            JSON Response of the alert states
+        """
+        status = request.args.get('status')
+        if status and status not in ALERT_STATUSES:
+            raise InvalidAPIUsage(f'Unknown alert status: {status}')
+        sensor_id = request.args.get('sensor_id', type=int)
+
+        alerts = query_alerts(read_session, status, sensor_id)
+        return jsonify([alert.to_json() for alert in alerts])
+
+
+class AnalyticsAPI(MethodView):
+    """ AnalyticsAPI
+
+    Implements computing analytics over a sensor's readings, which are loaded
+    into NumPy arrays with a single query and processed vectorized.
+    """
+    init_every_request = False
+
+    def get(self, id):
+        """ get
+
+        Handles GET requests. `?ops=` is a comma separated list of operations,
+        e.g. `rolling_mean:15m,p95,rate`, computed over the readings between
+        the optional `from` and `to` query parameters. `?timestamps=epoch`
+        serializes datetimes as integer epoch seconds.
+
+        Parameters:
+            id - id corresponding to a sensor record
+        Returns:
+            JSON Response of the results of each operation
+        """
+        # NumPy is imported by the first analytics request rather than at startup
+        from .analytics import compute_analytics, load_series, parse_ops
+
+        sensor = read_session.get(Sensor, id)
+        if not sensor:
+            raise InvalidAPIUsage(
+                f'No {str(Sensor)} record exist for id: {id}',
+                status_code=StatusCode.NOT_FOUND
+            )
+
+        datetime_from, datetime_to = get_datetime_range_args()
+        try:
+            ops = parse_ops(request.args.get('ops', ''),
+                            current_app.config['ANALYTICS_MAX_HISTOGRAM_BINS'])
+            times, values = load_series(read_session, id, datetime_from, datetime_to,
+                                        current_app.config['ANALYTICS_MAX_ROWS'])
+        except ValueError as e:
+            raise InvalidAPIUsage(str(e))
+
+        return jsonify({
+            "sensor": sensor.name,
+            "sensor_id": sensor.id,
+            "count": len(values),
+            "results": compute_analytics(
+                ops, times, values, request.args.get('timestamps') == 'epoch'),
+        })
+
+
+class AlignedAPI(MethodView):
+    """ AlignedAPI
+
+    Implements resampling the readings of every sensor in a room onto a
+    shared time axis, so sensors reporting at different rates can be compared
+    without aligning their raw readings client-side.
+    """
+    init_every_request = False
+    model = Room
+
+    @cached
+    def get(self, id):
+        """ get
+
+        Handles GET requests. The axis runs from the required `from` query
+        parameter to `to`, every `step` (e.g. `30s`, `1m`, `1h`, default `1m`).
+        Each step holds the mean of a sensor's numeric readings within it,
+        including the last step, which may extend past `to`. Steps without
+        readings are filled according to `fill`: `none` (null),
+        `ffill` (the last value) or `linear` (interpolated). `?timestamps=epoch`
+        serializes datetimes as integer epoch seconds.
+
+        Parameters:
+            id - id corresponding to a room record
+        Returns:
+            JSON Response of the time axis and a column of values per sensor
+        """
+        from .analytics import (FILL_METHODS, align_series, format_times, load_room_series,
+                                parse_duration, time_axis, to_epoch_seconds, values_json)
+
+        room = read_session.get(Room, id)
+        if not room:
+            raise InvalidAPIUsage(
+                f'No {str(Room)} record exist for id: {id}',
+                status_code=StatusCode.NOT_FOUND
+            )
+
+        datetime_from, datetime_to = get_datetime_range_args()
+        if not datetime_from or not datetime_to:
+            raise InvalidAPIUsage('The from and to query parameters are required.')
+        fill = request.args.get('fill', 'none')
+        if fill not in FILL_METHODS:
+            raise InvalidAPIUsage(f'fill must be one of {", ".join(FILL_METHODS)}')
+
+        # The columns are the sensors listed before the readings are loaded,
+        # and only their readings are loaded, so a sensor added in between is left out
+        sensors = read_session.execute(
+            select(Sensor.id, Sensor.name).where(Sensor.room_id == id).order_by(Sensor.id)
+        ).all()
+        sensor_ids = [sensor.id for sensor in sensors]
+
+        config = current_app.config
+        try:
+            step = parse_duration(request.args.get('step', '1m'))
+            axis = time_axis(to_epoch_seconds(datetime_from), to_epoch_seconds(datetime_to),
+                             step, config['ANALYTICS_MAX_POINTS'])
+            # Readings are loaded up to the end of the last step, past `to`
+            datetime_end = datetime_from + datetime.timedelta(seconds=len(axis) * step)
+            reading_sensor_ids, times, values = load_room_series(
+                read_session, sensor_ids, datetime_from, max(datetime_end, datetime_to),
+                config['ANALYTICS_MAX_ROWS'])
+        except ValueError as e:
+            raise InvalidAPIUsage(str(e))
+
+        columns = align_series(reading_sensor_ids, times, values, sensor_ids,
+                               axis, step, fill)
+        return jsonify({
+            "room": room.name,
+            "room_id": room.id,
+            "step": step,
+            "fill": fill,
+            "datetime": format_times(axis, request.args.get('timestamps') == 'epoch'),
+            "sensors": [{
+                "sensor": sensor.name,
+                "sensor_id": sensor.id,
+                "value": values_json(column),
+            } for sensor, column in zip(sensors, columns)],
+        })
+
+
+class DeletionJobAPI(MethodView):
+    """ DeletionJobAPI
+
+    Reports the progress of deletions running in the background.
+    """
+    init_every_request = False
+
+    def get(self, job_id):
+        """ get
+
+        Handles GET requests
+
+        Parameters:
+            job_id - id of the deletion job
+        Returns:
+            JSON Response of the job's status and the number of deleted readings
+        """
+        job = get_deletion_job(job_id)
+        if not job:
+            raise InvalidAPIUsage(
+                f'No deletion job exist for id: {job_id}',
+                status_code=StatusCode.NOT_FOUND
+            )
+        return jsonify(job.to_json())
+
 
 @bp.errorhandler(InvalidAPIUsage)
 def invalid_api_usage(exception):
@@ -360,19 +1066,54 @@ def invalid_api_usage(exception):
     return jsonify(exception.to_dict()), exception.status_code
 
 
+@bp.errorhandler(MissingReadingsIndexError)
+def missing_readings_index(exception):
+    """
+    missing_readings_index
+
+    Application function handler for writes of sensor data to a database
+    that has to be deduplicated first.
+
+    Parameter:
+        exception - instance of MissingReadingsIndexError
+
+    Returns:
+        JSON response of the exception
+    """
+    return jsonify({'message': str(exception)}), StatusCode.INTERNAL_SERVER_ERROR
+
+
+@bp.errorhandler(MissingCascadeError)
+def missing_cascade(exception):
+    """
+    missing_cascade
+
+    Application function handler for deletes from a database whose foreign
+    keys have to be rebuilt first.
+
+    Parameter:
+        exception - instance of MissingCascadeError
+
+    Returns:
+        JSON response of the exception
+    """
+    return jsonify({'message': str(exception)}), StatusCode.INTERNAL_SERVER_ERROR
+
+
 def register_api_for_model(bp, model, name):
     """ register_api_for_model
 
     Initializes Index and List APIs for the given model, and registers
-    them with the provided Blueprint, `bp`.
+    them with the provided Blueprint, `bp`. Both can be profiled per request,
+    see `api.profiler`.
 
     Parameters:
         bp - Blueprint
         model - model the API is created for
         name - name of the converted view_function to be registered with the `bp`
     """
-    index_api = IndexAPI.as_view(f'{name}_index', model)
-    list_api = ListAPI.as_view(f'{name}_list', model)
+    index_api = profiled(IndexAPI.as_view(f'{name}_index', model))
+    list_api = profiled(ListAPI.as_view(f'{name}_list', model))
     bp.add_url_rule(f'/{name}/<int:id>', view_func=index_api)
     bp.add_url_rule(f'/{name}/', view_func=list_api)
 
@@ -380,3 +1121,20 @@ def register_api_for_model(bp, model, name):
 # Registers model endpoints with Blueprint
 for name_url, model in URL_MODEL_MAPPING.items():
     register_api_for_model(bp, model, name_url)
+
+bp.add_url_rule('/sensor_data/query',
+                view_func=SensorDataQueryAPI.as_view('sensor_data_query'))
+for name_url, model in (('buildings', Building), ('rooms', Room), ('sensors', Sensor)):
+    bp.add_url_rule(f'/{name_url}/<int:id>/stats',
+                    view_func=StatsAPI.as_view(f'{name_url}_stats', model))
+for name_url, model in (('buildings', Building), ('rooms', Room)):
+    bp.add_url_rule(f'/{name_url}/<int:id>/summary',
+                    view_func=SummaryAPI.as_view(f'{name_url}_summary', model))
+bp.add_url_rule('/sensors/<int:id>/analytics',
+                view_func=AnalyticsAPI.as_view('sensors_analytics'))
+bp.add_url_rule('/rooms/<int:id>/aligned',
+                view_func=AlignedAPI.as_view('rooms_aligned'))
+bp.add_url_rule('/search', view_func=SearchAPI.as_view('search'))
+bp.add_url_rule('/alerts', view_func=AlertsAPI.as_view('alerts'))
+bp.add_url_rule('/deletions/<int:job_id>',
+                view_func=DeletionJobAPI.as_view('deletion_job'))
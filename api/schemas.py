@@ -97,6 +97,109 @@ sensor_data_schema = {
     'additionalProperties': False,
 }
 
+# JSON schema for batch querying the readings of several sensors. Each query
+# is a member of a compound SELECT, which SQLite limits to 500 members.
+sensor_data_query_schema = {
+    'type': 'array',
+    'minItems': 1,
+    'maxItems': 200,
+    'items': {
+        'type': 'object',
+        'properties': {
+            'sensor_id': {
+                'type': 'integer',
+            },
+            'from': {
+                'type': 'string',
+                'format': 'date-time',
+            },
+            'to': {
+                'type': 'string',
+                'format': 'date-time',
+            },
+            'limit': {
+                'type': 'integer',
+                'minimum': 1,
+            },
+        },
+        'required': [
+            'sensor_id',
+        ],
+        'additionalProperties': False,
+    },
+}
+
+# JSON schema for bulk correcting sensor data over a range. `value` replaces
+# the values, while `scale` and `offset` convert numeric values.
+sensor_data_patch_schema = {
+    'type': 'object',
+    'properties': {
+        'value': {
+            'type': 'string',
+        },
+        'units': {
+            'type': 'string',
+        },
+        'scale': {
+            'type': 'number',
+        },
+        'offset': {
+            'type': 'number',
+        },
+    },
+    'minProperties': 1,
+    'not': {
+        'anyOf': [
+            {'required': ['value', 'scale']},
+            {'required': ['value', 'offset']},
+        ],
+    },
+    'additionalProperties': False,
+}
+
+# JSON schema for the AlertRule model. A rule applies to exactly one of a
+# sensor, a room or a building.
+alert_rule_schema = {
+    'type': 'object',
+    'properties': {
+        'name': {
+            'type': 'string',
+        },
+        'sensor_id': {
+            'type': 'integer',
+        },
+        'room_id': {
+            'type': 'integer',
+        },
+        'building_id': {
+            'type': 'integer',
+        },
+        'operator': {
+            'enum': ['above', 'below'],
+        },
+        'threshold': {
+            'type': 'number',
+        },
+        'duration': {
+            'type': 'integer',
+            'minimum': 0,
+        },
+        'hysteresis': {
+            'type': 'number',
+            'minimum': 0,
+        },
+    },
+    'required': [
+        'name', 'operator', 'threshold',
+    ],
+    'oneOf': [
+        {'required': ['sensor_id']},
+        {'required': ['room_id']},
+        {'required': ['building_id']},
+    ],
+    'additionalProperties': False,
+}
+
 
 # Maps models to their JSON schema
 # Should this be coupled more closely to the models?
@@ -106,5 +209,6 @@ SCHEMA_MAPPING = {
     Building: building_schema,
     Room: room_schema,
     Sensor: sensor_schema,
-    SensorDataReadable: sensor_data_schema
+    SensorDataReadable: sensor_data_schema,
+    AlertRule: alert_rule_schema
 }
@@ -0,0 +1,204 @@
+import re
+
+from flask import url_for
+from sqlalchemy import and_, case, event, literal, or_, select, text, union_all
+
+from .constants import URL_MODEL_MAPPING
+from .database import Base
+from .models import Building, Room, Sensor
+
+# Name of the FTS5 table indexing the names and descriptions of the models
+SEARCH_TABLE = 'search_index'
+
+# Models that are searchable. Rows of the index are keyed by
+# `id * len(SEARCH_MODELS) + position`, so the record of a match is known
+# without any extra column, and triggers can delete rows by key.
+SEARCH_MODELS = (Building, Room, Sensor)
+
+# Relative weights of matches in the name and description columns when ranking
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+# Default and maximum number of search results
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+
+def search_key(model, id_column):
+    """ search_key
+
+    SQL expression of the index key of a record.
+    """
+    return f'{id_column} * {len(SEARCH_MODELS)} + {SEARCH_MODELS.index(model)}'
+
+
+def create_search_index(target, connection, **kw):
+    """ create_search_index
+
+    Creates the FTS5 index and the triggers keeping it in sync with the
+    indexed tables, after the tables are created. Existing records are
+    indexed when the index is first created. Builds of SQLite without FTS5
+    are skipped, and searches fall back to LIKE queries.
+    """
+    if connection.dialect.name != 'sqlite':
+        return
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE name = ?", (SEARCH_TABLE,)).first()
+    if exists:
+        return
+
+    compile_options = {row[0] for row in connection.exec_driver_sql('PRAGMA compile_options')}
+    if 'ENABLE_FTS5' not in compile_options:
+        return
+
+    connection.exec_driver_sql(
+        f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+        f"name, description, tokenize='unicode61 remove_diacritics 2', prefix='2 3')")
+    for model in SEARCH_MODELS:
+        table = model.__tablename__
+        insert = (f"INSERT INTO {SEARCH_TABLE}(rowid, name, description) "
+                  f"VALUES ({search_key(model, 'new.id')}, new.name, new.description);")
+        delete = f"DELETE FROM {SEARCH_TABLE} WHERE rowid = {search_key(model, 'old.id')};"
+        connection.exec_driver_sql(
+            f"CREATE TRIGGER {table}_search_insert AFTER INSERT ON {table} "
+            f"BEGIN {insert} END")
+        connection.exec_driver_sql(
+            f"CREATE TRIGGER {table}_search_update AFTER UPDATE OF id, name, description "
+            f"ON {table} BEGIN {delete} {insert} END")
+        connection.exec_driver_sql(
+            f"CREATE TRIGGER {table}_search_delete AFTER DELETE ON {table} "
+            f"BEGIN {delete} END")
+        connection.exec_driver_sql(
+            f"INSERT INTO {SEARCH_TABLE}(rowid, name, description) "
+            f"SELECT {search_key(model, 'id')}, name, description FROM {table}")
+
+
+def drop_search_index(target, connection, **kw):
+    """ drop_search_index
+
+    Drops the FTS5 index, and the triggers keeping it in sync, e.g. before
+    the indexed tables are dropped.
+    """
+    if connection.dialect.name != 'sqlite':
+        return
+    for model in SEARCH_MODELS:
+        for operation in ('insert', 'update', 'delete'):
+            connection.exec_driver_sql(
+                f'DROP TRIGGER IF EXISTS {model.__tablename__}_search_{operation}')
+    connection.exec_driver_sql(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+def has_search_index(session):
+    """ has_search_index
+
+    Returns whether the database has the FTS5 index.
+    """
+    return session.execute(
+        text('SELECT 1 FROM sqlite_master WHERE name = :name'),
+        {'name': SEARCH_TABLE}).first() is not None
+
+
+def parse_terms(query):
+    """ parse_terms
+
+    Splits a search query into its words, ignoring punctuation and FTS5 syntax.
+    """
+    return re.findall(r'\w+', query)
+
+
+def search_index(session, terms, limit):
+    """ search_index
+
+    Searches the FTS5 index for records matching every term as a prefix,
+    ranked by bm25, where matches in names weigh more than in descriptions.
+
+    Returns:
+        list of (model, id, name, description) tuples
+    """
+    match = ' '.join(f'"{term}"*' for term in terms)
+    rows = session.execute(text(
+        f"SELECT rowid, name, description FROM {SEARCH_TABLE} "
+        f"WHERE {SEARCH_TABLE} MATCH :match "
+        f"ORDER BY bm25({SEARCH_TABLE}, {NAME_WEIGHT}, {DESCRIPTION_WEIGHT}) "
+        f"LIMIT :limit"), {'match': match, 'limit': limit})
+    count = len(SEARCH_MODELS)
+    return [(SEARCH_MODELS[rowid % count], rowid // count, name, description)
+            for rowid, name, description in rows]
+
+
+def search_like(session, terms, limit):
+    """ search_like
+
+    Searches the tables with LIKE conditions, for databases without the FTS5
+    index. Records whose names contain every term are ranked first.
+
+    Returns:
+        list of (model, id, name, description) tuples
+    """
+    members = []
+    for position, model in enumerate(SEARCH_MODELS):
+        name_matches = and_(*(model.name.contains(term, autoescape=True) for term in terms))
+        members.append(
+            select(literal(position).label('model'), model.id, model.name,
+                   model.description,
+                   case((name_matches, 0), else_=1).label('rank'))
+            .where(*(or_(model.name.contains(term, autoescape=True),
+                         model.description.contains(term, autoescape=True))
+                     for term in terms)))
+    combined = union_all(*members).subquery()
+    statement = (select(combined.c.model, combined.c.id, combined.c.name,
+                        combined.c.description)
+                 .order_by(combined.c.rank, combined.c.name)
+                 .limit(limit))
+    return [(SEARCH_MODELS[position], id, name, description)
+            for position, id, name, description in session.execute(statement)]
+
+
+def search(session, query, limit=DEFAULT_SEARCH_LIMIT):
+    """ search
+
+    Searches the names and descriptions of buildings, rooms and sensors.
+
+    Parameters:
+        session - database session used for the query
+        query - text to search for, where each word is matched as a prefix
+        limit - maximum number of results
+
+    Returns:
+        list of (model, id, name, description) tuples, best matches first
+    """
+    terms = parse_terms(query)
+    if not terms:
+        raise ValueError('The search query must contain a word.')
+    if has_search_index(session):
+        return search_index(session, terms, limit)
+    return search_like(session, terms, limit)
+
+
+def result_to_json(model, id, name, description):
+    """ result_to_json
+
+    Serializes a search result to a JSON object, with the path of the record.
+    """
+    name_url = next(name for name, mapped in URL_MODEL_MAPPING.items() if mapped == model)
+    return {
+        "type": model.__tablename__,
+        "id": id,
+        "name": name,
+        "description": description,
+        "path": url_for(f'api.{name_url}_index', id=id),
+    }
+
+
+def init_app(app):
+    """ init_app
+
+    Parameters:
+        app - Flask app instance
+
+    Registers the creation and removal of the search index with the tables.
+    """
+    for name, listener in (('after_create', create_search_index),
+                           ('before_drop', drop_search_index)):
+        if not event.contains(Base.metadata, name, listener):
+            event.listen(Base.metadata, name, listener)
@@ -0,0 +1,207 @@
+import os
+import signal
+import socket
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from werkzeug.serving import BaseWSGIServer
+
+from .database import check_foreign_keys
+from .hot_tier import warm_hot_tier
+
+# Pool classes that accept the per-worker connection limits set by `serve`
+LIMITED_POOL_CLASSES = (None, 'QueuePool')
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """ PooledWSGIServer
+
+    WSGI server handling requests on a fixed size pool of threads, which
+    bounds the number of database connections a worker process opens.
+    """
+    multithread = True
+
+    def __init__(self, host, port, app, threads, fd=None):
+        super().__init__(host, port, app, fd=fd)
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        executor = getattr(self, 'executor', None)
+        if executor:
+            executor.shutdown(wait=False)
+
+
+def bind_socket(host, port):
+    """ bind_socket
+
+    Creates the listening socket shared by every worker process.
+
+    Returns:
+        bound and listening socket
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(PooledWSGIServer.request_queue_size)
+    sock.set_inheritable(True)
+    return sock
+
+
+def limit_worker_pool(config, threads):
+    """ limit_worker_pool
+
+    Limits each worker's connection pool to one connection per thread, unless
+    the pool size is already configured.
+    """
+    if config.get('DATABASE_POOL_CLASS') not in LIMITED_POOL_CLASSES:
+        return
+    if config.get('DATABASE_POOL_SIZE') is None:
+        config['DATABASE_POOL_SIZE'] = threads
+    if config.get('DATABASE_MAX_OVERFLOW') is None:
+        config['DATABASE_MAX_OVERFLOW'] = 0
+
+
+def run_worker(app, sock, threads):
+    """ run_worker
+
+    Serves requests on the shared socket until the process is terminated.
+    Database engines are created lazily, so each worker opens its own connections.
+    """
+    host, port = sock.getsockname()[:2]
+    server = PooledWSGIServer(host, port, app, threads, fd=sock.fileno())
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def stop_workers(pids):
+    """ stop_workers
+
+    Terminates the worker processes and waits for them to exit.
+    """
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    for pid in pids:
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+
+
+def serve(app, sock, workers, threads):
+    """ serve
+
+    Pre-forks `workers` processes, each serving requests from the shared
+    socket on `threads` threads. Workers that exit are replaced until the
+    server is interrupted or terminated. The hot tier is warmed, and the
+    foreign keys are checked, before forking.
+
+    Parameters:
+        app - Flask app instance
+        sock - bound and listening socket
+        workers - number of worker processes
+        threads - number of request threads per worker
+    """
+    limit_worker_pool(app.config, threads)
+    check_foreign_keys(app)
+    # Workers inherit the warmed hot tier from this process
+    warm_hot_tier(app)
+    if workers == 1:
+        run_worker(app, sock, threads)
+        return
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            # Lets the parent handle interrupts, and exit on termination
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            try:
+                run_worker(app, sock, threads)
+            finally:
+                os._exit(0)
+        return pid
+
+    def terminate(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, terminate)
+    pids = {spawn() for _ in range(workers)}
+    try:
+        while True:
+            pid, _ = os.wait()
+            if pid in pids:
+                pids.remove(pid)
+                app.logger.warning('Worker %d exited, starting a new worker', pid)
+                pids.add(spawn())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_workers(pids)
+
+
+@click.command('serve')
+@with_appcontext
+@click.option('--host', default='127.0.0.1', show_default=True,
+              help='Address the server binds to')
+@click.option('--port', default=5000, show_default=True, type=int,
+              help='Port the server binds to')
+@click.option('--workers', '-w', default=os.cpu_count() or 1, show_default=True,
+              type=click.IntRange(min=1),
+              help='Number of worker processes')
+@click.option('--threads', '-t', default=4, show_default=True,
+              type=click.IntRange(min=1),
+              help='Number of request threads per worker')
+def serve_command(host, port, workers, threads):
+    """ serve
+
+    Serves the app with pre-forked worker processes, so that reads scale
+    across cores. Each worker creates its own database engines after the
+    fork, with a connection pool of one connection per thread.
+
+    Parameters:
+        host - address the server binds to
+        port - port the server binds to
+        workers - number of worker processes
+        threads - number of request threads per worker
+    """
+    if workers > 1 and not hasattr(os, 'fork'):
+        raise click.UsageError('Multiple workers require os.fork()')
+
+    sock = bind_socket(host, port)
+    click.echo(f'Serving on http://{host}:{port} with {workers} workers '
+               f'of {threads} threads')
+    try:
+        serve(current_app._get_current_object(), sock, workers, threads)
+    finally:
+        sock.close()
+    click.echo('Stopped server.')
+
+
+def init_app(app):
+    """ init_app
+
+    Parameters:
+        app - Flask app instance
+
+    Registers the `serve_command` with the application.
+    """
+    app.cli.add_command(serve_command)
@@ -0,0 +1,141 @@
+import collections
+import datetime
+import threading
+import time
+
+from flask import current_app, has_app_context, has_request_context, request
+from sqlalchemy import event
+
+from .constants import DATETIME_FORMAT_STRING
+
+
+class SlowQueryLog:
+    """ SlowQueryLog
+
+    Thread safe record of the most recent slow statements of an app.
+    """
+
+    def __init__(self, size):
+        self.entries = collections.deque(maxlen=size)
+        self.lock = threading.Lock()
+
+    def add(self, entry):
+        with self.lock:
+            self.entries.append(entry)
+
+    def recent(self):
+        """ recent
+
+        Returns the recorded statements, newest first.
+        """
+        with self.lock:
+            return list(reversed(self.entries))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def get_slow_query_log(app=None):
+    """ get_slow_query_log
+
+    Returns the app's slow query log, or None if slow queries aren't recorded.
+    """
+    app = app or current_app
+    return app.extensions.get('slow_queries')
+
+
+def to_json_value(value):
+    """ to_json_value
+
+    Converts a statement parameter to a JSON serializable value.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def explain_query_plan(dbapi_connection, statement, parameters):
+    """ explain_query_plan
+
+    Captures SQLite's query plan of a statement, on a separate cursor of the
+    DBAPI connection so that the statement's own results aren't disturbed.
+
+    Returns:
+        list of the plan's lines, indented by depth, or None if it can't be explained
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f'EXPLAIN QUERY PLAN {statement}', parameters)
+        depths = {}
+        plan = []
+        for id, parent, _, detail in cursor.fetchall():
+            depths[id] = depths.get(parent, -1) + 1
+            plan.append('  ' * depths[id] + detail)
+        return plan
+    except Exception:
+        return None
+    finally:
+        cursor.close()
+
+
+def start_timer(conn, cursor, statement, parameters, context, executemany):
+    context.slow_query_start = time.perf_counter()
+
+
+def make_recorder(threshold):
+    """ make_recorder
+
+    Returns an `after_cursor_execute` listener recording the statements that
+    took at least `threshold` milliseconds.
+    """
+    def record(conn, cursor, statement, parameters, context, executemany):
+        duration = (time.perf_counter() - context.slow_query_start) * 1000
+        if duration < threshold or not has_app_context():
+            return
+        log = get_slow_query_log()
+        if log is None:
+            return
+
+        if executemany:
+            parameters = parameters[0] if parameters else ()
+        entry = {
+            "statement": statement,
+            "parameters": [to_json_value(value) for value in parameters or ()],
+            "executemany": executemany,
+            "duration_ms": round(duration, 3),
+            "endpoint": request.endpoint if has_request_context() else None,
+            "path": request.full_path if has_request_context() else None,
+            "time": datetime.datetime.now(datetime.timezone.utc).strftime(
+                DATETIME_FORMAT_STRING),
+            "plan": explain_query_plan(conn.connection.dbapi_connection, statement,
+                                       parameters or ()),
+        }
+        log.add(entry)
+        current_app.logger.warning(
+            'Slow query (%.1f ms) on %s: %s %r\n%s', duration, entry['endpoint'],
+            statement, entry['parameters'], '\n'.join(entry['plan'] or []))
+    return record
+
+
+def track_slow_queries(engine, threshold):
+    """ track_slow_queries
+
+    Times every statement executed by an engine, recording the ones taking
+    at least `threshold` milliseconds in the current app's slow query log.
+    """
+    event.listen(engine, 'before_cursor_execute', start_timer)
+    event.listen(engine, 'after_cursor_execute', make_recorder(threshold))
+
+
+def init_app(app):
+    """ init_app
+
+    Parameters:
+        app - Flask app instance
+
+    Creates the app's slow query log when `SLOW_QUERY_THRESHOLD` is set. The
+    app's engines time their statements from their creation.
+    """
+    if app.config['SLOW_QUERY_THRESHOLD'] is not None:
+        app.extensions['slow_queries'] = SlowQueryLog(app.config['SLOW_QUERY_LOG_SIZE'])
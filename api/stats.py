@@ -0,0 +1,428 @@
+import math
+import re
+import sys
+from collections import namedtuple
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import (Float, String, and_, case, cast, delete, func, select,
+                        type_coerce, update)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .archive import iter_archived
+from .database import db_session
+from .constants import DATETIME_FORMAT_STRING
+from .models import Building, Room, Sensor, SensorDataReadable, SensorStats
+
+# Number of readings read at a time when recomputing statistics
+REFRESH_BATCH_SIZE = 10000
+
+# Text SQLite converts to a number when comparing it with one: an optionally
+# signed decimal with an optional exponent, surrounded by ASCII whitespace
+NUMBER_PATTERN = re.compile(
+    r'[ \t\n\r\f\v]*[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?[ \t\n\r\f\v]*', re.ASCII)
+
+# Row of `select_summary`, also built from the aggregates of archived readings
+SummaryRow = namedtuple('SummaryRow', [
+    'room_id', 'room', 'sensor_id', 'sensor', 'units', 'count', 'numeric_count',
+    'total', 'min', 'max', 'latest_datetime', 'latest_value'])
+
+
+def parse_numeric(value):
+    """ parse_numeric
+
+    Returns the value as a float, or None if it isn't a finite number. Text
+    must match NUMBER_PATTERN, so that values are read as `is_numeric` reads
+    them in SQL, e.g. '1_000' isn't a number.
+    """
+    if isinstance(value, str) and not NUMBER_PATTERN.fullmatch(value):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def is_numeric(column):
+    """ is_numeric
+
+    SQL condition selecting the values of a text column, such as the values
+    of sensor data, that `parse_numeric` reads as a number. CAST reads the
+    leading number of a text, or 0, e.g. '12abc' as 12 and 'v2' as 0, but a
+    text column compared with a number is only converted when the whole text
+    is a number. Infinite values are excluded, as NaN is by the comparison.
+    """
+    number = cast(column, Float)
+    return and_(column == number, number.between(-sys.float_info.max, sys.float_info.max))
+
+
+def aggregate_readings(readings, aggregates=None):
+    """ aggregate_readings
+
+    Computes per sensor statistics for a batch of readings in a single pass.
+
+    Parameters:
+        readings - iterable of readings, either dictionaries or rows with
+                   `sensor_id`, `value` and `datetime` fields
+        aggregates - optional dictionary of partial statistics to extend
+
+    Returns:
+        dictionary mapping sensor ids to dictionaries of SensorStats columns
+    """
+    aggregates = {} if aggregates is None else aggregates
+    for reading in readings:
+        if isinstance(reading, dict):
+            sensor_id, value, dtime = \
+                reading['sensor_id'], reading['value'], reading['datetime']
+        else:
+            sensor_id, value, dtime = reading.sensor_id, reading.value, reading.datetime
+
+        stats = aggregates.get(sensor_id)
+        if stats is None:
+            stats = aggregates[sensor_id] = {
+                'sensor_id': sensor_id, 'count': 0, 'numeric_count': 0,
+                'total': 0.0, 'min': None, 'max': None,
+                'first_value': value, 'first_datetime': dtime,
+                'last_value': value, 'last_datetime': dtime,
+            }
+
+        stats['count'] += 1
+        number = parse_numeric(value)
+        if number is not None:
+            stats['numeric_count'] += 1
+            stats['total'] += number
+            if stats['min'] is None or number < stats['min']:
+                stats['min'] = number
+            if stats['max'] is None or number > stats['max']:
+                stats['max'] = number
+        if dtime < stats['first_datetime']:
+            stats['first_value'], stats['first_datetime'] = value, dtime
+        if dtime >= stats['last_datetime']:
+            stats['last_value'], stats['last_datetime'] = value, dtime
+    return aggregates
+
+
+def update_sensor_stats(session, readings):
+    """ update_sensor_stats
+
+    Merges the statistics of newly inserted readings into the `sensor_stats`
+    table with a single upsert statement. This doesn't commit, so that the
+    statistics are updated in the same transaction as the readings.
+
+    Parameters:
+        session - database session used for the upsert
+        readings - list of inserted readings
+    """
+    rows = list(aggregate_readings(readings).values())
+    if not rows:
+        return
+
+    statement = sqlite_insert(SensorStats)
+    new = statement.excluded
+    statement = statement.on_conflict_do_update(
+        index_elements=[SensorStats.sensor_id],
+        set_={
+            'count': SensorStats.count + new['count'],
+            'numeric_count': SensorStats.numeric_count + new['numeric_count'],
+            'total': SensorStats.total + new['total'],
+            # SQLite's multi-argument min/max return NULL if any argument is NULL
+            'min': func.coalesce(func.min(SensorStats.min, new['min']),
+                                 SensorStats.min, new['min']),
+            'max': func.coalesce(func.max(SensorStats.max, new['max']),
+                                 SensorStats.max, new['max']),
+            'first_value': case(
+                (new['first_datetime'] < SensorStats.first_datetime, new['first_value']),
+                else_=SensorStats.first_value),
+            'first_datetime': func.min(SensorStats.first_datetime, new['first_datetime']),
+            'last_value': case(
+                (new['last_datetime'] >= SensorStats.last_datetime, new['last_value']),
+                else_=SensorStats.last_value),
+            'last_datetime': func.max(SensorStats.last_datetime, new['last_datetime']),
+        })
+    session.execute(statement, rows)
+
+
+def subtract_readings(session, readings):
+    """ subtract_readings
+
+    Removes deleted readings from the statistics of their sensors by
+    decrementing the counts and totals, without scanning the remaining
+    readings. When a deleted reading was a sensor's minimum, maximum, first
+    or last reading, the new one can't be known from the statistics alone,
+    so the sensor is returned to be refreshed instead. This doesn't commit,
+    so that the statistics are updated in the same transaction as the delete.
+
+    Parameters:
+        session - database session used for the update
+        readings - list of deleted readings
+
+    Returns:
+        set of sensor ids whose statistics must be recomputed with `refresh_sensor_stats`
+    """
+    stale = set()
+    for sensor_id, removed in aggregate_readings(readings).items():
+        stats = session.execute(
+            select(SensorStats.min, SensorStats.max, SensorStats.first_datetime,
+                   SensorStats.last_datetime)
+            .where(SensorStats.sensor_id == sensor_id)).first()
+        if (stats is None
+                or removed['first_datetime'] <= stats.first_datetime
+                or removed['last_datetime'] >= stats.last_datetime
+                or (removed['min'] is not None and removed['min'] <= stats.min)
+                or (removed['max'] is not None and removed['max'] >= stats.max)):
+            stale.add(sensor_id)
+            continue
+        session.execute(
+            update(SensorStats)
+            .where(SensorStats.sensor_id == sensor_id)
+            .values(count=SensorStats.count - removed['count'],
+                    numeric_count=SensorStats.numeric_count - removed['numeric_count'],
+                    total=SensorStats.total - removed['total']))
+    return stale
+
+
+def refresh_sensor_stats(session, sensor_ids=None):
+    """ refresh_sensor_stats
+
+    Recomputes the statistics of the given sensors from their readings, which
+    is needed after readings are deleted or modified. Readings, and archived
+    readings, are streamed in sensor order, so memory use doesn't grow with
+    the number of readings.
+
+    Parameters:
+        session - database session used for the refresh
+        sensor_ids - collection of sensor ids, or None for every sensor
+    """
+    statement = (select(SensorDataReadable.sensor_id,
+                        SensorDataReadable.value,
+                        SensorDataReadable.datetime)
+                 .order_by(SensorDataReadable.sensor_id)
+                 .execution_options(yield_per=REFRESH_BATCH_SIZE))
+    clear = delete(SensorStats)
+    if sensor_ids is not None:
+        statement = statement.where(SensorDataReadable.sensor_id.in_(sensor_ids))
+        clear = clear.where(SensorStats.sensor_id.in_(sensor_ids))
+
+    aggregates = aggregate_readings(iter_archived(session, sensor_ids))
+    for partition in session.execute(statement).partitions():
+        aggregate_readings(partition, aggregates)
+
+    session.execute(clear)
+    if aggregates:
+        session.execute(sqlite_insert(SensorStats), list(aggregates.values()))
+    session.commit()
+
+
+def get_stats(session, model, id):
+    """ get_stats
+
+    Returns the statistics of a sensor, or the combined statistics of the
+    sensors in a room or building, from the `sensor_stats` table.
+
+    Parameters:
+        session - database session used for the query
+        model - Building, Room or Sensor
+        id - id of the record
+
+    Returns:
+        SensorStats instance, which isn't added to the session for rooms and buildings
+    """
+    if model == Sensor:
+        return session.get(SensorStats, id) or SensorStats(sensor_id=id)
+
+    statement = select(SensorStats).join(Sensor, SensorStats.sensor_id == Sensor.id)
+    if model == Room:
+        statement = statement.where(Sensor.room_id == id)
+    else:
+        statement = (statement
+                     .join(Room, Sensor.room_id == Room.id)
+                     .where(Room.building_id == id))
+
+    combined = SensorStats(count=0, numeric_count=0, total=0.0)
+    for stats in session.scalars(statement):
+        combined.count += stats.count
+        combined.numeric_count += stats.numeric_count
+        combined.total += stats.total
+        if stats.min is not None and (combined.min is None or stats.min < combined.min):
+            combined.min = stats.min
+        if stats.max is not None and (combined.max is None or stats.max > combined.max):
+            combined.max = stats.max
+        if combined.first_datetime is None or stats.first_datetime < combined.first_datetime:
+            combined.first_value = stats.first_value
+            combined.first_datetime = stats.first_datetime
+        if combined.last_datetime is None or stats.last_datetime >= combined.last_datetime:
+            combined.last_value = stats.last_value
+            combined.last_datetime = stats.last_datetime
+    return combined
+
+
+def select_summary(model, id, datetime_from=None, datetime_to=None):
+    """ select_summary
+
+    Builds a single GROUP BY statement over the room -> sensor -> reading
+    join, aggregating the readings of each sensor by units. Sensors and rooms
+    without readings in the range are kept by the outer joins. Each row
+    also holds the sensor's latest reading of those units, found by
+    prefixing the values with their fixed width datetimes and taking the maximum.
+
+    Parameters:
+        model - Building or Room
+        id - id of the record
+        datetime_from - optional datetime the readings must be at or after
+        datetime_to - optional datetime the readings must be at or before
+
+    Returns:
+        SELECT statement
+    """
+    reading = SensorDataReadable
+    value = cast(reading.value, Float)
+    number = case((is_numeric(reading.value), value))
+    latest_datetime = func.max(reading.datetime)
+    latest = func.max(type_coerce(reading.datetime, String).concat(reading.value))
+
+    condition = reading.sensor_id == Sensor.id
+    if datetime_from:
+        condition = and_(condition, reading.datetime >= datetime_from)
+    if datetime_to:
+        condition = and_(condition, reading.datetime <= datetime_to)
+
+    statement = (select(Room.id.label('room_id'), Room.name.label('room'),
+                        Sensor.id.label('sensor_id'), Sensor.name.label('sensor'),
+                        reading.units,
+                        func.count(reading.id).label('count'),
+                        func.count(number).label('numeric_count'),
+                        func.sum(number).label('total'),
+                        func.min(number).label('min'),
+                        func.max(number).label('max'),
+                        latest_datetime.label('latest_datetime'),
+                        func.substr(latest, func.length(latest_datetime) + 1)
+                        .label('latest_value'))
+                 .select_from(Room)
+                 .outerjoin(Sensor, Sensor.room_id == Room.id)
+                 .outerjoin(reading, condition)
+                 .group_by(Room.id, Sensor.id, reading.units)
+                 .order_by(Room.id, Sensor.id, reading.units))
+    if model == Building:
+        return statement.where(Room.building_id == id)
+    return statement.where(Room.id == id)
+
+
+def summarize_archived(session, sensors, datetime_from=None, datetime_to=None):
+    """ summarize_archived
+
+    Aggregates the archived readings of sensors within an optional datetime
+    range by units, into rows like those of `select_summary`.
+
+    Parameters:
+        session - database session used for the query
+        sensors - dictionary mapping sensor ids to a `select_summary` row of the sensor
+        datetime_from - optional datetime the readings must be at or after
+        datetime_to - optional datetime the readings must be at or before
+
+    Returns:
+        list of SummaryRow
+    """
+    by_units = {}
+    for reading in iter_archived(session, list(sensors), datetime_from, datetime_to):
+        aggregate_readings([reading], by_units.setdefault(reading.units, {}))
+
+    rows = []
+    for units, aggregates in by_units.items():
+        for sensor_id, stats in aggregates.items():
+            sensor = sensors[sensor_id]
+            rows.append(SummaryRow(
+                sensor.room_id, sensor.room, sensor_id, sensor.sensor, units,
+                stats['count'], stats['numeric_count'], stats['total'], stats['min'],
+                stats['max'], stats['last_datetime'], stats['last_value']))
+    return rows
+
+
+def summarize_readings(session, model, id, datetime_from=None, datetime_to=None):
+    """ summarize_readings
+
+    Summarizes the readings of a room, or of each room in a building, within
+    an optional datetime range. Numeric readings are aggregated per units,
+    since readings of different units can't be combined, and the latest
+    reading of each sensor is returned. Archived readings are included.
+
+    Parameters:
+        session - database session used for the query
+        model - Building or Room
+        id - id of the record
+        datetime_from - optional datetime the readings must be at or after
+        datetime_to - optional datetime the readings must be at or before
+
+    Returns:
+        list of dictionaries summarizing each room
+    """
+    rows = session.execute(select_summary(model, id, datetime_from, datetime_to)).all()
+    sensors = {row.sensor_id: row for row in rows if row.sensor_id is not None}
+    rows += summarize_archived(session, sensors, datetime_from, datetime_to)
+
+    rooms = {}
+    for row in rows:
+        room = rooms.get(row.room_id)
+        if room is None:
+            room = rooms[row.room_id] = {
+                "room": row.room, "room_id": row.room_id, "units": {}, "sensors": {}}
+        if row.sensor_id is None:
+            continue
+
+        sensor = room['sensors'].get(row.sensor_id)
+        if sensor is None:
+            sensor = room['sensors'][row.sensor_id] = {
+                "sensor": row.sensor, "sensor_id": row.sensor_id, "count": 0, "latest": None}
+        if not row.count:
+            continue
+        sensor['count'] += row.count
+        latest = sensor['latest']
+        if latest is None or row.latest_datetime > latest['datetime']:
+            sensor['latest'] = {"value": row.latest_value, "units": row.units,
+                                "datetime": row.latest_datetime}
+
+        units = room['units'].setdefault(row.units, {
+            "units": row.units, "count": 0, "numeric_count": 0,
+            "total": 0.0, "min": None, "max": None})
+        units['count'] += row.count
+        units['numeric_count'] += row.numeric_count
+        if row.numeric_count:
+            units['total'] += row.total
+            units['min'] = row.min if units['min'] is None else min(units['min'], row.min)
+            units['max'] = row.max if units['max'] is None else max(units['max'], row.max)
+
+    summaries = []
+    for room in rooms.values():
+        for units in room['units'].values():
+            total = units.pop('total')
+            units['avg'] = total / units['numeric_count'] if units['numeric_count'] else None
+        for sensor in room['sensors'].values():
+            latest = sensor['latest']
+            if latest:
+                latest['datetime'] = latest['datetime'].strftime(DATETIME_FORMAT_STRING)
+        units = [room['units'][name] for name in sorted(room['units'])]
+        summaries.append(dict(room, units=units, sensors=list(room['sensors'].values())))
+    return summaries
+
+
+@click.command('refresh_stats')
+@with_appcontext
+def refresh_stats_command():
+    """ refresh_stats
+
+    Recomputes the statistics of every sensor from its readings, e.g. for
+    databases created before the `sensor_stats` table existed.
+    """
+    refresh_sensor_stats(db_session)
+    click.echo('Sensor statistics refreshed.')
+
+
+def init_app(app):
+    """ init_app
+
+    Parameters:
+        app - Flask app instance
+
+    Registers the `refresh_stats_command` with the application.
+    """
+    app.cli.add_command(refresh_stats_command)
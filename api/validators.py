@@ -1,5 +1,33 @@
-from jsonschema import ValidationError, FormatChecker, validate
-from .schemas import SCHEMA_MAPPING, get_schema
+from .schemas import (SCHEMA_MAPPING, get_schema, sensor_data_patch_schema,
+                      sensor_data_query_schema)
+
+# Validators compiled from the schemas, keyed by the id of their schema.
+# jsonschema is only imported when the first request body is validated.
+_compiled_validators = {}
+
+
+def compile_validator(schema):
+    """ compile_validator
+
+    Returns the validator of a schema, checking the schema and compiling the
+    validator the first time it is used, rather than on every validation.
+
+    Parameters:
+        schema - JSON defined schema for validation
+
+    Returns:
+        jsonschema validator instance for the schema
+    """
+    compiled = _compiled_validators.get(id(schema))
+    if compiled is None:
+        from jsonschema import FormatChecker, validators
+        validator_class = validators.validator_for(schema)
+        validator_class.check_schema(schema)
+        # FormatChecker specifies checking date-time formatted strings
+        # according to RFC-3339
+        compiled = (schema, validator_class(schema, format_checker=FormatChecker()))
+        _compiled_validators[id(schema)] = compiled
+    return compiled[1]
 
 
 def validator_wrapper(instance, schema):
@@ -14,16 +42,7 @@ def validator_wrapper(instance, schema):
     Returns:
         validated - whether the instance is valid
     """
-    validated = True
-    try:
-        # FormatChecker specifies checking date-time formatted strings
-        # according to RFC-3339
-        validate(instance, schema, format_checker=FormatChecker())
-
-    # Catching ValidationError so that we can raise an InvalidAPIUsage instead
-    except ValidationError:
-        validated = False
-    return validated
+    return compile_validator(schema).is_valid(instance)
 
 
 def generate_validator(model):
@@ -61,3 +80,33 @@ def get_request_validator(instance):
         True/False whether the instance is valid        
     """
     return validator_wrapper(instance, get_schema)
+
+
+def sensor_data_query_validator(instance):
+    """ sensor_data_query_validator
+
+    Validation function for validating a JSON instance against the
+    batch sensor data query JSON schema.
+
+    Parameters:
+        instance - JSON instance to validate
+
+    Returns:
+        True/False whether the instance is valid
+    """
+    return validator_wrapper(instance, sensor_data_query_schema)
+
+
+def sensor_data_patch_validator(instance):
+    """ sensor_data_patch_validator
+
+    Validation function for validating a JSON instance against the
+    bulk sensor data correction JSON schema.
+
+    Parameters:
+        instance - JSON instance to validate
+
+    Returns:
+        True/False whether the instance is valid
+    """
+    return validator_wrapper(instance, sensor_data_patch_schema)
@@ -0,0 +1,17 @@
+""" wsgi
+
+WSGI entry point for production servers, e.g.:
+    gunicorn --workers 4 --threads 4 api.wsgi:app
+
+Database engines are created lazily and reset after forking, so the app
+can be loaded before the server forks its workers. The hot tier, if enabled,
+is warmed when the app is loaded, and foreign keys that don't cascade deletes
+are reported.
+"""
+from . import create_app
+from .database import check_foreign_keys
+from .hot_tier import warm_hot_tier
+
+app = create_app()
+check_foreign_keys(app)
+warm_hot_tier(app)
@@ -0,0 +1,109 @@
+""" analytics
+
+Benchmarks loading a sensor's readings into NumPy arrays and computing the
+analytics operations, compared to computing a rolling mean per row in Python.
+
+Usage (from the repository root):
+    python -m benchmarks.analytics --readings 1000000
+"""
+import argparse
+import datetime
+import os
+import tempfile
+import time
+
+from api import create_app
+from api.analytics import (compute_analytics, load_series, parse_duration, parse_ops,
+                           rolling_mean)
+
+OPS = 'count,mean,p95,rolling_mean:15m,rolling_std:1h,rate,histogram:20'
+
+
+def seed(app, readings):
+    """ seed
+
+    Seeds the database with a sensor holding a reading every minute.
+    """
+    with app.app_context():
+        from api.database import bulk_create_from_json_list, init_db
+        from api.models import Building, Room, Sensor, SensorDataReadable
+        init_db()
+        bulk_create_from_json_list(
+            [{'name': 'building', 'description': 'desc'}], Building)
+        bulk_create_from_json_list(
+            [{'name': 'room', 'description': 'desc', 'building_id': 1}], Room)
+        bulk_create_from_json_list(
+            [{'name': 'sensor', 'description': 'desc', 'room_id': 1}], Sensor)
+        start = datetime.datetime(2023, 3, 1)
+        for offset in range(0, readings, 100000):
+            bulk_create_from_json_list([{
+                'value': str(200 + (i * 7) % 300),
+                'units': 'Watts',
+                'sensor_id': 1,
+                'datetime': start + datetime.timedelta(minutes=i),
+            } for i in range(offset, min(offset + 100000, readings))], SensorDataReadable)
+
+
+def rolling_mean_per_row(times, values, window):
+    """ rolling_mean_per_row
+
+    Reference rolling mean computed one reading at a time in Python.
+    """
+    means = []
+    start = 0
+    total = 0.0
+    for end, (t, value) in enumerate(zip(times, values)):
+        total += value
+        while times[start] <= t - window:
+            total -= values[start]
+            start += 1
+        means.append(total / (end - start + 1))
+    return means
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--readings', type=int, default=1000000,
+                        help='number of readings stored for the sensor')
+    args = parser.parse_args()
+
+    db_fd, db_path = tempfile.mkstemp()
+    try:
+        app = create_app({'TESTING': True, 'DATABASE': db_path})
+        seed(app, args.readings)
+
+        with app.app_context():
+            from api.database import read_session
+            (times, values), load_seconds = timed(
+                load_series, read_session, 1, None, None, args.readings)
+        ops = parse_ops(OPS)
+        _, compute_seconds = timed(compute_analytics, ops, times, values, True)
+        _, vectorized_seconds = timed(
+            rolling_mean, times, values, parse_duration('15m'))
+        _, per_row_seconds = timed(
+            rolling_mean_per_row, times.tolist(), values.tolist(), parse_duration('15m'))
+        client = app.test_client()
+        response, request_seconds = timed(
+            client.get, f'/sensors/1/analytics?ops={OPS}&timestamps=epoch')
+        assert response.status_code == 200
+    finally:
+        os.close(db_fd)
+        os.unlink(db_path)
+
+    print(f'readings:                          {len(values)}')
+    print(f'load into arrays (one query):      {load_seconds * 1000:>9.1f} ms')
+    print(f'compute {len(ops)} operations incl. lists: {compute_seconds * 1000:>9.1f} ms')
+    print(f'rolling mean (NumPy):              {vectorized_seconds * 1000:>9.1f} ms')
+    print(f'rolling mean per row (Python):     {per_row_seconds * 1000:>9.1f} ms')
+    print(f'full request incl. JSON:           {request_seconds * 1000:>9.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
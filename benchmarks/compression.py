@@ -0,0 +1,94 @@
+""" compression
+
+Benchmarks the CPU cost and bytes saved when compressing real sensor data
+responses at different compression levels.
+
+Usage (from the repository root):
+    python -m benchmarks.compression --readings 10000
+"""
+import argparse
+import datetime
+import os
+import tempfile
+import time
+import zlib
+
+from api import create_app
+from api.compression import WBITS
+
+
+def build_payloads(app, readings):
+    """ build_payloads
+
+    Seeds the database with a sensor holding `readings` readings and returns
+    the uncompressed response bodies of the sensor data endpoints.
+    """
+    with app.app_context():
+        from api.database import bulk_create_from_json_list, init_db
+        from api.models import Building, Room, Sensor, SensorDataReadable
+        init_db()
+        bulk_create_from_json_list(
+            [{'name': 'building', 'description': 'desc'}], Building)
+        bulk_create_from_json_list(
+            [{'name': 'room', 'description': 'desc', 'building_id': 1}], Room)
+        bulk_create_from_json_list(
+            [{'name': 'sensor', 'description': 'desc', 'room_id': 1}], Sensor)
+        start = datetime.datetime(2023, 3, 1)
+        bulk_create_from_json_list([{
+            'value': str(200 + (i * 7) % 300),
+            'units': 'Watts',
+            'sensor_id': 1,
+            'datetime': start + datetime.timedelta(minutes=i),
+        } for i in range(readings)], SensorDataReadable)
+
+    client = app.test_client()
+    return {
+        '/sensors/1': client.get('/sensors/1').get_data(),
+        '/sensors/1?format=columnar': client.get('/sensors/1?format=columnar').get_data(),
+        '/sensor_data/': client.get('/sensor_data/').get_data(),
+    }
+
+
+def benchmark(payload, encoding, level, repeat):
+    """ benchmark
+
+    Returns the compressed size and the average time taken to compress `payload`.
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        compressor = zlib.compressobj(level, zlib.DEFLATED, WBITS[encoding])
+        compressed = compressor.compress(payload) + compressor.flush()
+    return len(compressed), (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--readings', type=int, default=10000,
+                        help='number of readings stored for the sensor')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of times each payload is compressed')
+    args = parser.parse_args()
+
+    db_fd, db_path = tempfile.mkstemp()
+    try:
+        app = create_app({'TESTING': True, 'DATABASE': db_path})
+        payloads = build_payloads(app, args.readings)
+    finally:
+        os.close(db_fd)
+        os.unlink(db_path)
+
+    print(f'{"endpoint":<28} {"encoding":<8} {"level":>5} {"bytes":>10} '
+          f'{"ratio":>7} {"ms":>8} {"MB/s":>8}')
+    for endpoint, payload in payloads.items():
+        print(f'{endpoint:<28} {"identity":<8} {"-":>5} {len(payload):>10}')
+        for encoding in WBITS:
+            for level in (1, 6, 9):
+                size, seconds = benchmark(payload, encoding, level, args.repeat)
+                print(f'{endpoint:<28} {encoding:<8} {level:>5} {size:>10} '
+                      f'{len(payload) / size:>6.1f}x {seconds * 1000:>8.2f} '
+                      f'{len(payload) / seconds / 1e6:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
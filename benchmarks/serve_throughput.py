@@ -0,0 +1,143 @@
+""" serve_throughput
+
+Benchmarks the requests per second served by the pre-forking `serve`
+command for different numbers of worker processes.
+
+Usage (from the repository root):
+    python -m benchmarks.serve_throughput --workers 1 2 4 --threads 4
+"""
+import argparse
+import datetime
+import http.client
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+
+from api import create_app
+from api.server import bind_socket, serve
+
+
+def seed(app, readings):
+    """ seed
+
+    Seeds the database with a sensor holding `readings` readings.
+    """
+    with app.app_context():
+        from api.database import bulk_create_from_json_list, init_db
+        from api.models import Building, Room, Sensor, SensorDataReadable
+        init_db()
+        bulk_create_from_json_list(
+            [{'name': 'building', 'description': 'desc'}], Building)
+        bulk_create_from_json_list(
+            [{'name': 'room', 'description': 'desc', 'building_id': 1}], Room)
+        bulk_create_from_json_list(
+            [{'name': 'sensor', 'description': 'desc', 'room_id': 1}], Sensor)
+        start = datetime.datetime(2023, 3, 1)
+        bulk_create_from_json_list([{
+            'value': str(200 + (i * 7) % 300),
+            'units': 'Watts',
+            'sensor_id': 1,
+            'datetime': start + datetime.timedelta(minutes=i),
+        } for i in range(readings)], SensorDataReadable)
+
+
+def run_client(port, path, duration, results):
+    """ run_client
+
+    Sends requests one at a time for `duration` seconds and reports the
+    number of successful responses.
+    """
+    completed = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        connection.request('GET', path)
+        response = connection.getresponse()
+        response.read()
+        connection.close()
+        if response.status == 200:
+            completed += 1
+    results.put(completed)
+
+
+def wait_until_ready(port, attempts=100):
+    for _ in range(attempts):
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/buildings/')
+            connection.getresponse().read()
+            connection.close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError('Server did not start')
+
+
+def benchmark(app, workers, threads, clients, path, duration):
+    """ benchmark
+
+    Returns the requests per second served by `workers` worker processes.
+    """
+    context = multiprocessing.get_context('fork')
+    sock = bind_socket('127.0.0.1', 0)
+    port = sock.getsockname()[1]
+    server = context.Process(target=serve, args=(app, sock, workers, threads))
+    server.start()
+    try:
+        wait_until_ready(port)
+        results = context.Queue()
+        processes = [context.Process(target=run_client,
+                                     args=(port, path, duration, results))
+                     for _ in range(clients)]
+        for process in processes:
+            process.start()
+        completed = sum(results.get() for _ in processes)
+        for process in processes:
+            process.join()
+    finally:
+        server.terminate()
+        server.join()
+        sock.close()
+    return completed / duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4],
+                        help='worker counts to benchmark')
+    parser.add_argument('--threads', type=int, default=4,
+                        help='request threads per worker')
+    parser.add_argument('--clients', type=int, default=os.cpu_count() or 4,
+                        help='number of concurrent client processes')
+    parser.add_argument('--readings', type=int, default=2000,
+                        help='number of readings stored for the sensor')
+    parser.add_argument('--path', default='/sensors/1',
+                        help='endpoint requested by the clients')
+    parser.add_argument('--duration', type=float, default=5.0,
+                        help='number of seconds each worker count is measured')
+    args = parser.parse_args()
+    # Request logging would dominate the time spent serving requests
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    db_fd, db_path = tempfile.mkstemp()
+    try:
+        app = create_app({'TESTING': True, 'DATABASE': db_path})
+        seed(app, args.readings)
+
+        print(f'{"workers":>7} {"threads":>7} {"req/s":>10} {"speedup":>8}')
+        baseline = None
+        for workers in args.workers:
+            rate = benchmark(app, workers, args.threads, args.clients,
+                             args.path, args.duration)
+            baseline = baseline or rate
+            print(f'{workers:>7} {args.threads:>7} {rate:>10.1f} {rate / baseline:>7.2f}x')
+    finally:
+        os.close(db_fd)
+        os.unlink(db_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+""" startup
+
+Benchmarks the time taken to import the app and create it, as paid by the
+CLI, every test session and every worker, and lists the modules whose
+imports take longest according to `python -X importtime`.
+
+Usage (from the repository root):
+    python -m benchmarks.startup --runs 10 --top 15
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Script run in a fresh interpreter, printing the seconds taken to import
+# the app and to create it
+STARTUP_SCRIPT = '''
+import time
+start = time.perf_counter()
+from api import create_app
+imported = time.perf_counter()
+create_app({'TESTING': True})
+print(imported - start, time.perf_counter() - imported)
+'''
+
+
+def run_startup(*options):
+    """ run_startup
+
+    Runs the startup script in a fresh interpreter from the repository root.
+
+    Returns:
+        completed subprocess
+    """
+    return subprocess.run([sys.executable, *options, '-c', STARTUP_SCRIPT],
+                          capture_output=True, text=True, check=True,
+                          cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def measure_startup(runs):
+    """ measure_startup
+
+    Returns the seconds taken to import the app and to create it, per run.
+    """
+    times = []
+    for _ in range(runs):
+        import_time, create_time = map(float, run_startup().stdout.split())
+        times.append((import_time, create_time))
+    return times
+
+
+def parse_importtime(output):
+    """ parse_importtime
+
+    Parses the output of `python -X importtime` into (module, own
+    microseconds, cumulative microseconds) tuples.
+    """
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        if own.strip().isdigit():
+            imports.append((name.strip(), int(own), int(cumulative)))
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10,
+                        help='number of fresh interpreters timed')
+    parser.add_argument('--top', type=int, default=15,
+                        help='number of slowest imports listed')
+    args = parser.parse_args()
+
+    times = measure_startup(args.runs)
+    imports = [import_time for import_time, _ in times]
+    creates = [create_time for _, create_time in times]
+    totals = [sum(run) for run in times]
+    print(f'{"phase":<12} {"median ms":>10} {"min ms":>10} {"max ms":>10}')
+    for phase, values in (('import', imports), ('create_app', creates), ('total', totals)):
+        print(f'{phase:<12} {statistics.median(values) * 1000:>10.1f} '
+              f'{min(values) * 1000:>10.1f} {max(values) * 1000:>10.1f}')
+
+    print()
+    print(f'{"module":<40} {"self ms":>10} {"cumulative ms":>14}')
+    imports = parse_importtime(run_startup('-X', 'importtime').stderr)
+    for name, own, cumulative in sorted(imports, key=lambda entry: entry[2],
+                                        reverse=True)[:args.top]:
+        print(f'{name:<40} {own / 1000:>10.1f} {cumulative / 1000:>14.1f}')
+
+
+if __name__ == '__main__':
+    main()
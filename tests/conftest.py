@@ -1,20 +1,22 @@
-import os
-import tempfile
+import sqlite3
+import uuid
 
 import pytest
 from api import create_app 
 
 @pytest.fixture(scope='package')
 def app():
-    # Creates and opens a temporary file, where db_fd is the file descriptor
-    # and db_path is the path to it. This overrides the DATABASE path to the
-    # temporary path instead of the instance folder
-    db_fd, db_path = tempfile.mkstemp()
+    # Uses a uniquely named in-memory database, shared between the connections
+    # of the app. The database only exists while a connection to it is open,
+    # so one is kept open for the lifetime of the app.
+    database_uri = f'file:test-{uuid.uuid4().hex}?mode=memory&cache=shared'
+    keepalive = sqlite3.connect(database_uri, uri=True)
 
-    # Creates the app in testing mode, using the temporary database 
+    # Creates the app in testing mode, using the in-memory database
     app = create_app({
         'TESTING': True,
-        'DATABASE': db_path,
+        'DATABASE_URL': f'sqlite:///{database_uri}&uri=true',
+        'DATABASE_POOL_CLASS': 'SingletonThreadPool',
     })
 
     # Initializes the app's database
@@ -24,9 +26,29 @@ def app():
 
     yield app
 
-    # Cleans up the temporary file creation
-    os.close(db_fd)
-    os.unlink(db_path)
+    # Closes the app's connections, which discards the database
+    from api.database import get_database_state
+    get_database_state(app).dispose()
+    keepalive.close()
+
+@pytest.fixture
+def file_app(tmp_path):
+    # Creates an app using a database file, for tests that write from other
+    # threads. Unlike the shared-cache in-memory database, readers and writers
+    # on different connections only see committed data and wait for locks,
+    # as they do when the app is deployed.
+    app = create_app({
+        'TESTING': True,
+        'DATABASE': str(tmp_path / 'db.sqlite'),
+    })
+    with app.app_context():
+        from api.database import init_db
+        init_db()
+
+    yield app
+
+    from api.database import get_database_state
+    get_database_state(app).dispose()
 
 @pytest.fixture(scope='package')
 def client(app):
@@ -35,4 +57,3 @@ def client(app):
 @pytest.fixture(scope='package')
 def runner(app):
     return app.test_cli_runner()
-    
\ No newline at end of file
@@ -4,8 +4,16 @@ def reset_test_database():
 
     Helper function to delete all records across all the tables in the database.
     """
-    from api.models import Building, Room, Sensor, SensorDataReadable
+    from sqlalchemy import text
+
+    from api.database import db_session
+    from api.models import (Building, Room, Sensor, SensorDataBlock, SensorDataReadable,
+                            SensorStats)
     Building.query.delete()
     Room.query.delete()
     Sensor.query.delete()
     SensorDataReadable.query.delete()
+    SensorStats.query.delete()
+    SensorDataBlock.query.delete()
+    # Readings' ids are AUTOINCREMENT, so their sequence is reset too
+    db_session.execute(text('DELETE FROM sqlite_sequence'))
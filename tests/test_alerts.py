@@ -0,0 +1,158 @@
+from datetime import datetime, timedelta
+import pytest
+from tests.helpers import reset_test_database
+
+START = datetime(2023, 3, 20)
+
+
+@pytest.fixture(scope='module', autouse=True)
+def add_data(app):
+    """ add_data
+
+    Module scoped fixture to populate the database with two rooms, each
+    holding a sensor.
+
+    Parameter:
+        app - app instance for testing
+    """
+
+    with app.app_context():
+        from api.database import db_session
+        from api.models import Building, Room, Sensor
+        reset_test_database()
+        db_session.add(Building(name='building', description='desc'))
+        db_session.add(Room(name='room1', description='desc', building_id=1))
+        db_session.add(Room(name='room2', description='desc', building_id=1))
+        db_session.add(Sensor(name='sensor1', description='desc', room_id=1))
+        db_session.add(Sensor(name='sensor2', description='desc', room_id=2))
+        db_session.commit()
+
+
+def reading(sensor_id, value, minutes):
+    return {
+        'value': value,
+        'units': 'C',
+        'sensor_id': sensor_id,
+        'datetime': (START + timedelta(minutes=minutes)).strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+def test_advance_state():
+    """ test_advance_state
+
+    Tests that a rule fires after its duration and resolves with hysteresis.
+    """
+    from api.alerts import advance_state
+    from api.models import AlertRule, AlertState
+
+    rule = AlertRule(operator='above', threshold=25, duration=600, hysteresis=2)
+    state = AlertState(status='ok')
+
+    def advance(value, minutes):
+        advance_state(state, rule, value, START + timedelta(minutes=minutes))
+        return state.status
+
+    assert advance('26', 0) == 'pending'
+    assert advance('n/a', 5) == 'pending'
+    assert advance('24', 6) == 'ok'
+    assert advance('26', 7) == 'pending'
+    assert advance('27', 17) == 'firing'
+    assert state.triggered_at == START + timedelta(minutes=17)
+    assert advance('24', 18) == 'firing'
+    assert advance('30', 10) == 'firing'
+    assert advance('23', 19) == 'ok'
+    assert state.resolved_at == START + timedelta(minutes=19)
+
+
+class TestAlertRoutes:
+    """ TestAlertRoutes
+
+    Class containing tests related to alert rules and the '/alerts' endpoint.
+    """
+    mime_type = 'application/json'
+    headers = {
+        'Content-Type': mime_type,
+        'Accept': mime_type
+    }
+
+    def test_alert_rule_post(self, client):
+        """ test_alert_rule_post
+
+        Tests creating alert rules scoped to a room and to a sensor.
+        """
+        response = client.post('/alert_rules/', headers=self.headers, json={
+            'name': 'too hot', 'room_id': 1, 'operator': 'above',
+            'threshold': 25, 'duration': 600, 'hysteresis': 2,
+        })
+        assert response.status_code == 200
+        assert response.json == {
+            'id': 1, 'name': 'too hot', 'sensor_id': None, 'room_id': 1,
+            'building_id': None, 'operator': 'above', 'threshold': 25.0,
+            'duration': 600, 'hysteresis': 2.0,
+        }
+
+        response = client.post('/alert_rules/', headers=self.headers, json={
+            'name': 'too cold', 'sensor_id': 2, 'operator': 'below', 'threshold': 15,
+        })
+        assert response.status_code == 200
+        assert response.json['duration'] == 0
+
+    def test_alert_rule_post_invalid(self, client):
+        """ test_alert_rule_post_invalid
+
+        Tests that rules must apply to exactly one existing sensor, room or building.
+        """
+        response = client.post('/alert_rules/', headers=self.headers, json={
+            'name': 'rule', 'room_id': 1, 'sensor_id': 1,
+            'operator': 'above', 'threshold': 25,
+        })
+        assert response.status_code == 400
+
+        response = client.post('/alert_rules/', headers=self.headers, json={
+            'name': 'rule', 'room_id': 99, 'operator': 'above', 'threshold': 25,
+        })
+        assert response.status_code == 404
+
+    def test_alerts_evaluated_on_ingest(self, client):
+        """ test_alerts_evaluated_on_ingest
+
+        Tests that alerts are evaluated against batches of readings, in
+        chronological order, and for single readings.
+        """
+        response = client.post('/sensor_data/', headers=self.headers, json=[
+            reading(1, '27', 10), reading(1, '26', 0), reading(2, '20', 0),
+        ])
+        assert response.status_code == 200
+
+        response = client.get('/alerts?status=firing')
+        assert response.status_code == 200
+        assert response.json == [{
+            'rule_id': 1, 'rule': 'too hot', 'sensor_id': 1, 'status': 'firing',
+            'operator': 'above', 'threshold': 25.0, 'value': '27',
+            'since': '2023-03-20 00:00:00', 'triggered_at': '2023-03-20 00:10:00',
+            'resolved_at': None, 'updated_at': '2023-03-20 00:10:00',
+        }]
+        assert [alert['status'] for alert in client.get('/alerts?sensor_id=2').json] \
+            == ['ok']
+
+        response = client.post('/sensor_data/', headers=self.headers,
+                               json=reading(2, '14.5', 1))
+        assert response.status_code == 200
+        assert [(alert['rule'], alert['status'])
+                for alert in client.get('/alerts?status=firing').json] \
+            == [('too hot', 'firing'), ('too cold', 'firing')]
+
+    def test_alerts_invalid_status(self, client):
+        """ test_alerts_invalid_status
+
+        Tests that filtering alerts by an unknown status is rejected.
+        """
+        assert client.get('/alerts?status=unknown').status_code == 400
+
+    def test_alert_rule_delete(self, client):
+        """ test_alert_rule_delete
+
+        Tests that deleting a rule removes its alert states.
+        """
+        assert client.delete('/alert_rules/1').status_code == 204
+        assert [alert['rule_id'] for alert in client.get('/alerts').json] == [2]
@@ -0,0 +1,247 @@
+from datetime import datetime, timedelta
+import pytest
+from tests.helpers import reset_test_database
+
+START = datetime(2023, 3, 20)
+
+
+@pytest.fixture(scope='module', autouse=True)
+def add_data(app):
+    """ add_data
+
+    Module scoped fixture to populate the database with a sensor holding a
+    reading every minute, including a value that isn't a number.
+
+    Parameter:
+        app - app instance for testing
+    """
+
+    with app.app_context():
+        from api.database import db_session, bulk_create_from_json_list
+        from api.models import Building, Room, Sensor, SensorDataReadable
+        reset_test_database()
+        db_session.add(Building(name='building', description='desc'))
+        db_session.add(Room(name='room', description='desc', building_id=1))
+        db_session.add(Sensor(name='sensor', description='desc', room_id=1))
+        db_session.commit()
+        bulk_create_from_json_list([{
+            'value': value,
+            'units': 'C',
+            'sensor_id': 1,
+            'datetime': START + timedelta(minutes=minute),
+        } for minute, value in enumerate(['1', '3', 'abc1', '5', ' 7 ', '-1.5e1'])],
+            SensorDataReadable)
+
+
+def test_parse_duration():
+    """ test_parse_duration
+
+    Tests parsing durations with units into seconds.
+    """
+    from api.analytics import parse_duration
+
+    assert parse_duration('90s') == 90
+    assert parse_duration('15m') == 900
+    assert parse_duration('1.5h') == 5400
+    assert parse_duration('1d') == 86400
+    for invalid in ('15', 'm', '0m', '-5m', '5w'):
+        with pytest.raises(ValueError):
+            parse_duration(invalid)
+
+
+def test_is_numeric(app):
+    """ test_is_numeric
+
+    Tests that SQL reads the same values as numbers as `parse_numeric` does.
+    """
+    from sqlalchemy import Column, MetaData, String, Table, insert, select
+    from api.database import db_session
+    from api.stats import is_numeric, parse_numeric
+
+    texts = ['1', ' 7 ', '-1.5e1', '.5', '5.', '+2', '99999999999999999999', 'abc1', 'v2',
+             '12abc', 'code 3', '1_000', '0x10', 'inf', 'nan', '1e999', '', '1e', '- 5']
+    # A text column, as the values of sensor data are
+    table = Table('texts', MetaData(), Column('value', String), prefixes=['TEMPORARY'])
+    with app.app_context():
+        connection = db_session.connection()
+        table.create(connection)
+        connection.execute(insert(table), [{'value': text} for text in texts])
+        numeric = connection.execute(select(table.c.value, is_numeric(table.c.value))).all()
+        table.drop(connection)
+        db_session.commit()
+    assert {text: bool(result) for text, result in numeric} == \
+        {text: parse_numeric(text) is not None for text in texts}
+    assert [text for text in texts if parse_numeric(text) is not None] == \
+        ['1', ' 7 ', '-1.5e1', '.5', '5.', '+2', '99999999999999999999']
+
+
+def test_rolling_mean():
+    """ test_rolling_mean
+
+    Tests the vectorized rolling mean against averaging each window directly.
+    """
+    import numpy as np
+    from api.analytics import rolling_mean, rolling_std
+
+    times = np.array([0, 10, 20, 25, 60, 61, 200], dtype=float)
+    values = np.array([1, 2, 3, 4, 5, 6, 7], dtype=float)
+    window = 30
+
+    expected = [values[(times > t - window) & (times <= t)] for t in times]
+    _, means = rolling_mean(times, values, window)
+    _, stds = rolling_std(times, values, window)
+    assert np.allclose(means, [w.mean() for w in expected])
+    assert np.allclose(stds, [w.std() for w in expected])
+
+
+def test_parse_ops():
+    """ test_parse_ops
+
+    Tests parsing and validating the list of operations.
+    """
+    from api.analytics import parse_ops
+
+    assert parse_ops('rolling_mean:15m, p95,rate,histogram:4') == [
+        ('rolling_mean', '15m'), ('p95', None), ('rate', None), ('histogram', '4')]
+    for invalid in ('', 'rolling_mean', 'rolling_mean:x', 'p101', 'histogram:0', 'median'):
+        with pytest.raises(ValueError):
+            parse_ops(invalid)
+    assert parse_ops('histogram:1000', 1000) == [('histogram', '1000')]
+    with pytest.raises(ValueError):
+        parse_ops('histogram:1001', 1000)
+
+
+def test_fill_gaps():
+    """ test_fill_gaps
+
+    Tests filling the steps without readings of aligned series.
+    """
+    import numpy as np
+    from api.analytics import fill_gaps
+
+    columns = np.array([[np.nan, 1, np.nan, 3, np.nan], [np.nan] * 5])
+    assert np.array_equal(fill_gaps(columns, 'ffill'),
+                          [[np.nan, 1, 1, 3, 3], [np.nan] * 5], equal_nan=True)
+    assert np.array_equal(fill_gaps(columns, 'linear'),
+                          [[np.nan, 1, 2, 3, np.nan], [np.nan] * 5], equal_nan=True)
+    assert fill_gaps(columns, 'none') is columns
+
+
+class TestAnalyticsRoutes:
+    """ TestAnalyticsRoutes
+
+    Class containing tests related to making requests to '/sensors/<id>/analytics'.
+    """
+
+    def test_sensor_analytics(self, client):
+        """ test_sensor_analytics
+
+        Tests computing summary statistics, rolling means, rates and histograms
+        over the numeric readings of a sensor.
+        """
+        response = client.get('/sensors/1/analytics?ops=count,mean,max,p50,'
+                              'rolling_mean:2m,rate,histogram:2')
+
+        assert response.status_code == 200
+        results = response.json['results']
+        assert response.json['count'] == 5
+        assert results['count'] == 5
+        assert results['mean'] == pytest.approx(0.2)
+        assert results['max'] == 7
+        assert results['p50'] == 3
+        assert results['rolling_mean:2m'] == {
+            'datetime': ['2023-03-20 00:00:00', '2023-03-20 00:01:00',
+                         '2023-03-20 00:03:00', '2023-03-20 00:04:00',
+                         '2023-03-20 00:05:00'],
+            'value': [1.0, 2.0, 5.0, 6.0, -4.0],
+        }
+        assert results['rate']['value'] == pytest.approx([2 / 60, 2 / 120, 2 / 60, -22 / 60])
+        assert results['histogram:2'] == {'counts': [1, 4], 'edges': [-15.0, -4.0, 7.0]}
+
+    def test_sensor_analytics_range(self, client):
+        """ test_sensor_analytics_range
+
+        Tests restricting analytics to a range, with epoch timestamps.
+        """
+        response = client.get('/sensors/1/analytics?ops=min,rate&timestamps=epoch'
+                              '&from=2023-03-20 00:01:00&to=2023-03-20 00:03:00')
+
+        assert response.status_code == 200
+        assert response.json['results'] == {
+            'min': 3.0,
+            'rate': {'datetime': [1679270580], 'value': [pytest.approx(2 / 120)]},
+        }
+
+    def test_sensor_analytics_row_cap(self, app, client):
+        """ test_sensor_analytics_row_cap
+
+        Tests that ranges with more readings than ANALYTICS_MAX_ROWS are rejected.
+        """
+        app.config['ANALYTICS_MAX_ROWS'] = 3
+        try:
+            response = client.get('/sensors/1/analytics?ops=mean')
+        finally:
+            app.config['ANALYTICS_MAX_ROWS'] = 1000000
+        assert response.status_code == 400
+
+    def test_sensor_analytics_invalid(self, client):
+        """ test_sensor_analytics_invalid
+
+        Tests invalid operations and unknown sensors.
+        """
+        assert client.get('/sensors/1/analytics?ops=median').status_code == 400
+        assert client.get('/sensors/1/analytics').status_code == 400
+        assert client.get('/sensors/99/analytics?ops=mean').status_code == 404
+
+    def test_room_aligned(self, app, client):
+        """ test_room_aligned
+
+        Tests resampling the sensors of a room onto a shared time axis with
+        each fill method, including the readings of the last step after `to`.
+        """
+        with app.app_context():
+            from api.database import db_session, bulk_create_from_json_list
+            from api.models import Sensor, SensorDataReadable
+            db_session.add(Sensor(name='sensor2', description='desc', room_id=1))
+            db_session.commit()
+            bulk_create_from_json_list([{
+                'value': value, 'units': 'C', 'sensor_id': 2,
+                'datetime': START + timedelta(seconds=seconds),
+            } for seconds, value in ((30, '10'), (150, '20'), (330, '50'), (600, '30'))],
+                SensorDataReadable)
+
+        url = '/rooms/1/aligned?from=2023-03-20 00:00:00&to=2023-03-20 00:05:00'
+        expected = {
+            'none': [[1.0, 3.0, None, 5.0, 7.0, -15.0], [10.0, None, 20.0, None, None, 50.0]],
+            'ffill': [[1.0, 3.0, 3.0, 5.0, 7.0, -15.0], [10.0, 10.0, 20.0, 20.0, 20.0, 50.0]],
+            'linear': [[1.0, 3.0, 4.0, 5.0, 7.0, -15.0], [10.0, 15.0, 20.0, 30.0, 40.0, 50.0]],
+        }
+        for fill, columns in expected.items():
+            response = client.get(f'{url}&fill={fill}')
+            assert response.status_code == 200
+            assert response.json['datetime'] == [
+                f'2023-03-20 00:0{minute}:00' for minute in range(6)]
+            assert [sensor['sensor_id'] for sensor in response.json['sensors']] == [1, 2]
+            assert [sensor['value'] for sensor in response.json['sensors']] == columns
+
+        response = client.get(f'{url}&step=2m&timestamps=epoch')
+        assert response.json['datetime'] == [1679270400, 1679270520, 1679270640]
+        assert [sensor['value'] for sensor in response.json['sensors']] == \
+            [[2.0, 5.0, -4.0], [10.0, 20.0, 50.0]]
+
+    def test_room_aligned_invalid(self, app, client):
+        """ test_room_aligned_invalid
+
+        Tests missing ranges, invalid steps and fills, axis caps and unknown rooms.
+        """
+        url = '/rooms/1/aligned?from=2023-03-20 00:00:00&to=2023-03-20 00:05:00'
+        assert client.get('/rooms/1/aligned?from=2023-03-20 00:00:00').status_code == 400
+        assert client.get(f'{url}&step=0m').status_code == 400
+        assert client.get(f'{url}&fill=mean').status_code == 400
+        app.config['ANALYTICS_MAX_POINTS'] = 100
+        try:
+            assert client.get(f'{url}&step=1s').status_code == 400
+        finally:
+            app.config['ANALYTICS_MAX_POINTS'] = 100000
+        assert client.get(f'{url}&step=1s').status_code == 200
+        assert client.get(url.replace('/rooms/1/', '/rooms/99/')).status_code == 404
@@ -0,0 +1,357 @@
+from datetime import datetime, timedelta
+import pytest
+from tests.helpers import reset_test_database
+
+START = datetime(2023, 3, 20)
+
+# Requests whose responses must not change when readings are archived
+REQUESTS = (
+    ('get', '/sensors/1?format=columnar', None),
+    ('get', '/sensors/?format=columnar', None),
+    ('post', '/sensor_data/query', [
+        {'sensor_id': 1, 'from': '2023-03-20 00:30:00', 'to': '2023-03-20 04:30:00'},
+        {'sensor_id': 2, 'limit': 10},
+        {'sensor_id': 1, 'to': '2023-03-20 03:00:00', 'limit': 100},
+        {'sensor_id': 2, 'limit': 1000},
+    ]),
+    ('get', '/sensors/1/analytics?ops=count,mean,min,max&from=2023-03-20 00:00:00', None),
+    ('get', '/rooms/1/aligned?from=2023-03-20 00:00:00&to=2023-03-20 05:00:00&step=15m'
+            '&fill=ffill', None),
+    ('get', '/sensors/1/stats', None),
+    ('get', '/sensors/1', None),
+    ('get', '/buildings/', None),
+    ('get', '/sensor_data/', None),
+    ('get', '/rooms/1/summary?from=2023-03-20 00:30:00', None),
+    ('get', '/buildings/1/summary', None),
+    ('get', '/sensor_data/?sensor_id=1&value_gte=20.5&order=-datetime'
+            '&fields=id,value,datetime&limit=50&offset=5', None),
+    ('get', '/sensor_data/?sensor_id_in=1,2&units=C&datetime_lt=2023-03-20 03:00:00'
+            '&order=datetime&limit=100', None),
+)
+
+
+@pytest.fixture(scope='module', autouse=True)
+def add_data(app):
+    """ add_data
+
+    Module scoped fixture to populate the database with two sensors.
+
+    Parameter:
+        app - app instance for testing
+    """
+
+    with app.app_context():
+        from api.database import db_session
+        from api.models import Building, Room, Sensor
+        reset_test_database()
+        db_session.add(Building(name='building', description='desc'))
+        db_session.add(Room(name='room', description='desc', building_id=1))
+        db_session.add(Sensor(name='sensor1', description='desc', room_id=1))
+        db_session.add(Sensor(name='sensor2', description='desc', room_id=1))
+        db_session.commit()
+
+
+def add_readings():
+    """ add_readings
+
+    Replaces the readings with six hours of readings a minute for both
+    sensors. Sensor 1 has decimal values, with a text value and a change of
+    units, and sensor 2 has values with varying decimal places.
+    """
+    from sqlalchemy import delete
+    from api.database import db_session
+    from api.models import SensorDataBlock, SensorDataReadable
+    from api.stats import refresh_sensor_stats
+
+    db_session.execute(delete(SensorDataReadable))
+    db_session.execute(delete(SensorDataBlock))
+    readings = []
+    for minute in range(6 * 60):
+        readings.append({'sensor_id': 1, 'value': f'{20 + minute % 7 * 0.25:.2f}',
+                         'units': 'F' if minute == 90 else 'C',
+                         'datetime': START + timedelta(minutes=minute, seconds=1)})
+        readings.append({'sensor_id': 2, 'value': str(minute % 13 / 2),
+                         'units': '%', 'datetime': START + timedelta(minutes=minute)})
+    readings[40]['value'] = 'offline'
+    db_session.execute(SensorDataReadable.__table__.insert(), readings)
+    db_session.commit()
+    refresh_sensor_stats(db_session)
+
+
+def get_responses(client):
+    """ get_responses
+
+    Returns the JSON of the responses to the REQUESTS.
+    """
+    responses = []
+    for method, url, body in REQUESTS:
+        response = getattr(client, method)(url, json=body)
+        assert response.status_code == 200, response.json
+        responses.append(response.json)
+    # Readings by id, including the text value at 00:20
+    for reading in responses[-1][::20]:
+        response = client.get(f'/sensor_data/{reading["id"]}')
+        assert response.status_code == 200, response.json
+        responses.append(response.json)
+    return responses
+
+
+def test_encode_block():
+    """ test_encode_block
+
+    Tests that readings are decoded from a block exactly as they were
+    encoded, whether their values are decimals or text.
+    """
+    from api.archive import ArchivedReading, decode_block, encode_block
+
+    start = START + timedelta(hours=1)
+    for values in (['21.50', '-0.05', '21.55', '0.00'], ['1', '2.5', '1e3', 'open'],
+                   ['007', '7', '-0', '8']):
+        readings = [ArchivedReading(100 + index * 3, 1, value, 'C' if index < 3 else 'F',
+                                    start + timedelta(seconds=index * 61, microseconds=index))
+                    for index, value in enumerate(values)]
+        assert decode_block(1, start, encode_block(readings, start)) == readings
+
+
+def test_encode_block_large_decimals():
+    """ test_encode_block_large_decimals
+
+    Tests that decimals are only delta encoded while they and the deltas
+    between them fit in 64 bit integers, and are stored as text otherwise.
+    """
+    import zlib
+    from api.archive import (DECIMAL_VALUES, HEADER, TEXT_VALUES, ArchivedReading,
+                             decode_block, encode_block)
+
+    start = START + timedelta(hours=1)
+    for values, encoding in (
+            (['-99999999999999.9999', '99999999999999.9999'], DECIMAL_VALUES),
+            (['999999999999999.999', '-999999999999999.999'], DECIMAL_VALUES),
+            (['99999999999999.999999', '1.000000'], TEXT_VALUES),
+            (['-9000000000000.000000', '9000000000000.000000'], TEXT_VALUES)):
+        readings = [ArchivedReading(index + 1, 1, value, 'C', start + timedelta(seconds=index))
+                    for index, value in enumerate(values)]
+        payload = encode_block(readings, start)
+        assert HEADER.unpack_from(zlib.decompress(payload))[1] == encoding
+        assert decode_block(1, start, payload) == readings
+
+
+def test_archive_readings(app, client):
+    """ test_archive_readings
+
+    Tests that archiving readings into blocks doesn't change the responses
+    of the endpoints reading them, and packs the readings tightly.
+    """
+    from sqlalchemy import func, select
+    from api.archive import archive_readings
+    from api.database import db_session
+    from api.models import SensorDataBlock, SensorDataReadable
+
+    with app.app_context():
+        add_readings()
+    expected = get_responses(client)
+
+    with app.app_context():
+        written = archive_readings(db_session, START + timedelta(hours=4, minutes=30),
+                                   timedelta(hours=1))
+        assert written == 8
+        assert db_session.scalar(select(func.count(SensorDataReadable.id))) == 240
+        blocks = db_session.execute(select(SensorDataBlock)).scalars().all()
+        assert sum(block.count for block in blocks) == 480
+        assert all(block.end - block.start == timedelta(hours=1) for block in blocks)
+        assert sum(len(block.payload) for block in blocks) < 480 * 4
+
+    assert get_responses(client) == expected
+
+
+def test_archived_range_records(app):
+    """ test_archived_range_records
+
+    Tests that records with archived readings within a range are found by
+    the range queries of the collections.
+    """
+    from api.archive import archive_readings
+    from api.database import db_session
+    from api.models import Building, Room, Sensor, SensorDataReadable
+    from api.routes import ListAPI
+
+    with app.app_context():
+        add_readings()
+        archive_readings(db_session, START + timedelta(hours=3), timedelta(hours=1))
+
+        for model, ids in ((Building, [1]), (Room, [1]), (Sensor, [1, 2])):
+            records = ListAPI(model)._get_record_from_t(
+                START + timedelta(minutes=30), START + timedelta(minutes=31))
+            assert [record.id for record in records] == ids
+        # The blocks overlap the range, but none of their readings are within it
+        assert ListAPI(Sensor)._get_record_from_t(
+            START + timedelta(minutes=30, seconds=10),
+            START + timedelta(minutes=30, seconds=50)) == []
+
+        readings = ListAPI(SensorDataReadable)._query_sensor_data(
+            START + timedelta(minutes=30), START + timedelta(minutes=31))
+        assert [(reading['sensor'], reading['datetime']) for reading in readings] == [
+            ('sensor1', '2023-03-20 00:30:01'), ('sensor2', '2023-03-20 00:30:00'),
+            ('sensor2', '2023-03-20 00:31:00')]
+
+
+def test_archive_readings_merge(app, client):
+    """ test_archive_readings_merge
+
+    Tests that readings added to an archived window are merged into its
+    block when they are archived.
+    """
+    from sqlalchemy import insert, select
+    from api.archive import archive_readings
+    from api.database import db_session
+    from api.models import SensorDataBlock, SensorDataReadable
+
+    with app.app_context():
+        add_readings()
+        archive_readings(db_session, START + timedelta(hours=2), timedelta(hours=1))
+        db_session.execute(insert(SensorDataReadable), [{
+            'sensor_id': 1, 'value': '30.00', 'units': 'C',
+            'datetime': START + timedelta(minutes=10, seconds=30)}])
+        db_session.commit()
+        assert archive_readings(db_session, START + timedelta(hours=2),
+                                timedelta(hours=1)) == 1
+        counts = db_session.execute(
+            select(SensorDataBlock.sensor_id, SensorDataBlock.count)
+            .order_by(SensorDataBlock.sensor_id, SensorDataBlock.start)).all()
+        assert [tuple(row) for row in counts] == [(1, 61), (1, 60), (2, 60), (2, 60)]
+
+    response = client.post('/sensor_data/query', json=[{
+        'sensor_id': 1, 'from': '2023-03-20 00:10:00', 'to': '2023-03-20 00:11:30'}])
+    assert [reading['value'] for reading in response.json[0]['data']] == \
+        ['20.75', '30.00', '21.00']
+
+
+def test_archived_range_delete(app, client):
+    """ test_archived_range_delete
+
+    Tests deleting and correcting archived readings by id and by range,
+    which deletes the blocks within a range and rewrites the blocks that
+    hold changed readings.
+    """
+    from sqlalchemy import select
+    from api.archive import archive_readings
+    from api.database import db_session
+    from api.models import SensorDataBlock
+
+    with app.app_context():
+        add_readings()
+        archive_readings(db_session, START + timedelta(hours=3), timedelta(hours=1))
+
+        def get_blocks():
+            return [tuple(row) for row in db_session.execute(
+                select(SensorDataBlock.sensor_id, SensorDataBlock.start, SensorDataBlock.count)
+                .order_by(SensorDataBlock.sensor_id, SensorDataBlock.start))]
+
+    # An invalid body is rejected before any archived readings are changed
+    response = client.patch('/sensor_data/?sensor_id=1', json={'value': '1', 'scale': 2})
+    assert response.status_code == 400
+    with app.app_context():
+        assert len(get_blocks()) == 6
+
+    id = client.get('/sensor_data/?sensor_id=1&datetime=2023-03-20 00:01:01').json[0]['id']
+    assert client.get(f'/sensor_data/{id}').json['value'] == '20.25'
+    assert client.delete(f'/sensor_data/{id}').status_code == 204
+    assert client.get(f'/sensor_data/{id}').status_code == 404
+    assert client.delete(f'/sensor_data/{id}').status_code == 404
+
+    response = client.delete('/sensor_data/?sensor_id=1'
+                             '&from=2023-03-20 01:30:00&to=2023-03-20 01:59:59')
+    assert response.json == {'deleted': 30}
+    response = client.delete('/sensor_data/?sensor_id=1'
+                             '&from=2023-03-20 02:00:00&to=2023-03-20 03:00:00')
+    assert response.json == {'deleted': 60}
+    response = client.patch('/sensor_data/?sensor_id=1&from=2023-03-20 00:00:00'
+                            '&to=2023-03-20 00:00:59', json={'value': '0.00'})
+    assert response.json == {'updated': 1}
+    # The text value at 00:20 isn't converted
+    response = client.patch('/sensor_data/?sensor_id=1&from=2023-03-20 00:00:00'
+                            '&to=2023-03-20 00:29:59', json={'scale': 2})
+    assert response.json == {'updated': 28}
+    assert client.get('/sensors/1/stats').json['count'] == 269
+
+    with app.app_context():
+        assert get_blocks() == [
+            (1, START, 59), (1, START + timedelta(hours=1), 30),
+            (2, START, 60), (2, START + timedelta(hours=1), 60),
+            (2, START + timedelta(hours=2), 60)]
+
+    response = client.get('/sensors/1?format=columnar')
+    assert len(response.json['value']) == 269
+    assert response.json['value'][:3] == ['0.0', '41.0', '41.5']
+    assert response.json['value'][19] == 'offline'
+
+
+def test_archive_readings_command(app, client, runner):
+    """ test_archive_readings_command
+
+    Tests archiving the readings older than a number of days from the command line.
+    """
+    from sqlalchemy import func, select
+    from api.database import db_session
+    from api.models import SensorDataReadable
+
+    with app.app_context():
+        add_readings()
+    expected = get_responses(client)
+
+    result = runner.invoke(args=['archive_readings', '--older-than', '7', '--window', '2'])
+    assert result.exit_code == 0, result.output
+    assert 'Wrote 6 blocks of archived readings.' in result.output
+
+    with app.app_context():
+        assert db_session.scalar(select(func.count(SensorDataReadable.id))) == 0
+    assert get_responses(client) == expected
+
+
+def test_archived_duplicates(app, client, runner):
+    """ test_archived_duplicates
+
+    Tests that readings posted again after they were archived are skipped,
+    and that `dedupe_readings` deletes the duplicates of archived readings
+    written before they were.
+    """
+    from sqlalchemy import func, insert, select, update
+    from api.archive import archive_readings, decode_block, encode_block
+    from api.database import db_session
+    from api.models import SensorDataBlock, SensorDataReadable
+
+    with app.app_context():
+        add_readings()
+        archive_readings(db_session, START + timedelta(hours=2), timedelta(hours=1))
+    expected = get_responses(client)
+    reading = {'sensor_id': 1, 'value': '99', 'units': 'C', 'datetime': '2023-03-20 00:10:01'}
+
+    response = client.post('/sensor_data', json=[reading], follow_redirects=True)
+    assert response.json == {'created': 0, 'duplicates': 1}
+    response = client.post('/sensor_data', json=reading, follow_redirects=True)
+    assert response.json['value'] == '20.75'
+    assert get_responses(client) == expected
+
+    with app.app_context():
+        db_session.execute(insert(SensorDataReadable), [{
+            'sensor_id': 1, 'value': '99', 'units': 'C',
+            'datetime': START + timedelta(minutes=10, seconds=1)}])
+        db_session.commit()
+        # A block archived with a duplicate reading
+        block = db_session.scalars(select(SensorDataBlock)
+                                   .where(SensorDataBlock.sensor_id == 2)
+                                   .order_by(SensorDataBlock.start)).first()
+        readings = decode_block(2, block.start, block.payload)
+        readings.insert(21, readings[20]._replace(id=10000, value='99'))
+        db_session.execute(update(SensorDataBlock)
+                           .where(SensorDataBlock.id == block.id)
+                           .values(count=len(readings),
+                                   payload=encode_block(readings, block.start)))
+        db_session.commit()
+
+    result = runner.invoke(args=['dedupe_readings'])
+    assert result.exit_code == 0, result.output
+    assert 'Deleted 2 duplicate readings.' in result.output
+    with app.app_context():
+        assert db_session.scalar(select(func.count(SensorDataReadable.id))) == 480
+    assert get_responses(client) == expected
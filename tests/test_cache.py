@@ -0,0 +1,169 @@
+from datetime import datetime
+import pytest
+from tests.helpers import reset_test_database
+
+
+@pytest.fixture(scope='module', autouse=True)
+def add_data(app):
+    """ add_data
+
+    Module scoped fixture to populate the database with dummy data
+
+    Parameter:
+        app - app instance for testing
+    """
+
+    with app.app_context():
+        from api.database import db_session
+        from api.models import Building, Room, Sensor
+        reset_test_database()
+        db_session.add(Building(name='building', description='desc'))
+        db_session.add(Room(name='room', description='desc', building_id=1))
+        db_session.add(Sensor(name='sensor', description='desc', room_id=1))
+        db_session.commit()
+
+
+def test_response_cache_lru():
+    """ test_response_cache_lru
+
+    Tests that the least recently used entries are evicted to stay within the byte limit.
+    """
+    from api.cache import ResponseCache
+
+    cache = ResponseCache(max_bytes=100)
+    cache.set('a', 'A', 40)
+    cache.set('b', 'B', 40)
+    assert cache.get('a') == 'A'
+    cache.set('c', 'C', 40)
+    assert cache.get('b') is None
+    assert cache.get('a') == 'A'
+    assert cache.get('c') == 'C'
+
+    cache.set('d', 'D', 101)
+    assert cache.get('d') is None
+    assert cache.stats() == {
+        'entries': 2, 'bytes': 80, 'max_bytes': 100, 'hits': 3, 'misses': 2,
+        'evictions': 1, 'hit_rate': 0.6,
+    }
+
+
+def test_get_affected_models():
+    """ test_get_affected_models
+
+    Tests that inserts affect ancestors, and deletes also affect descendants
+    and the alert rules removed with them.
+    """
+    from api.cache import get_affected_models
+    from api.models import AlertRule, Building, Room, Sensor, SensorDataReadable
+
+    assert set(get_affected_models(SensorDataReadable, 'insert')) == \
+        {SensorDataReadable, Sensor, Room, Building}
+    assert set(get_affected_models(Room, 'insert')) == {Room, Building}
+    assert set(get_affected_models(Room, 'delete')) == \
+        {Room, Building, Sensor, SensorDataReadable, AlertRule}
+
+
+class TestCachedRoutes:
+    """ TestCachedRoutes
+
+    Class containing tests related to caching GET responses of the model endpoints.
+    """
+    mime_type = 'application/json'
+    headers = {
+        'Content-Type': mime_type,
+        'Accept': mime_type
+    }
+
+    def test_cache_hit(self, client):
+        """ test_cache_hit
+
+        Tests that repeated GET requests are served from the cache.
+        """
+        first = client.get('/buildings/?id_gte=1')
+        second = client.get('/buildings/?id_gte=1')
+
+        assert first.headers['X-Cache'] == 'MISS'
+        assert second.headers['X-Cache'] == 'HIT'
+        assert second.status_code == 200
+        assert second.json == first.json
+
+    def test_errors_not_cached(self, client):
+        """ test_errors_not_cached
+
+        Tests that error responses aren't cached.
+        """
+        client.get('/buildings/999')
+        response = client.get('/buildings/999')
+
+        assert response.status_code == 404
+        assert 'X-Cache' not in response.headers
+
+    def test_post_invalidates_ancestors(self, client):
+        """ test_post_invalidates_ancestors
+
+        Tests that creating sensor data invalidates the responses of its sensor,
+        room and building.
+        """
+        for url in ('/buildings/1', '/rooms/1', '/sensors/1'):
+            client.get(url)
+            assert client.get(url).headers['X-Cache'] == 'HIT'
+
+        response = client.post('/sensor_data/', headers=self.headers, json={
+            'value': '20', 'units': 'C', 'sensor_id': 1,
+            'datetime': datetime(2023, 3, 20).strftime('%Y-%m-%d %H:%M:%S'),
+        })
+        assert response.status_code == 200
+
+        building = client.get('/buildings/1')
+        assert building.headers['X-Cache'] == 'MISS'
+        assert len(building.json['rooms'][0]['sensors'][0]['data']) == 1
+        assert client.get('/rooms/1').headers['X-Cache'] == 'MISS'
+        assert client.get('/sensors/1').headers['X-Cache'] == 'MISS'
+
+    def test_post_keeps_unrelated_models(self, client):
+        """ test_post_keeps_unrelated_models
+
+        Tests that creating a building doesn't invalidate responses of rooms.
+        """
+        client.get('/rooms/')
+        response = client.post('/buildings/', headers=self.headers,
+                               json={'name': 'other', 'description': 'desc'})
+        assert response.status_code == 200
+
+        assert client.get('/rooms/').headers['X-Cache'] == 'HIT'
+        buildings = client.get('/buildings/')
+        assert buildings.headers['X-Cache'] == 'MISS'
+        assert len(buildings.json) == 2
+
+    def test_delete_invalidates_descendants(self, client):
+        """ test_delete_invalidates_descendants
+
+        Tests that deleting a room invalidates the responses of the sensors and
+        readings removed with it.
+        """
+        client.get('/sensor_data/')
+        assert client.get('/sensor_data/').headers['X-Cache'] == 'HIT'
+
+        assert client.delete('/rooms/1').status_code == 204
+
+        response = client.get('/sensor_data/')
+        assert response.headers['X-Cache'] == 'MISS'
+        assert response.json == []
+        assert client.get('/sensors/1').status_code == 404
+
+
+def test_debug_cache_endpoint():
+    """ test_debug_cache_endpoint
+
+    Tests that the cache counters are only exposed when `DEBUG_ENDPOINTS` is set.
+    """
+    from api import create_app
+
+    app = create_app({'TESTING': True, 'DATABASE_URL': 'sqlite://'})
+    assert app.test_client().get('/_debug/cache').status_code == 404
+
+    app = create_app({'TESTING': True, 'DATABASE_URL': 'sqlite://',
+                      'DEBUG_ENDPOINTS': True})
+    response = app.test_client().get('/_debug/cache')
+    assert response.status_code == 200
+    assert response.json['hits'] == 0
@@ -0,0 +1,75 @@
+import gzip
+import zlib
+import pytest
+from tests.helpers import reset_test_database
+
+
+@pytest.fixture(scope='module', autouse=True)
+def add_data(app):
+    """ add_data
+
+    Module scoped fixture to populate the database with enough buildings
+    for the '/buildings' response to exceed the compression threshold.
+
+    Parameter:
+        app - app instance for testing
+    """
+
+    with app.app_context():
+        from api.database import db_session
+        from api.models import Building
+        reset_test_database()
+        for i in range(50):
+            db_session.add(Building(name=f'building{i}', description='desc'))
+        db_session.commit()
+
+
+class TestCompression:
+    """ TestCompression
+
+    Class containing tests related to compressing responses based on 'Accept-Encoding'.
+    """
+    url = '/buildings/'
+
+    def test_gzip(self, client):
+        """ test_gzip
+
+        Tests that responses are gzip compressed when the client accepts gzip.
+        """
+        response = client.get(self.url, headers={'Accept-Encoding': 'gzip, deflate'})
+        uncompressed = client.get(self.url)
+
+        assert response.status_code == 200
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert gzip.decompress(response.get_data()) == uncompressed.get_data()
+        assert 'Content-Encoding' not in uncompressed.headers
+
+    def test_deflate(self, client):
+        """ test_deflate
+
+        Tests that quality values are respected when selecting the encoding.
+        """
+        response = client.get(
+            self.url, headers={'Accept-Encoding': 'gzip;q=0.5, deflate'})
+
+        assert response.headers['Content-Encoding'] == 'deflate'
+        assert zlib.decompress(response.get_data())[:1] == b'['
+
+    def test_identity_only(self, client):
+        """ test_identity_only
+
+        Tests that responses aren't compressed when no supported encoding is accepted.
+        """
+        response = client.get(self.url, headers={'Accept-Encoding': 'gzip;q=0, br'})
+        assert 'Content-Encoding' not in response.headers
+
+    def test_small_body(self, client):
+        """ test_small_body
+
+        Tests that responses below the size threshold aren't compressed.
+        """
+        response = client.get('/buildings/1', headers={'Accept-Encoding': 'gzip'})
+
+        assert response.status_code == 200
+        assert 'Content-Encoding' not in response.headers
@@ -1,7 +1,13 @@
+import datetime
+import io
+import json
 import pytest
 from sqlalchemy import text
 import sqlite3
 
+from api.constants import TEST_DATA_JSON_RELATIVE_PATH
+from api.loader import JSONStreamReader
+
 # Add test for closing the database
 
 def test_init_db_command(runner, monkeypatch):
@@ -14,4 +20,314 @@ def test_init_db_command(runner, monkeypatch):
     monkeypatch.setattr('api.database.init_db', fake_init_db)
     result = runner.invoke(args=['init_db'])
     assert 'Database Initialized' in result.output
-    assert Recorder.called
\ No newline at end of file
+    assert Recorder.called
+
+
+def test_json_stream_reader():
+    """ test_json_stream_reader
+
+    Tests that streaming a seed file in small blocks yields the same records
+    as loading the whole file.
+    """
+    with open(TEST_DATA_JSON_RELATIVE_PATH, 'rb') as json_file:
+        raw = json_file.read()
+    expected = [(name, record) for name, records in json.loads(raw).items()
+                for record in records]
+
+    records = list(JSONStreamReader(io.BytesIO(raw), block_size=7))
+    assert records == expected
+
+
+def test_init_db_command_seed_file(app, runner, tmp_path):
+    """ test_init_db_command_seed_file
+
+    Tests loading an NDJSON seed file in chunks with `init_db --file`.
+    """
+    from tests.helpers import reset_test_database
+
+    lines = [
+        {'model': 'Building', 'name': 'building', 'description': 'desc'},
+        {'model': 'Room', 'name': 'room', 'description': 'desc', 'building_id': 1},
+        {'model': 'Sensor', 'name': 'sensor', 'description': 'desc', 'room_id': 1},
+    ] + [
+        {'model': 'SensorDataReadable', 'value': str(i), 'units': 'C',
+         'sensor_id': 1, 'datetime': f'2023-03-01 00:00:{i:02d}'}
+        for i in range(5)
+    ]
+    seed_path = tmp_path / 'seed.ndjson'
+    seed_path.write_text('\n'.join(json.dumps(line) for line in lines))
+
+    with app.app_context():
+        from api.database import db_session
+        reset_test_database()
+        db_session.commit()
+
+    result = runner.invoke(args=['init_db', '--file', str(seed_path),
+                                 '--chunk-size', '2', '--drop-indexes'])
+    assert '5 SensorDataReadable records created successfully' in result.output
+
+    with app.app_context():
+        from api.models import SensorDataReadable
+        assert SensorDataReadable.query.count() == 5
+
+
+def test_init_db_command_seed_file_error(app, runner, tmp_path):
+    """ test_init_db_command_seed_file_error
+
+    Tests that a malformed seed file is reported without a traceback, and
+    that the dropped indexes are rebuilt anyway.
+    """
+    from api.database import db_session, get_droppable_indexes
+
+    seed_path = tmp_path / 'seed.ndjson'
+    seed_path.write_text('{"model": "Building", "name": "building", "description": "desc"}\n'
+                         '{"model": \n')
+
+    result = runner.invoke(args=['init_db', '--file', str(seed_path), '--drop-indexes'])
+    assert result.exit_code == 1
+    assert f'Error: Failed to load {seed_path}' in result.output
+    assert 'Rebuilding indexes.' in result.output
+
+    with app.app_context():
+        names = {row[1] for row in db_session.execute(text(
+            'SELECT type, name FROM sqlite_master WHERE type = \'index\''))}
+        assert {index.name for index in get_droppable_indexes()} <= names
+
+
+def test_init_db_command_seed_file_missing_field(app, runner, tmp_path):
+    """ test_init_db_command_seed_file_missing_field
+
+    Tests that seed readings without a datetime, or with a datetime that
+    isn't a string, are reported without a traceback.
+    """
+    for datetime, message in ((None, "a record has no 'datetime' field"),
+                              (5, 'fromisoformat: argument must be str')):
+        reading = {'model': 'SensorDataReadable', 'value': '1', 'units': 'C', 'sensor_id': 1}
+        if datetime is not None:
+            reading['datetime'] = datetime
+        seed_path = tmp_path / 'seed.ndjson'
+        seed_path.write_text(json.dumps(reading))
+
+        result = runner.invoke(args=['init_db', '--file', str(seed_path)])
+        assert result.exit_code == 1
+        assert f'Error: Failed to load {seed_path}: {message}' in result.output
+
+
+def create_file_app(tmp_path, **config):
+    """ create_file_app
+
+    Creates an app using an initialized SQLite database file in `tmp_path`.
+    """
+    from api import create_app
+    from api.database import init_db
+
+    app = create_app({'TESTING': True,
+                      'DATABASE': str(tmp_path / 'db.sqlite'),
+                      **config})
+    with app.app_context():
+        init_db()
+    return app
+
+
+def test_engines_created_lazily_from_config(tmp_path):
+    """ test_engines_created_lazily_from_config
+
+    Tests that an app's engine is only created when first used, and that it
+    is configured from the app's config.
+    """
+    from sqlalchemy.pool import NullPool
+    from api import create_app
+    from api.database import get_database_state, get_engine
+
+    app = create_app({'TESTING': True,
+                      'DATABASE': str(tmp_path / 'db.sqlite'),
+                      'DATABASE_POOL_CLASS': 'NullPool',
+                      'DATABASE_CONNECT_ARGS': {'timeout': 1}})
+    assert get_database_state(app).engine is None
+
+    engine = get_engine(app)
+    assert isinstance(engine.pool, NullPool)
+    assert engine.url.database == str(tmp_path / 'db.sqlite')
+    assert get_engine(app) is engine
+    engine.dispose()
+
+
+def test_multiple_apps(tmp_path):
+    """ test_multiple_apps
+
+    Tests that apps in the same process use their own databases and sessions.
+    """
+    from api.database import db_session, get_database_state
+    from api.models import Building
+
+    (tmp_path / 'first').mkdir()
+    (tmp_path / 'second').mkdir()
+    first = create_file_app(tmp_path / 'first')
+    second = create_file_app(tmp_path / 'second')
+
+    with first.app_context():
+        db_session.add(Building(name='first', description='desc'))
+        db_session.commit()
+        with second.app_context():
+            assert Building.query.count() == 0
+            db_session.add(Building(name='second', description='desc'))
+            db_session.commit()
+        assert [b.name for b in Building.query.all()] == ['first']
+
+    with second.app_context():
+        assert [b.name for b in Building.query.all()] == ['second']
+
+    for app in (first, second):
+        get_database_state(app).dispose()
+
+
+def test_read_engine_readonly(tmp_path):
+    """ test_read_engine_readonly
+
+    Tests that the 'readonly' read mode opens read-only connections to the database.
+    """
+    from sqlalchemy.exc import OperationalError
+    from api.database import get_database_state, get_read_engine
+
+    app = create_file_app(tmp_path, DATABASE_READ_MODE='readonly')
+    with app.app_context(), get_read_engine().connect() as connection:
+        assert connection.execute(text('SELECT count(*) FROM building')).scalar() == 0
+        with pytest.raises(OperationalError, match='readonly'):
+            connection.execute(text(
+                "INSERT INTO building (name, description) VALUES ('b', 'd')"))
+    get_database_state(app).dispose()
+
+
+def test_read_engine_readonly_wal(tmp_path):
+    """ test_read_engine_readonly_wal
+
+    Tests that the 'readonly' read mode switches the database to WAL mode, so
+    that an open read doesn't block the writer's commits, and that paths
+    with URI special characters open the right file.
+    """
+    from api.database import db_session, get_database_state, get_read_engine
+    from api.models import Building
+
+    directory = tmp_path / 'data?#%41'
+    directory.mkdir()
+    app = create_file_app(directory, DATABASE_READ_MODE='readonly',
+                          DATABASE_CONNECT_ARGS={'timeout': 0.1})
+    with app.app_context(), get_read_engine().connect() as connection:
+        assert connection.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+        result = connection.execute(text('SELECT name FROM sqlite_master'))
+        assert result.fetchone()
+        # The read is still in progress
+        db_session.add(Building(name='building', description='desc'))
+        db_session.commit()
+        result.close()
+        assert connection.execute(text('SELECT count(*) FROM building')).scalar() == 1
+    get_database_state(app).dispose()
+
+
+def test_refresh_replica(tmp_path):
+    """ test_refresh_replica
+
+    Tests copying the database to a replica with the backup API.
+    """
+    from api.database import db_session, get_database_state, refresh_replica
+    from api.models import Building
+
+    app = create_file_app(tmp_path)
+    with app.app_context():
+        db_session.add(Building(name='building', description='desc'))
+        db_session.commit()
+    get_database_state(app).dispose()
+
+    replica_path = str(tmp_path / 'replica.sqlite')
+    refresh_replica(app.config['DATABASE'], replica_path)
+
+    replica = sqlite3.connect(replica_path)
+    assert replica.execute('SELECT name FROM building').fetchall() == [('building',)]
+    replica.close()
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['db.sqlite', 'replica.sqlite']
+
+
+def test_refresh_replica_concurrent(tmp_path):
+    """ test_refresh_replica_concurrent
+
+    Tests that concurrent refreshes of the same replica each write their own
+    temporary copy.
+    """
+    import threading
+    from api.database import get_database_state, refresh_replica
+
+    app = create_file_app(tmp_path)
+    get_database_state(app).dispose()
+
+    replica_path = str(tmp_path / 'replica.sqlite')
+    errors = []
+
+    def refresh():
+        try:
+            for _ in range(5):
+                refresh_replica(app.config['DATABASE'], replica_path)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=refresh) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    replica = sqlite3.connect(replica_path)
+    assert replica.execute('PRAGMA integrity_check').fetchall() == [('ok',)]
+    replica.close()
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['db.sqlite', 'replica.sqlite']
+
+
+def test_repair_foreign_keys(tmp_path, caplog):
+    """ test_repair_foreign_keys
+
+    Tests that a database created before its foreign keys cascaded deletes
+    is reported at startup and when deleting, and that `repair_foreign_keys`
+    rebuilds its tables keeping their rows.
+    """
+    from sqlalchemy.dialects import sqlite
+    from sqlalchemy.schema import CreateTable
+    from api.database import (Base, check_foreign_keys, db_session, get_database_state,
+                              get_engine, get_missing_cascades)
+    from api.models import Building, Room, Sensor, SensorDataReadable
+
+    legacy = sqlite3.connect(tmp_path / 'db.sqlite')
+    for table in Base.metadata.sorted_tables:
+        legacy.execute(str(CreateTable(table).compile(dialect=sqlite.dialect()))
+                       .replace(' ON DELETE CASCADE', ''))
+    legacy.close()
+    app = create_file_app(tmp_path)
+    with app.app_context():
+        db_session.add(Building(name='building', description='desc'))
+        db_session.add(Room(name='room', description='desc', building_id=1))
+        db_session.add(Sensor(name='thermometer', description='desc', room_id=1))
+        db_session.add(SensorDataReadable(sensor_id=1, value='1', units='C',
+                                          datetime=datetime.datetime(2023, 3, 20)))
+        db_session.commit()
+
+    check_foreign_keys(app)
+    assert 'repair_foreign_keys' in caplog.text
+    client = app.test_client()
+    response = client.delete('/buildings/1')
+    assert response.status_code == 500
+    assert 'repair_foreign_keys' in response.json['message']
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['repair_foreign_keys'])
+    assert result.exit_code == 0, result.output
+    assert 'Rebuilt the tables' in result.output
+    with get_engine(app).connect() as connection:
+        assert get_missing_cascades(connection) == []
+        assert connection.exec_driver_sql('PRAGMA foreign_keys').scalar() == 1
+    assert [result['id'] for result in client.get('/search?q=therm').json] == [1]
+    assert client.get('/sensors/1').json['data'][0]['value'] == '1'
+
+    assert client.delete('/buildings/1').status_code == 204
+    assert client.get('/sensors/1').status_code == 404
+    result = runner.invoke(args=['repair_foreign_keys'])
+    assert 'The foreign keys already cascade deletes.' in result.output
+    get_database_state(app).dispose()
@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+import pytest
+from tests.helpers import reset_test_database
+
+START = datetime(2023, 3, 20)
+
+
+@pytest.fixture(scope='module', autouse=True)
+def add_data(app):
+    """ add_data
+
+    Module scoped fixture to populate the database with two sensors.
+
+    Parameter:
+        app - app instance for testing
+    """
+
+    with app.app_context():
+        from api.database import db_session
+        from api.models import Building, Room, Sensor
+        reset_test_database()
+        db_session.add(Building(name='building', description='desc'))
+        db_session.add(Room(name='room', description='desc', building_id=1))
+        db_session.add(Sensor(name='sensor1', description='desc', room_id=1))
+        db_session.add(Sensor(name='sensor2', description='desc', room_id=1))
+        db_session.commit()
+
+
+def test_dedupe_readings_command(app, client, runner):
+    """ test_dedupe_readings_command
+
+    Tests deduplicating a database created before the (sensor_id, datetime)
+    index was unique, keeping the earliest write of each reading. Readings
+    posted before then are rejected with an error naming the command.
+    """
+    from sqlalchemy import insert, select, text
+    from api.bulk import READINGS_KEY_INDEX
+    from api.database import db_session
+    from api.models import SensorDataReadable
+
+    with app.app_context():
+        db_session.execute(text(f'DROP INDEX {READINGS_KEY_INDEX}'))
+        db_session.execute(text(f'CREATE INDEX {READINGS_KEY_INDEX} '
+                                f'ON sensor_data_readable (sensor_id, datetime)'))
+        readings = [{'sensor_id': sensor_id, 'value': str(value), 'units': 'C',
+                     'datetime': START + timedelta(minutes=minute)}
+                    for sensor_id, value, minute in
+                    ((1, 1, 0), (1, 2, 0), (1, 3, 1), (1, 4, 0), (2, 5, 0), (2, 6, 1))]
+        db_session.execute(insert(SensorDataReadable), readings)
+        db_session.commit()
+
+    response = client.post('/sensor_data', follow_redirects=True, json=[
+        {'sensor_id': 1, 'value': '7', 'units': 'C', 'datetime': '2023-03-20 00:02:00'}])
+    assert response.status_code == 500
+    assert 'dedupe_readings' in response.json['message']
+
+    result = runner.invoke(args=['dedupe_readings', '--chunk-size', '1'])
+    assert result.exit_code == 0, result.output
+    assert 'Deleted 2 duplicate readings.' in result.output
+    assert f'Created the unique index {READINGS_KEY_INDEX}.' in result.output
+
+    with app.app_context():
+        rows = db_session.execute(
+            select(SensorDataReadable.sensor_id, SensorDataReadable.value)
+            .order_by(SensorDataReadable.id)).all()
+        assert [tuple(row) for row in rows] == [(1, '1'), (1, '3'), (2, '5'), (2, '6')]
+        indexes = {row[1]: row[2] for row in
+                   db_session.execute(text("PRAGMA index_list('sensor_data_readable')"))}
+        assert indexes[READINGS_KEY_INDEX] == 1
+    assert client.get('/sensors/1/stats').json['count'] == 2
+
+    result = runner.invoke(args=['dedupe_readings'])
+    assert result.exit_code == 0, result.output
+    assert 'Deleted 0 duplicate readings.' in result.output
+    assert 'Created' not in result.output
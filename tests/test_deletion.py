@@ -0,0 +1,132 @@
+from datetime import datetime, timedelta
+import time
+import pytest
+from tests.helpers import reset_test_database
+
+
+def add_records(app):
+    """ add_records
+
+    Populates an app's database with two buildings, each with a room, a
+    sensor and readings.
+    """
+    with app.app_context():
+        from api.database import db_session, bulk_create_from_json_list
+        from api.models import Building, Room, Sensor, SensorDataReadable
+        reset_test_database()
+        for i in (1, 2):
+            db_session.add(Building(name=f'building{i}', description='desc'))
+            db_session.add(Room(name=f'room{i}', description='desc', building_id=i))
+            db_session.add(Sensor(name=f'sensor{i}', description='desc', room_id=i))
+        db_session.commit()
+        bulk_create_from_json_list([{
+            'value': str(i),
+            'units': 'C',
+            'sensor_id': sensor_id,
+            'datetime': datetime(2023, 3, 20) + timedelta(minutes=i),
+        } for sensor_id in (1, 2) for i in range(25)], SensorDataReadable)
+
+
+@pytest.fixture(autouse=True)
+def add_data(app):
+    """ add_data
+
+    Fixture to populate the database with two buildings, each with a room,
+    a sensor and readings, before every test.
+
+    Parameter:
+        app - app instance for testing
+    """
+    add_records(app)
+
+
+def count_records(app):
+    """ count_records
+
+    Returns the number of records of each model.
+    """
+    with app.app_context():
+        from api.models import Building, Room, Sensor, SensorDataReadable
+        return [model.query.count()
+                for model in (Building, Room, Sensor, SensorDataReadable)]
+
+
+def test_building_delete_cascades(app, client):
+    """ test_building_delete_cascades
+
+    Tests that deleting a building removes its rooms, sensors and readings.
+    """
+    response = client.delete('/buildings/1', follow_redirects=True)
+
+    assert response.status_code == 204
+    assert count_records(app) == [1, 1, 1, 25]
+
+
+def test_sensor_delete_keeps_parents(app, client):
+    """ test_sensor_delete_keeps_parents
+
+    Tests that deleting a sensor only removes the sensor and its readings.
+    """
+    response = client.delete('/sensors/2', follow_redirects=True)
+
+    assert response.status_code == 204
+    assert count_records(app) == [2, 2, 1, 25]
+
+
+def test_building_delete_background(file_app):
+    """ test_building_delete_background
+
+    Tests deleting a building in chunks on a background thread.
+    """
+    app = file_app
+    add_records(app)
+    client = app.test_client()
+    app.config['BULK_CHUNK_SIZE'] = 10
+    try:
+        response = client.delete('/buildings/2?background=true', follow_redirects=True)
+        assert response.status_code == 202
+        assert response.json['total'] == 25
+
+        deadline = time.monotonic() + 5
+        job = response.json
+        while job['status'] in ('pending', 'running') and time.monotonic() < deadline:
+            time.sleep(0.05)
+            job = client.get(response.headers['Location']).json
+    finally:
+        app.config['BULK_CHUNK_SIZE'] = 10000
+
+    assert job['status'] == 'completed'
+    assert job['deleted'] == 25
+    assert count_records(app) == [1, 1, 1, 25]
+
+
+def test_deletion_job_404(client):
+    """ test_deletion_job_404
+
+    Tests making a GET request to '/deletions/<id>' with a nonexistent id.
+    """
+    response = client.get('/deletions/999', follow_redirects=True)
+    assert response.status_code == 404
+
+
+def test_deletion_job_expires(app, client):
+    """ test_deletion_job_expires
+
+    Tests that finished deletion jobs are evicted after `DELETION_JOB_TTL` seconds.
+    """
+    response = client.delete('/sensors/2?background=true', follow_redirects=True)
+    location = response.headers['Location']
+    deadline = time.monotonic() + 5
+    job = response.json
+    while job['status'] in ('pending', 'running') and time.monotonic() < deadline:
+        time.sleep(0.05)
+        job = client.get(location).json
+    assert job['status'] == 'completed'
+
+    app.config['DELETION_JOB_TTL'] = 0
+    try:
+        time.sleep(0.01)
+        assert client.get(location).status_code == 404
+        assert response.json['id'] not in app.extensions['deletion_jobs']
+    finally:
+        app.config['DELETION_JOB_TTL'] = 3600
@@ -0,0 +1,175 @@
+from datetime import datetime, timedelta
+import pytest
+from tests.helpers import reset_test_database
+
+START = datetime(2023, 3, 20)
+
+
+@pytest.fixture(scope='module', autouse=True)
+def add_data(app):
+    """ add_data
+
+    Module scoped fixture to populate the database with two sensors.
+
+    Parameter:
+        app - app instance for testing
+    """
+
+    with app.app_context():
+        from api.database import db_session
+        from api.models import Building, Room, Sensor
+        reset_test_database()
+        db_session.add(Building(name='building', description='desc'))
+        db_session.add(Room(name='room', description='desc', building_id=1))
+        db_session.add(Sensor(name='sensor1', description='desc', room_id=1))
+        db_session.add(Sensor(name='sensor2', description='desc', room_id=1))
+        db_session.commit()
+
+
+@pytest.fixture
+def hot_tier(app):
+    """ hot_tier
+
+    Enables a hot tier holding two hours of readings for the duration of a test.
+    """
+    from api.hot_tier import HotTier
+    app.extensions['hot_tier'] = HotTier(2, 1000, 1 << 20)
+    yield app.extensions['hot_tier']
+    del app.extensions['hot_tier']
+
+
+def reading(sensor_id, value, minutes, units='C'):
+    return {
+        'value': value,
+        'units': units,
+        'sensor_id': sensor_id,
+        'datetime': (START + timedelta(minutes=minutes)).strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+def test_sensor_buffer_ring():
+    """ test_sensor_buffer_ring
+
+    Tests that a full buffer overwrites its oldest readings, keeps out of
+    order readings sorted and only covers ranges it holds completely.
+    """
+    from api.hot_tier import SensorBuffer
+
+    buffer = SensorBuffer(3)
+    for epoch in (10, 20, 30, 40):
+        buffer.append(epoch, epoch, float(epoch), 0)
+    assert [item[0] for item in buffer.items()] == [20, 30, 40]
+    assert buffer.start == 11
+
+    buffer.insert(25, 25, 25.0, 0)
+    assert [item[0] for item in buffer.items()] == [25, 30, 40]
+    assert buffer.start == 21
+
+    assert buffer.covers(21, None, None)
+    assert not buffer.covers(20, None, None)
+    assert buffer.covers(None, 35, 2)
+    assert not buffer.covers(None, 35, 3)
+    assert [buffer.epochs[i] for i in buffer.select(26, 40, None)] == [30, 40]
+    assert [buffer.epochs[i] for i in buffer.select(None, None, 2)] == [30, 40]
+
+    buffer.trim(35)
+    assert [item[0] for item in buffer.items()] == [40]
+    assert buffer.start == 35
+
+
+def test_hot_tier_memory_cap():
+    """ test_hot_tier_memory_cap
+
+    Tests that buffers stop growing at the memory cap, and that sensors that
+    don't fit aren't buffered at all.
+    """
+    from api.hot_tier import INITIAL_CAPACITY, READING_BYTES, HotTier
+
+    hot_tier = HotTier(1000, 10000, (INITIAL_CAPACITY * 3 - 1) * READING_BYTES)
+    for i in range(INITIAL_CAPACITY * 4):
+        hot_tier.add(i + 1, 1, str(i), 'C', START + timedelta(seconds=i))
+    hot_tier.add(1000, 2, '1', 'C', START)
+
+    assert len(hot_tier.buffers[1]) == INITIAL_CAPACITY * 2
+    assert hot_tier.skipped == {2}
+    assert hot_tier.query({'sensor_id': 1, 'datetime_from': START}) is None
+    assert hot_tier.query({'sensor_id': 2, 'limit': 1}) is None
+
+
+class TestHotTierRoutes:
+    """ TestHotTierRoutes
+
+    Class containing tests of sensor data queries answered from the hot tier.
+    """
+    mime_type = 'application/json'
+    headers = {
+        'Content-Type': mime_type,
+        'Accept': mime_type
+    }
+
+    def query(self, client, queries):
+        response = client.post('/sensor_data/query', json=queries, headers=self.headers)
+        assert response.status_code == 200
+        return response.json
+
+    def test_query_from_memory(self, app, client, hot_tier, monkeypatch):
+        """ test_query_from_memory
+
+        Tests that queries within the window are answered from memory with
+        the same results as the database, including values that aren't numbers.
+        """
+        import api.hot_tier
+
+        readings = [reading(1, str(20 + i % 7), i * 10) for i in range(24)]
+        readings += [reading(1, 'n/a', 235), reading(1, '21.50', 236, 'F'),
+                     reading(2, '5', 0)]
+        response = client.post('/sensor_data/', json=readings, headers=self.headers)
+        assert response.status_code == 200
+
+        queries = [
+            {'sensor_id': 1, 'from': '2023-03-20 02:00:00', 'to': '2023-03-20 03:30:00'},
+            {'sensor_id': 1, 'limit': 5},
+            {'sensor_id': 2, 'from': '2023-03-20 00:00:00'},
+        ]
+        del app.extensions['hot_tier']
+        expected = self.query(client, queries)
+        app.extensions['hot_tier'] = hot_tier
+
+        def fail(session, specs):
+            raise AssertionError('queried the database')
+
+        monkeypatch.setattr(api.hot_tier, 'query_reading_ranges', fail)
+        assert self.query(client, queries) == expected
+        assert expected[1]['data'][-1]['value'] == '21.50'
+        assert expected[1]['data'][-2]['value'] == 'n/a'
+
+    def test_query_outside_window(self, client, hot_tier):
+        """ test_query_outside_window
+
+        Tests that queries starting before the window read the database, and
+        that readings posted later are added to the tier.
+        """
+        queries = [{'sensor_id': 1, 'from': '2023-03-20 00:00:00'}]
+        data = self.query(client, queries)[0]['data']
+        assert len(data) == 26
+        assert hot_tier.query({'sensor_id': 1, 'datetime_from': START}) is None
+
+        response = client.post('/sensor_data/', json=reading(1, '30', 240),
+                               headers=self.headers)
+        assert response.status_code == 200
+        data = hot_tier.query({'sensor_id': 1, 'limit': 1})
+        assert [(row.value, row.datetime) for row in data] == \
+            [('30', START + timedelta(minutes=240))]
+
+    def test_rewrites_reload(self, client, hot_tier):
+        """ test_rewrites_reload
+
+        Tests that deleting readings reloads the tier.
+        """
+        query = {'sensor_id': 2, 'from': '2023-03-20 00:00:00'}
+        assert len(self.query(client, [query])[0]['data']) == 1
+
+        response = client.delete('/sensor_data/?sensor_id=2', headers=self.headers)
+        assert response.status_code == 200
+        assert self.query(client, [query])[0]['data'] == []
+        assert 2 not in hot_tier.buffers
@@ -0,0 +1,202 @@
+import datetime
+import socket
+import threading
+import time
+import pytest
+from tests.helpers import reset_test_database
+
+
+def add_records(app):
+    """ add_records
+
+    Populates an app's database with a building, a room and a sensor.
+    """
+    with app.app_context():
+        from api.database import db_session
+        from api.models import Building, Room, Sensor
+        reset_test_database()
+        db_session.add(Building(name='building', description='desc'))
+        db_session.add(Room(name='room', description='desc', building_id=1))
+        db_session.add(Sensor(name='sensor', description='desc', room_id=1))
+        db_session.commit()
+
+
+@pytest.fixture(scope='module', autouse=True)
+def add_data(app):
+    """ add_data
+
+    Module scoped fixture to populate the database with dummy data
+
+    Parameter:
+        app - app instance for testing
+    """
+    add_records(app)
+
+
+def count_readings(app):
+    with app.app_context():
+        from api.models import SensorDataReadable
+        return SensorDataReadable.query.count()
+
+
+def test_parse_line():
+    """ test_parse_line
+
+    Tests parsing a single line protocol reading.
+    """
+    from api.ingest import parse_line
+    assert parse_line(b'3 21.5 C 1679270400\n') == {
+        'sensor_id': 3,
+        'value': '21.5',
+        'units': 'C',
+        'datetime': datetime.datetime(2023, 3, 20),
+    }
+
+
+def test_parse_lines_errors():
+    """ test_parse_lines_errors
+
+    Tests that invalid lines are reported and blank lines skipped.
+    """
+    from api.ingest import parse_lines
+    readings, errors = parse_lines([b'1 2 C 0', b'', b'x 2 C 0', b'1 2 C'])
+    assert len(readings) == 1
+    assert [line for line, _ in errors] == [b'x 2 C 0', b'1 2 C']
+
+
+def test_tcp_listener(file_app):
+    """ test_tcp_listener
+
+    Tests that readings sent to the TCP listener are written in batches,
+    dropping readings for unknown sensors.
+    """
+    from api.ingest import LineProtocolTCPServer, LineProtocolWriter
+
+    app = file_app
+    add_records(app)
+    before = count_readings(app)
+    server = LineProtocolTCPServer(
+        ('127.0.0.1', 0), LineProtocolWriter(app), batch_size=2, flush_interval=0.05)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with socket.create_connection(server.server_address) as connection:
+            connection.sendall(b'1 20 C 1679270400\n1 21 C 1679270460\n'
+                               b'1 22 C 1679270520\n99 1 C 1679270520\n1 23 C 1679270580')
+
+        deadline = time.monotonic() + 5
+        while count_readings(app) < before + 4 and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert count_readings(app) == before + 4
+
+
+def test_writer_database_error(app, monkeypatch):
+    """ test_writer_database_error
+
+    Tests that a batch failing with a database error is dropped, and that
+    the writer keeps writing the following batches.
+    """
+    import api.ingest
+    from sqlalchemy.exc import OperationalError
+    from api.ingest import LineProtocolWriter
+
+    ingest_readings = api.ingest.ingest_readings
+
+    def locked(readings):
+        monkeypatch.setattr(api.ingest, 'ingest_readings', ingest_readings)
+        raise OperationalError('INSERT', {}, Exception('database is locked'))
+
+    monkeypatch.setattr(api.ingest, 'ingest_readings', locked)
+    before = count_readings(app)
+    writer = LineProtocolWriter(app)
+    writer.write([b'1 30 C 1679274000'])
+    writer.write([b'1 31 C 1679274060'])
+    assert count_readings(app) == before + 1
+
+
+class TestSensorDataBatchPost:
+    """ TestSensorDataBatchPost
+
+    Class containing tests related to posting lists of readings to '/sensor_data'.
+    """
+    mime_type = 'application/json'
+    headers = {
+        'Content-Type': mime_type,
+        'Accept': mime_type
+    }
+    url = '/sensor_data'
+
+    def test_sensor_data_post_batch(self, app, client):
+        """ test_sensor_data_post_batch
+
+        Tests making a POST request to '/sensor_data' with a list of readings.
+        """
+        before = count_readings(app)
+        data = [{
+            'value': str(i),
+            'units': 'C',
+            'sensor_id': 1,
+            'datetime': f'2023-03-21 00:00:0{i}',
+        } for i in range(3)]
+        response = client.post(
+            self.url, headers=self.headers, json=data, follow_redirects=True)
+
+        assert response.status_code == 200
+        assert response.json == {'created': 3, 'duplicates': 0}
+        assert count_readings(app) == before + 3
+
+    def test_sensor_data_post_batch_retry(self, app, client):
+        """ test_sensor_data_post_batch_retry
+
+        Tests that posting readings again, or twice in a batch, doesn't
+        create duplicates or count them in the sensor's statistics.
+        """
+        before = count_readings(app)
+        stats = client.get('/sensors/1/stats').json
+        data = [{
+            'value': str(i),
+            'units': 'C',
+            'sensor_id': 1,
+            'datetime': f'2023-03-22 00:00:0{i}',
+        } for i in range(3)]
+        response = client.post(self.url, headers=self.headers, json=data + data[:1],
+                               follow_redirects=True)
+        assert response.json == {'created': 3, 'duplicates': 1}
+
+        data[0]['value'] = '100'
+        response = client.post(self.url, headers=self.headers, json=data,
+                               follow_redirects=True)
+        assert response.status_code == 200
+        assert response.json == {'created': 0, 'duplicates': 3}
+        assert count_readings(app) == before + 3
+        assert client.get('/sensors/1/stats').json['count'] == stats['count'] + 3
+        data = client.get('/sensor_data/?sensor_id=1&datetime=2023-03-22 00:00:00').json
+        assert [reading['value'] for reading in data] == ['0']
+
+    def test_sensor_data_post_batch_404(self, client):
+        """ test_sensor_data_post_batch_404
+
+        Tests posting a list of readings for a nonexistent sensor.
+        """
+        data = [{'value': '1', 'units': 'C', 'sensor_id': 2,
+                 'datetime': '2023-03-21 00:00:00'}]
+        response = client.post(
+            self.url, headers=self.headers, json=data, follow_redirects=True)
+        assert response.status_code == 404
+
+    def test_sensor_data_post_batch_400(self, client):
+        """ test_sensor_data_post_batch_400
+
+        Tests posting a list of readings containing an invalid reading.
+        """
+        data = [{'value': '1', 'units': 'C', 'sensor_id': 1}]
+        response = client.post(
+            self.url, headers=self.headers, json=data, follow_redirects=True)
+        assert response.status_code == 400
+        assert response.json == {
+            'message': 'Invalid raw body structure for request.'
+        }
@@ -0,0 +1,171 @@
+import pytest
+from tests.helpers import reset_test_database
+
+
+def add_records(app):
+    """ add_records
+
+    Populates an app's database with two rooms of sensors.
+    """
+    with app.app_context():
+        from api.database import db_session
+        from api.models import Building, Room, Sensor
+        reset_test_database()
+        db_session.add(Building(name='building', description='desc'))
+        db_session.add(Room(name='room1', description='desc', building_id=1))
+        db_session.add(Room(name='room2', description='desc', building_id=1))
+        db_session.add(Sensor(name='sensor1', description='desc', room_id=1))
+        db_session.add(Sensor(name='sensor2', description='desc', room_id=2))
+        db_session.commit()
+
+
+@pytest.fixture(scope='module', autouse=True)
+def add_data(app):
+    """ add_data
+
+    Module scoped fixture to populate the database with two rooms of sensors.
+
+    Parameter:
+        app - app instance for testing
+    """
+    add_records(app)
+
+
+def test_parse_mix():
+    """ test_parse_mix
+
+    Tests parsing the weights of the operations of a load test.
+    """
+    from api.loadtest import parse_mix
+
+    assert parse_mix('read=80,ingest=15,listing=5') == \
+        {'read': 80.0, 'ingest': 15.0, 'listing': 5.0}
+    assert parse_mix('read=1') == {'read': 1.0}
+    for mix in ('write=1', 'read=x', 'read=-1', 'read=0', ''):
+        with pytest.raises(ValueError):
+            parse_mix(mix)
+
+
+def test_percentile():
+    """ test_percentile
+
+    Tests nearest-rank percentiles.
+    """
+    from api.loadtest import percentile
+
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile(values, 100) == 100
+    assert percentile([7], 95) == 7
+    assert percentile([], 50) is None
+
+
+def test_workload():
+    """ test_workload
+
+    Tests that generated requests follow the mix, and that ingested readings
+    never repeat a datetime.
+    """
+    import random
+    from api.loadtest import Workload
+
+    workload = Workload({'ingest': 1}, [(1, 1), (2, 2)], [(1, 1), (2, 1)], 3)
+    rng = random.Random(0)
+    datetimes = []
+    for _ in range(10):
+        operation, method, path, body = workload.next_request(rng)
+        assert (operation, method, path) == ('ingest', 'POST', '/sensor_data/')
+        assert len(body) == 3
+        datetimes += [reading['datetime'] for reading in body]
+    assert len(set(datetimes)) == 30
+
+    workload = Workload({'read': 1, 'listing': 0}, [(1, 1)], [(1, 1)], 3)
+    assert workload.next_request(rng)[0] == 'read'
+
+
+class TestLoadtestCommand:
+    """ TestLoadtestCommand
+
+    Class containing tests of the loadtest command against the app in process.
+    """
+
+    def test_closed_loop(self, file_app):
+        """ test_closed_loop
+
+        Tests that each operation of the mix is sent and reported.
+        """
+        app = file_app
+        add_records(app)
+        result = app.test_cli_runner().invoke(args=['loadtest', '--duration', '0.5', '--concurrency', '1',
+                                     '--mix', 'read=1,ingest=1,listing=1',
+                                     '--interval', '0.2', '--seed', '1'])
+        assert result.exit_code == 0, result.output
+        lines = result.output.splitlines()
+        assert lines[1].split()[:3] == ['time', 's', 'req/s']
+        summary = {line.split()[0]: line.split()
+                   for line in lines if line.split() and line.split()[0] in
+                   ('read', 'ingest', 'listing', 'total')}
+        assert set(summary) == {'read', 'ingest', 'listing', 'total'}
+        assert int(summary['total'][1]) > 0
+        assert int(summary['total'][2]) == 0
+
+        with app.app_context():
+            from sqlalchemy import func, select
+            from api.database import db_session
+            from api.models import SensorDataReadable
+            count = db_session.scalar(select(func.count(SensorDataReadable.id)))
+        assert count == int(summary['ingest'][1]) * 10
+
+    def test_open_loop(self, runner):
+        """ test_open_loop
+
+        Tests sending requests at an arrival rate.
+        """
+        result = runner.invoke(args=['loadtest', '--duration', '0.3', '--rate', '50',
+                                     '--mix', 'read=1', '--concurrency', '2'])
+        assert result.exit_code == 0, result.output
+        assert 'at 50 requests/s' in result.output
+
+    def test_invalid_options(self, runner):
+        """ test_invalid_options
+
+        Tests that invalid mixes and URLs are rejected.
+        """
+        result = runner.invoke(args=['loadtest', '--mix', 'write=1'])
+        assert result.exit_code != 0
+        assert 'Unknown operation' in result.output
+
+        result = runner.invoke(args=['loadtest', '--url', 'localhost'])
+        assert result.exit_code != 0
+        assert 'Invalid server URL' in result.output
+
+    def test_http_target(self, file_app):
+        """ test_http_target
+
+        Tests sending requests to a running server.
+        """
+        import threading
+        from werkzeug.serving import make_server
+        from api.loadtest import HTTPTarget, Workload, discover, run_load
+
+        app = file_app
+        add_records(app)
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            target = HTTPTarget(f'http://127.0.0.1:{server.server_port}')
+            sensors, rooms = discover(target)
+            assert sensors == [(1, 1), (2, 2)]
+            assert rooms == [(1, 1), (2, 1)]
+
+            workload = Workload({'read': 1, 'listing': 1}, sensors, rooms, 1)
+            recorder, elapsed, backlog = run_load(target, workload, 0.3, 2, seed=1)
+        finally:
+            server.shutdown()
+            thread.join()
+        summary = recorder.summary(elapsed)
+        assert summary['total']['requests'] > 0
+        assert summary['total']['errors'] == 0
+        assert backlog == 0
@@ -0,0 +1,101 @@
+import pytest
+from tests.helpers import reset_test_database
+
+
+@pytest.fixture(scope='module', autouse=True)
+def add_data(app):
+    """ add_data
+
+    Module scoped fixture to populate the database with a sensor holding a reading.
+
+    Parameter:
+        app - app instance for testing
+    """
+
+    with app.app_context():
+        from datetime import datetime
+        from api.database import db_session
+        from api.models import Building, Room, Sensor, SensorDataReadable
+        reset_test_database()
+        db_session.add(Building(name='building', description='desc'))
+        db_session.add(Room(name='room', description='desc', building_id=1))
+        db_session.add(Sensor(name='sensor', description='desc', room_id=1))
+        db_session.add(SensorDataReadable(value='1', units='C', sensor_id=1,
+                                          datetime=datetime(2023, 3, 20)))
+        db_session.commit()
+
+
+@pytest.fixture
+def profiling(app):
+    """ profiling
+
+    Enables profiling for the duration of a test.
+    """
+    app.config['PROFILING_ENABLED'] = True
+    yield
+    app.config['PROFILING_ENABLED'] = False
+
+
+def test_get_phase():
+    """ test_get_phase
+
+    Tests attributing functions to the phases of a request.
+    """
+    from api.profiler import get_phase
+
+    assert get_phase('/site-packages/sqlalchemy/orm/query.py', 'all') == 'query'
+    assert get_phase('~', "<method 'execute' of 'sqlite3.Cursor' objects>") == 'query'
+    assert get_phase('/site-packages/jsonschema/validators.py', 'validate') == 'validation'
+    assert get_phase('/repo/api/models.py', 'to_json') == 'serialization'
+    assert get_phase('/lib/python3.11/json/encoder.py', 'iterencode') == 'json_encoding'
+    assert get_phase('/site-packages/werkzeug/routing/map.py', 'match') == 'other'
+
+
+class TestProfiler:
+    """ TestProfiler
+
+    Class containing tests of profiling requests to the model endpoints.
+    """
+
+    def test_profile_report(self, client, profiling):
+        """ test_profile_report
+
+        Tests that profiled requests return a report of their phases and
+        slowest functions instead of their response.
+        """
+        for response in (client.get('/sensors/1?_profile=1'),
+                         client.get('/sensor_data/?sensor_id=1&_profile=1'),
+                         client.get('/rooms/1', headers={'X-Profile': '1'})):
+            assert response.status_code == 200
+            report = response.json
+            assert report['status'] == 200
+            assert set(report['phases']) == \
+                {'validation', 'query', 'serialization', 'json_encoding', 'other'}
+            assert report['total_ms'] == pytest.approx(sum(report['phases'].values()), abs=0.1)
+            assert 0 < len(report['functions']) <= 30
+
+    def test_profile_pstats(self, client, profiling, tmp_path):
+        """ test_profile_pstats
+
+        Tests downloading the profile as a file readable by pstats.
+        """
+        import pstats
+
+        response = client.get('/buildings/?_profile=pstats')
+        assert response.status_code == 200
+        assert response.headers['Content-Disposition'] == 'attachment; filename=profile.pstats'
+        path = tmp_path / 'profile.pstats'
+        path.write_bytes(response.get_data())
+        assert pstats.Stats(str(path)).total_calls > 0
+
+    def test_profile_disabled(self, client):
+        """ test_profile_disabled
+
+        Tests that the switch is ignored unless profiling is enabled.
+        """
+        response = client.get('/sensors/1?_profile=1')
+        assert response.status_code == 200
+        assert response.json['name'] == 'sensor'
+        response = client.get('/sensor_data/?_profile=1')
+        assert response.status_code == 200
+        assert len(response.json) == 1
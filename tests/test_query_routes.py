@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta
+import pytest
+from tests.helpers import reset_test_database
+
+START = datetime(2023, 3, 20)
+
+
+@pytest.fixture(scope='module', autouse=True)
+def add_data(app):
+    """ add_data
+
+    Module scoped fixture to populate the database with two rooms and two
+    sensors holding readings in different units.
+
+    Parameter:
+        app - app instance for testing
+    """
+
+    with app.app_context():
+        from api.database import db_session, bulk_create_from_json_list
+        from api.models import Building, Room, Sensor, SensorDataReadable
+        reset_test_database()
+        db_session.add(Building(name='building', description='desc'))
+        db_session.add(Room(name='room1', description='desc', building_id=1))
+        db_session.add(Room(name='room2', description='desc', building_id=1))
+        db_session.add(Sensor(name='sensor1', description='desc', room_id=1))
+        db_session.add(Sensor(name='sensor2', description='desc', room_id=2))
+        db_session.commit()
+        bulk_create_from_json_list([{
+            'value': value,
+            'units': units,
+            'sensor_id': sensor_id,
+            'datetime': START + timedelta(minutes=minute),
+        } for sensor_id, units, minute, value in [
+            (1, 'C', 0, '18'), (1, 'C', 1, '21.5'), (1, 'C', 2, 'n/a'),
+            (1, 'F', 3, '70'), (1, 'C', 4, '25'), (2, 'C', 0, '30'),
+        ]], SensorDataReadable)
+
+
+def test_compile_query_uses_index(app):
+    """ test_compile_query_uses_index
+
+    Tests that a filtered and sorted query of readings is a single
+    parameterized statement served by the (sensor_id, datetime) index.
+    """
+    from werkzeug.datastructures import MultiDict
+    from api.database import read_session
+    from api.models import SensorDataReadable
+    from api.query import compile_query
+
+    statement, fields = compile_query(SensorDataReadable, MultiDict(
+        {'sensor_id': '1', 'value_gte': '20', 'order': '-datetime', 'fields': 'id,value'}), 100)
+    assert fields == ['id', 'value']
+
+    with app.app_context():
+        compiled = statement.compile(read_session.get_bind())
+        assert '20' not in str(compiled)
+        rows = read_session.connection().exec_driver_sql(
+            f'EXPLAIN QUERY PLAN {compiled}',
+            tuple(compiled.params[name] for name in compiled.positiontup)).all()
+        read_session.remove()
+    plan = ' '.join(row[-1] for row in rows)
+    assert 'ix_sensor_data_readable_sensor_id_datetime' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+class TestQueryRoutes:
+    """ TestQueryRoutes
+
+    Class containing tests of filtering, sorting and projecting collections
+    with query parameters.
+    """
+
+    def test_filter_sort_project(self, client):
+        """ test_filter_sort_project
+
+        Tests filtering readings by sensor, numeric value and units, sorted
+        newest first, with only the requested fields.
+        """
+        response = client.get('/sensor_data/?sensor_id=1&value_gte=20&units=C'
+                              '&order=-datetime&fields=id,value,datetime&limit=500')
+
+        assert response.status_code == 200
+        assert response.json == [
+            {'id': 5, 'value': '25', 'datetime': '2023-03-20 00:04:00'},
+            {'id': 2, 'value': '21.5', 'datetime': '2023-03-20 00:01:00'},
+        ]
+
+    def test_operators_and_paging(self, client):
+        """ test_operators_and_paging
+
+        Tests the `in` and range operators, bounded id ranges, limits and offsets.
+        """
+        response = client.get('/sensor_data/?sensor_id_in=1,2&datetime_lt=2023-03-20 00:02:00'
+                              '&fields=id&limit=2&offset=1')
+        assert response.json == [{'id': 2}, {'id': 6}]
+
+        response = client.get('/rooms/?building_id=1&name_ne=room1&fields=name')
+        assert response.json == [{'name': 'room2'}]
+
+        response = client.get('/sensor_data/?id_gt=2&id_lte=4&fields=id')
+        assert response.json == [{'id': 3}, {'id': 4}]
+
+        response = client.get('/sensor_data/?id_in=2,6&fields=id')
+        assert response.json == [{'id': 2}, {'id': 6}]
+
+        response = client.get('/sensors/?order=-name&fields=id,room_id')
+        assert response.json == [{'id': 2, 'room_id': 2}, {'id': 1, 'room_id': 1}]
+
+    def test_invalid_queries(self, client):
+        """ test_invalid_queries
+
+        Tests that unlisted filters, unbounded reading scans, unknown fields,
+        invalid values and deep offsets are rejected.
+        """
+        for url in ('/sensor_data/?value_gte=20',
+                    '/sensor_data/?units=C',
+                    '/sensor_data/?sensor_id_ne=0&value_gt=20',
+                    '/sensor_data/?id_gte=0',
+                    '/sensor_data/?id_ne=1&id_lt=100',
+                    '/sensor_data/?sensor_id=1&offset=100001',
+                    '/sensor_data/?sensor_id=1&description=x',
+                    '/sensors/?description=desc',
+                    '/sensors/?fields=secret',
+                    '/sensors/?order=description',
+                    '/sensor_data/?sensor_id=one',
+                    '/sensor_data/?sensor_id=1&value_gte=warm',
+                    '/sensor_data/?sensor_id=1&limit=0',
+                    '/sensor_data/?sensor_id=1&limit=100000',
+                    '/sensor_data/?sensor_id=1&format=columnar'):
+            assert client.get(url).status_code == 400, url
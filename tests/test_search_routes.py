@@ -0,0 +1,101 @@
+import pytest
+from tests.helpers import reset_test_database
+
+
+@pytest.fixture(scope='module', autouse=True)
+def add_data(app):
+    """ add_data
+
+    Module scoped fixture to populate the database with a building holding a
+    room with two sensors.
+
+    Parameter:
+        app - app instance for testing
+    """
+
+    with app.app_context():
+        from api.database import db_session
+        from api.models import Building, Room, Sensor
+        reset_test_database()
+        db_session.add(Building(name='Engineering Hall', description='Main campus'))
+        db_session.add(Room(name='Lab 101', description='Thermal engineering lab',
+                            building_id=1))
+        db_session.add(Sensor(name='Thermometer', description='Wall mounted',
+                              room_id=1))
+        db_session.add(Sensor(name='Hygrometer', description='Measures thermal humidity',
+                              room_id=1))
+        db_session.commit()
+
+
+class TestSearchRoutes:
+    """ TestSearchRoutes
+
+    Class containing tests related to making requests to '/search'.
+    """
+
+    def search(self, client, query):
+        response = client.get('/search', query_string={'q': query})
+        assert response.status_code == 200
+        return [(result['type'], result['id']) for result in response.json]
+
+    def test_search_prefix_ranking(self, client):
+        """ test_search_prefix_ranking
+
+        Tests that words match as prefixes, and that name matches rank first.
+        """
+        response = client.get('/search?q=therm')
+
+        assert response.status_code == 200
+        assert response.json[0] == {
+            'type': 'sensor', 'id': 1, 'name': 'Thermometer',
+            'description': 'Wall mounted', 'path': '/sensors/1',
+        }
+        assert {(result['type'], result['id']) for result in response.json[1:]} == \
+            {('room', 1), ('sensor', 2)}
+        assert self.search(client, 'engineering hall') == [('building', 1)]
+        assert self.search(client, '"lab" -*') == [('room', 1)]
+
+    def test_search_follows_changes(self, app, client):
+        """ test_search_follows_changes
+
+        Tests that the index is kept in sync as records are created, renamed
+        and deleted, including deletes cascading from a room.
+        """
+        with app.app_context():
+            from api.database import db_session
+            from api.models import Room, Sensor
+            db_session.add(Room(name='Storage', description='Closet', building_id=1))
+            db_session.add(Sensor(name='Barometer', description='Pressure', room_id=2))
+            db_session.commit()
+            assert self.search(client, 'baro') == [('sensor', 3)]
+
+            db_session.get(Sensor, 3).name = 'Anemometer'
+            db_session.commit()
+            assert self.search(client, 'baro') == []
+            assert self.search(client, 'anemo') == [('sensor', 3)]
+
+            db_session.delete(db_session.get(Room, 2))
+            db_session.commit()
+            assert self.search(client, 'anemo') == []
+            assert self.search(client, 'storage') == []
+
+    def test_search_like_fallback(self, client, monkeypatch):
+        """ test_search_like_fallback
+
+        Tests searching without the FTS5 index.
+        """
+        import api.search
+        monkeypatch.setattr(api.search, 'has_search_index', lambda session: False)
+
+        assert self.search(client, 'therm') == [('sensor', 1), ('sensor', 2), ('room', 1)]
+        assert self.search(client, 'lab_') == []
+
+    def test_search_invalid(self, client):
+        """ test_search_invalid
+
+        Tests queries without words and invalid limits.
+        """
+        assert client.get('/search').status_code == 400
+        assert client.get('/search?q=***').status_code == 400
+        assert client.get('/search?q=lab&limit=0').status_code == 400
+        assert client.get('/search?q=lab&limit=1000').status_code == 400
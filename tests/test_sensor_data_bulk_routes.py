@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta
+import pytest
+from tests.helpers import reset_test_database
+
+
+@pytest.fixture(autouse=True)
+def add_data(app):
+    """ add_data
+
+    Fixture to populate the database with a sensor with 20 readings, one per
+    minute, before every test.
+
+    Parameter:
+        app - app instance for testing
+    """
+
+    with app.app_context():
+        from api.database import db_session, bulk_create_from_json_list
+        from api.models import Building, Room, Sensor, SensorDataReadable
+        reset_test_database()
+        db_session.add(Building(name='building', description='desc'))
+        db_session.add(Room(name='room', description='desc', building_id=1))
+        db_session.add(Sensor(name='sensor', description='desc', room_id=1))
+        db_session.commit()
+        bulk_create_from_json_list([{
+            'value': str(i),
+            'units': 'F',
+            'sensor_id': 1,
+            'datetime': datetime(2023, 3, 20) + timedelta(minutes=i),
+        } for i in range(20)], SensorDataReadable)
+
+
+class TestSensorDataBulkRoutes:
+    """ TestSensorDataBulkRoutes
+
+    Class containing tests related to deleting and correcting ranges of '/sensor_data'.
+    """
+    mime_type = 'application/json'
+    headers = {
+        'Content-Type': mime_type,
+        'Accept': mime_type
+    }
+    url = '/sensor_data/'
+    range_args = 'sensor_id=1&from=2023-03-20 00:05:00&to=2023-03-20 00:14:00'
+
+    def test_sensor_data_delete_range(self, app, client):
+        """ test_sensor_data_delete_range
+
+        Tests making a DELETE request to '/sensor_data/' with a datetime range.
+        """
+        app.config['BULK_CHUNK_SIZE'] = 3
+        try:
+            response = client.delete(f'{self.url}?{self.range_args}')
+        finally:
+            app.config['BULK_CHUNK_SIZE'] = 10000
+
+        assert response.status_code == 200
+        assert response.json == {'deleted': 10}
+        values = client.get('/sensors/1?format=columnar').json['value']
+        assert values == [str(i) for i in list(range(5)) + list(range(15, 20))]
+
+    def test_sensor_data_patch_units(self, app, client):
+        """ test_sensor_data_patch_units
+
+        Tests converting the values and units of a range with a PATCH request.
+        """
+        app.config['BULK_CHUNK_SIZE'] = 4
+        try:
+            response = client.patch(f'{self.url}?{self.range_args}', headers=self.headers,
+                                    json={'units': 'C', 'scale': 2, 'offset': 1})
+        finally:
+            app.config['BULK_CHUNK_SIZE'] = 10000
+
+        assert response.status_code == 200
+        assert response.json == {'updated': 10}
+        series = client.get('/sensors/1?format=columnar').json
+        assert series['units'] == ['F'] * 5 + ['C'] * 10 + ['F'] * 5
+        assert [float(value) for value in series['value'][5:15]] == \
+            [i * 2 + 1 for i in range(5, 15)]
+
+    def test_sensor_data_patch_scale_non_numeric(self, app, client):
+        """ test_sensor_data_patch_scale_non_numeric
+
+        Tests that converting values skips values that aren't numbers, even
+        if they contain one, and keeps integers as integers when the
+        converted value is whole.
+        """
+        from sqlalchemy import update
+        from api.database import db_session
+        from api.models import SensorDataReadable
+
+        with app.app_context():
+            for id, value in ((6, 'on'), (7, 'abc'), (8, '2.5'), (9, '0.0'), (10, 'v2'),
+                              (11, '12abc'), (12, 'code 3')):
+                db_session.execute(update(SensorDataReadable)
+                                   .where(SensorDataReadable.id == id).values(value=value))
+            db_session.commit()
+
+        response = client.patch(f'{self.url}?{self.range_args}', headers=self.headers,
+                                json={'scale': 1.5})
+        assert response.json == {'updated': 5}
+        values = client.get('/sensors/1?format=columnar').json['value']
+        assert values[5:15] == ['on', 'abc', '3.75', '0.0', 'v2', '12abc', 'code 3', '18',
+                                '19.5', '21']
+
+    def test_sensor_data_patch_400(self, client):
+        """ test_sensor_data_patch_400
+
+        Tests making a PATCH request that both replaces and scales values.
+        """
+        response = client.patch(f'{self.url}?{self.range_args}', headers=self.headers,
+                                json={'value': '1', 'scale': 2})
+        assert response.status_code == 400
+
+    def test_sensor_data_delete_400_sensor_id(self, client):
+        """ test_sensor_data_delete_400_sensor_id
+
+        Tests making a DELETE request to '/sensor_data/' without a sensor_id.
+        """
+        response = client.delete(self.url)
+        assert response.status_code == 400
+
+    def test_buildings_delete_405(self, client):
+        """ test_buildings_delete_405
+
+        Tests that range deletes are only supported for sensor data.
+        """
+        response = client.delete('/buildings/?sensor_id=1')
+        assert response.status_code == 405
@@ -0,0 +1,206 @@
+from datetime import datetime
+import pytest
+from tests.helpers import reset_test_database
+
+
+@pytest.fixture(scope='module', autouse=True)
+def add_data(app):
+    """ add_data
+
+    Module scoped fixture to populate the database with dummy data
+
+    Parameter:
+        app - app instance for testing
+    """
+
+    with app.app_context():
+        from api.database import db_session
+        from api.models import Building, Room, Sensor, SensorDataReadable
+        reset_test_database()
+        db_session.add(Building(name='building', description='desc'))
+        db_session.add(Room(name='room', description='desc', building_id=1))
+        db_session.add(Sensor(name='sensor1', description='desc', room_id=1))
+        db_session.add(Sensor(name='sensor2', description='desc', room_id=1))
+        for sensor_id in (1, 2):
+            for minute in range(5):
+                db_session.add(SensorDataReadable(
+                    value=str(sensor_id * 10 + minute),
+                    units='C',
+                    sensor_id=sensor_id,
+                    datetime=datetime(2023, 3, 20, 0, minute)
+                ))
+        db_session.commit()
+
+
+class TestSensorDataQueryRoutes:
+    """ TestSensorDataQueryRoutes
+
+    Class containing tests related to making requests to the '/sensor_data/query' endpoint.
+    """
+    mime_type = 'application/json'
+    headers = {
+        'Content-Type': mime_type,
+        'Accept': mime_type
+    }
+    url = '/sensor_data/query'
+
+    def test_sensor_data_query(self, client):
+        """ test_sensor_data_query
+
+        Tests querying the readings of several sensors in one request.
+        """
+        data = [
+            {'sensor_id': 1, 'from': '2023-03-20 00:01:00',
+             'to': '2023-03-20 00:03:00'},
+            {'sensor_id': 2, 'limit': 2},
+        ]
+        response = client.post(
+            self.url, headers=self.headers, json=data, follow_redirects=True)
+        assert response.content_type == self.mime_type
+        assert response.status_code == 200
+
+        first, second = response.json
+        assert first['sensor'] == 'sensor1'
+        assert first['sensor_id'] == 1
+        assert [d['value'] for d in first['data']] == ['11', '12', '13']
+        assert second['sensor_id'] == 2
+        assert second['data'] == [
+            {'id': 9, 'value': '23', 'units': 'C',
+             'datetime': '2023-03-20 00:03:00'},
+            {'id': 10, 'value': '24', 'units': 'C',
+             'datetime': '2023-03-20 00:04:00'},
+        ]
+
+    def test_sensor_data_query_404(self, client):
+        """ test_sensor_data_query_404
+
+        Tests querying a nonexistent sensor.
+        """
+        data = [{'sensor_id': 3}]
+        response = client.post(
+            self.url, headers=self.headers, json=data, follow_redirects=True)
+        assert response.status_code == 404
+
+    def test_sensor_data_query_400_empty(self, client):
+        """ test_sensor_data_query_400_empty
+
+        Tests querying with an empty list of queries.
+        """
+        response = client.post(
+            self.url, headers=self.headers, json=[], follow_redirects=True)
+        assert response.status_code == 400
+        assert response.json == {
+            'message': 'Invalid raw body structure for request.'
+        }
+
+    def test_sensor_data_query_400_random(self, client):
+        """ test_sensor_data_query_400_random
+
+        Tests querying with an additional key/value pair.
+        """
+        data = [{'sensor_id': 1, 'random': 'data'}]
+        response = client.post(
+            self.url, headers=self.headers, json=data, follow_redirects=True)
+        assert response.status_code == 400
+
+    def test_sensor_data_query_400_too_many(self, client):
+        """ test_sensor_data_query_400_too_many
+
+        Tests querying with more than the maximum number of queries.
+        """
+        data = [{'sensor_id': 1, 'limit': 1}] * 201
+        response = client.post(
+            self.url, headers=self.headers, json=data, follow_redirects=True)
+        assert response.status_code == 400
+
+        response = client.post(
+            self.url, headers=self.headers, json=data[:200], follow_redirects=True)
+        assert response.status_code == 200
+        assert len(response.json) == 200
+
+    def test_query_reading_ranges_chunks(self, app):
+        """ test_query_reading_ranges_chunks
+
+        Tests querying more ranges than SQLite allows members in a single
+        compound SELECT.
+        """
+        from api.database import db_session
+        from api.readings import query_reading_ranges
+
+        with app.app_context():
+            specs = [{'sensor_id': sensor_id, 'limit': 1} for sensor_id in (1, 2, 99) * 200]
+            results = [[row.id for row in rows]
+                       for rows in query_reading_ranges(db_session, specs)]
+            expected = [[row.id for row in rows]
+                        for rows in query_reading_ranges(db_session, specs[:3])]
+            assert len(results) == 600
+            assert results == expected * 200
+            assert expected[0] and expected[1] and not expected[2]
+
+
+class TestColumnarFormat:
+    """ TestColumnarFormat
+
+    Class containing tests related to requesting sensor data with '?format=columnar'.
+    """
+    mime_type = 'application/json'
+    headers = {
+        'Content-Type': mime_type,
+        'Accept': mime_type
+    }
+
+    def test_sensors_get_id_columnar(self, client):
+        """ test_sensors_get_id_columnar
+
+        Tests making a GET request to '/sensors/<id>?format=columnar'.
+        """
+        response = client.get('/sensors/1?format=columnar', follow_redirects=True)
+
+        assert response.content_type == self.mime_type
+        assert response.status_code == 200
+        assert response.json == {
+            'sensor': 'sensor1',
+            'sensor_id': 1,
+            'units': 'C',
+            'datetime': [f'2023-03-20 00:0{minute}:00' for minute in range(5)],
+            'value': ['10', '11', '12', '13', '14'],
+        }
+
+    def test_sensor_data_get_columnar_epoch(self, client):
+        """ test_sensor_data_get_columnar_epoch
+
+        Tests making a GET request to '/sensor_data?format=columnar&timestamps=epoch'.
+        """
+        response = client.get(
+            '/sensor_data?format=columnar&timestamps=epoch', follow_redirects=True)
+
+        assert response.status_code == 200
+        assert [series['sensor_id'] for series in response.json] == [1, 2]
+        assert response.json[1]['datetime'][0] == 1679270400
+        assert response.json[1]['value'][0] == '20'
+
+    def test_sensor_data_query_columnar(self, client):
+        """ test_sensor_data_query_columnar
+
+        Tests making a POST request to '/sensor_data/query?format=columnar'.
+        """
+        data = [{'sensor_id': 2, 'limit': 1}]
+        response = client.post('/sensor_data/query?format=columnar',
+                               headers=self.headers, json=data, follow_redirects=True)
+
+        assert response.status_code == 200
+        assert response.json == [{
+            'sensor': 'sensor2',
+            'sensor_id': 2,
+            'units': 'C',
+            'datetime': ['2023-03-20 00:04:00'],
+            'value': ['24'],
+        }]
+
+    def test_buildings_get_columnar_400(self, client):
+        """ test_buildings_get_columnar_400
+
+        Tests that the columnar format is rejected for models without sensor data.
+        """
+        response = client.get('/buildings?format=columnar', follow_redirects=True)
+        assert response.status_code == 400
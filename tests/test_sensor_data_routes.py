@@ -97,7 +97,7 @@ class TestSensorDataRoutes:
             'value': '1',
             'units': 'C',
             'sensor_id': 1,
-            'datetime': '2023-03-20 00:00:00',
+            'datetime': '2023-03-20 00:01:00',
         }
         response = client.post(
             self.url, headers=self.headers, json=data, follow_redirects=True)
@@ -110,9 +110,29 @@ class TestSensorDataRoutes:
             'value': '1',
             'units': 'C',
             'sensor_id': 1,
-            'datetime': '2023-03-20 00:00:00',
+            'datetime': '2023-03-20 00:01:00',
         }
 
+    def test_sensor_data_post_retry(self, client):
+        """ test_sensor_data_post_retry
+
+        Tests that posting a reading again returns the stored reading rather
+        than creating a duplicate.
+        """
+        data = {
+            'value': '2',
+            'units': 'C',
+            'sensor_id': 1,
+            'datetime': '2023-03-20 00:01:00',
+        }
+        response = client.post(
+            self.url, headers=self.headers, json=data, follow_redirects=True)
+        assert response.status_code == 200
+        assert response.json['id'] == 2
+        assert response.json['value'] == '1'
+        response = client.get(f'{self.url}/3', follow_redirects=True)
+        assert response.status_code == 404
+
     def test_sensor_data_post_400_empty(self, client):
         """ test_sensor_data_post_400_empty
 
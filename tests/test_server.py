@@ -0,0 +1,115 @@
+import json
+import multiprocessing
+import time
+import urllib.request
+
+import pytest
+
+
+def create_file_app(tmp_path, **config):
+    """ create_file_app
+
+    Creates an app using a SQLite database file with a single building.
+    Forked workers can't share in-memory databases, so this doesn't use the
+    `app` fixture.
+    """
+    from api import create_app
+    from api.database import db_session, init_db
+    from api.models import Building
+
+    app = create_app({'TESTING': True,
+                      'DATABASE': str(tmp_path / 'db.sqlite'),
+                      **config})
+    with app.app_context():
+        init_db()
+        db_session.add(Building(name='building', description='desc'))
+        db_session.commit()
+    return app
+
+
+def get_json(url, attempts=50):
+    """ get_json
+
+    Fetches a JSON response, retrying while the server is starting.
+    """
+    for _ in range(attempts):
+        try:
+            with urllib.request.urlopen(url, timeout=5) as response:
+                return response.status, json.loads(response.read())
+        except OSError:
+            time.sleep(0.1)
+    raise AssertionError(f'No response from {url}')
+
+
+def test_limit_worker_pool():
+    """ test_limit_worker_pool
+
+    Tests that workers get one pooled connection per thread, unless the pool is configured.
+    """
+    from api.server import limit_worker_pool
+
+    config = {'DATABASE_POOL_CLASS': None,
+              'DATABASE_POOL_SIZE': None,
+              'DATABASE_MAX_OVERFLOW': None}
+    limit_worker_pool(config, 8)
+    assert config['DATABASE_POOL_SIZE'] == 8
+    assert config['DATABASE_MAX_OVERFLOW'] == 0
+
+    config = {'DATABASE_POOL_CLASS': 'QueuePool',
+              'DATABASE_POOL_SIZE': 2,
+              'DATABASE_MAX_OVERFLOW': None}
+    limit_worker_pool(config, 8)
+    assert config['DATABASE_POOL_SIZE'] == 2
+
+    config = {'DATABASE_POOL_CLASS': 'NullPool'}
+    limit_worker_pool(config, 8)
+    assert 'DATABASE_POOL_SIZE' not in config
+
+
+def test_reset_after_fork(tmp_path):
+    """ test_reset_after_fork
+
+    Tests that engines created before a fork drop their inherited connections.
+    """
+    from sqlalchemy import text
+    from api.database import get_database_state, get_engine, reset_after_fork
+
+    app = create_file_app(tmp_path)
+    engine = get_engine(app)
+    pool = engine.pool
+    with engine.connect() as connection:
+        connection.execute(text('SELECT 1'))
+
+    reset_after_fork()
+    assert engine.pool is not pool
+    assert engine.pool.checkedin() == 0
+    get_database_state(app).dispose()
+
+
+@pytest.mark.skipif(not hasattr(multiprocessing, 'get_context')
+                    or 'fork' not in multiprocessing.get_all_start_methods(),
+                    reason='requires os.fork()')
+def test_serve_workers(tmp_path):
+    """ test_serve_workers
+
+    Tests serving requests with multiple pre-forked worker processes, after
+    the parent process has already used the database.
+    """
+    from api.server import bind_socket, serve
+
+    app = create_file_app(tmp_path)
+    sock = bind_socket('127.0.0.1', 0)
+    port = sock.getsockname()[1]
+    process = multiprocessing.get_context('fork').Process(
+        target=serve, args=(app, sock, 2, 2))
+    process.start()
+    try:
+        for _ in range(10):
+            status, body = get_json(f'http://127.0.0.1:{port}/buildings/')
+            assert status == 200
+            assert [building['name'] for building in body] == ['building']
+    finally:
+        process.terminate()
+        process.join(10)
+        sock.close()
+    assert process.exitcode is not None
@@ -0,0 +1,82 @@
+import pytest
+
+
+@pytest.fixture
+def slow_app(tmp_path):
+    """ slow_app
+
+    Creates an app recording every statement as slow, with the debug endpoints.
+    """
+    from api import create_app
+    from api.database import get_database_state, init_db
+
+    app = create_app({'TESTING': True,
+                      'DATABASE': str(tmp_path / 'db.sqlite'),
+                      'SLOW_QUERY_THRESHOLD': 0,
+                      'SLOW_QUERY_LOG_SIZE': 5,
+                      'DEBUG_ENDPOINTS': True})
+    with app.app_context():
+        init_db()
+    yield app
+    get_database_state(app).dispose()
+
+
+def test_slow_queries_recorded(slow_app):
+    """ test_slow_queries_recorded
+
+    Tests that slow statements are recorded with their parameters, endpoint
+    and query plan, and listed newest first by the debug endpoint.
+    """
+    from api.slow_queries import get_slow_query_log
+
+    client = slow_app.test_client()
+    get_slow_query_log(slow_app).clear()
+    assert client.get('/sensor_data/?sensor_id=7&fields=id').status_code == 200
+
+    entries = client.get('/_debug/slow_queries').json
+    entry = next(entry for entry in entries if 'FROM sensor_data_readable' in entry['statement'])
+    assert entry['endpoint'] == 'api.sensor_data_list'
+    assert entry['path'] == '/sensor_data/?sensor_id=7&fields=id'
+    assert entry['parameters'][0] == 7
+    assert entry['duration_ms'] >= 0
+    assert any('ix_sensor_data_readable_sensor_id_datetime' in line for line in entry['plan'])
+
+    for _ in range(5):
+        client.get('/buildings/?id=1')
+    assert len(client.get('/_debug/slow_queries').json) == 5
+
+
+def test_slow_queries_disabled(client):
+    """ test_slow_queries_disabled
+
+    Tests that statements aren't timed unless a threshold is configured.
+    """
+    from api.database import get_engine
+    from api.slow_queries import start_timer
+    from sqlalchemy import event
+
+    assert not event.contains(get_engine(client.application), 'before_cursor_execute',
+                              start_timer)
+
+
+def test_slow_queries_analytics(slow_app):
+    """ test_slow_queries_analytics
+
+    Tests that the statements loading the series of analytics are recorded.
+    """
+    from api.database import db_session
+    from api.models import Building, Room, Sensor
+    from api.slow_queries import get_slow_query_log
+
+    with slow_app.app_context():
+        db_session.add(Building(name='building', description='desc'))
+        db_session.add(Room(name='room', description='desc', building_id=1))
+        db_session.add(Sensor(name='sensor', description='desc', room_id=1))
+        db_session.commit()
+
+    client = slow_app.test_client()
+    get_slow_query_log(slow_app).clear()
+    assert client.get('/sensors/1/analytics?ops=count').status_code == 200
+    statements = [entry['statement'] for entry in client.get('/_debug/slow_queries').json]
+    assert any('CAST(sensor_data_readable.value AS FLOAT)' in statement
+               for statement in statements)
@@ -0,0 +1,68 @@
+import os
+import subprocess
+import sys
+
+# Maximum seconds a fresh interpreter may take to import and create the app.
+# Startup takes well under a second, so this only fails on regressions such
+# as heavy modules imported eagerly.
+STARTUP_BUDGET = 2.0
+
+# Modules that are only imported by the requests that need them
+LAZY_MODULES = ('numpy', 'jsonschema')
+
+STARTUP_SCRIPT = '''
+import sys
+import time
+start = time.perf_counter()
+from api import create_app
+create_app({'TESTING': True})
+print(time.perf_counter() - start)
+print(' '.join(name for name in %r if name in sys.modules))
+''' % (LAZY_MODULES,)
+
+
+def run_startup():
+    """ run_startup
+
+    Imports and creates the app in a fresh interpreter.
+
+    Returns:
+        seconds taken and the lazy modules that were imported
+    """
+    result = subprocess.run(
+        [sys.executable, '-c', STARTUP_SCRIPT], capture_output=True, text=True,
+        check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    seconds, imported = (result.stdout.splitlines() + [''])[:2]
+    return float(seconds), imported.split()
+
+
+def test_startup_budget():
+    """ test_startup_budget
+
+    Tests that creating the app stays within the startup budget, taking the
+    fastest of a few runs so that a busy machine doesn't fail it.
+    """
+    assert min(run_startup()[0] for _ in range(3)) < STARTUP_BUDGET
+
+
+def test_lazy_imports():
+    """ test_lazy_imports
+
+    Tests that creating the app doesn't import the modules only some
+    requests need.
+    """
+    assert run_startup()[1] == []
+
+
+def test_compile_validator():
+    """ test_compile_validator
+
+    Tests that validators are compiled once per schema and still check formats.
+    """
+    from api.schemas import get_schema
+    from api.validators import compile_validator, get_request_validator
+
+    assert compile_validator(get_schema) is compile_validator(get_schema)
+    assert get_request_validator({'df': '2023-03-20T00:00:00Z'})
+    assert not get_request_validator({'df': 1})
+    assert not get_request_validator({'unknown': '2023-03-20T00:00:00Z'})
@@ -0,0 +1,146 @@
+from datetime import datetime, timedelta
+import pytest
+from tests.helpers import reset_test_database
+
+
+@pytest.fixture(scope='module', autouse=True)
+def add_data(app):
+    """ add_data
+
+    Module scoped fixture to populate the database with a room holding two
+    sensors, whose readings are inserted through the bulk insert path.
+
+    Parameter:
+        app - app instance for testing
+    """
+
+    with app.app_context():
+        from api.database import db_session, bulk_create_from_json_list
+        from api.models import Building, Room, Sensor, SensorDataReadable
+        reset_test_database()
+        db_session.add(Building(name='building', description='desc'))
+        db_session.add(Room(name='room', description='desc', building_id=1))
+        db_session.add(Sensor(name='sensor1', description='desc', room_id=1))
+        db_session.add(Sensor(name='sensor2', description='desc', room_id=1))
+        db_session.commit()
+        start = datetime(2023, 3, 20)
+        bulk_create_from_json_list([{
+            'value': value,
+            'units': 'C',
+            'sensor_id': 1,
+            'datetime': start + timedelta(minutes=minute),
+        } for minute, value in enumerate(['5', '1', 'n/a', '3'])], SensorDataReadable)
+        bulk_create_from_json_list([{
+            'value': '10', 'units': 'C', 'sensor_id': 2,
+            'datetime': start - timedelta(minutes=1),
+        }], SensorDataReadable)
+
+
+class TestStatsRoutes:
+    """ TestStatsRoutes
+
+    Class containing tests related to making requests to the '/<model>/<id>/stats' endpoints.
+    """
+    mime_type = 'application/json'
+    headers = {
+        'Content-Type': mime_type,
+        'Accept': mime_type
+    }
+
+    def test_sensors_stats(self, client):
+        """ test_sensors_stats
+
+        Tests making a GET request to '/sensors/<id>/stats'.
+        """
+        response = client.get('/sensors/1/stats')
+
+        assert response.status_code == 200
+        assert response.json == {
+            'count': 4,
+            'numeric_count': 3,
+            'min': 1.0,
+            'max': 5.0,
+            'avg': 3.0,
+            'first': {'value': '5', 'datetime': '2023-03-20 00:00:00'},
+            'last': {'value': '3', 'datetime': '2023-03-20 00:03:00'},
+        }
+
+    def test_stats_after_post(self, client):
+        """ test_stats_after_post
+
+        Tests that posting a reading updates the statistics incrementally.
+        """
+        data = {'value': '-2', 'units': 'C', 'sensor_id': 1,
+                'datetime': '2023-03-20 00:10:00'}
+        client.post('/sensor_data', headers=self.headers, json=data, follow_redirects=True)
+        response = client.get('/sensors/1/stats')
+
+        assert response.json['count'] == 5
+        assert response.json['min'] == -2.0
+        assert response.json['last'] == {'value': '-2', 'datetime': '2023-03-20 00:10:00'}
+
+    def test_stats_after_delete(self, client):
+        """ test_stats_after_delete
+
+        Tests that deleting readings repairs the statistics.
+        """
+        response = client.delete(
+            '/sensor_data/?sensor_id=1&from=2023-03-20 00:10:00', follow_redirects=True)
+        assert response.json == {'deleted': 1}
+        response = client.get('/sensors/1/stats')
+
+        assert response.json['count'] == 4
+        assert response.json['min'] == 1.0
+        assert response.json['last'] == {'value': '3', 'datetime': '2023-03-20 00:03:00'}
+
+    def test_rooms_stats(self, client):
+        """ test_rooms_stats
+
+        Tests making a GET request to '/rooms/<id>/stats', combining both sensors.
+        """
+        response = client.get('/rooms/1/stats')
+
+        assert response.status_code == 200
+        assert response.json['count'] == 5
+        assert response.json['max'] == 10.0
+        assert response.json['avg'] == 4.75
+        assert response.json['first'] == {'value': '10', 'datetime': '2023-03-19 23:59:00'}
+
+    def test_buildings_stats_404(self, client):
+        """ test_buildings_stats_404
+
+        Tests making a GET request to '/buildings/<id>/stats' with a nonexistent id.
+        """
+        response = client.get('/buildings/2/stats')
+        assert response.status_code == 404
+
+    def test_stats_after_delete_by_id(self, client, monkeypatch):
+        """ test_stats_after_delete_by_id
+
+        Tests that deleting a single reading only rescans the sensor's
+        readings when it was the minimum, maximum, first or last reading.
+        """
+        import api.routes
+        refreshed = []
+        refresh_sensor_stats = api.routes.refresh_sensor_stats
+
+        def record_refresh(session, sensor_ids=None):
+            refreshed.append(set(sensor_ids))
+            refresh_sensor_stats(session, sensor_ids)
+
+        monkeypatch.setattr(api.routes, 'refresh_sensor_stats', record_refresh)
+
+        # 'n/a' is neither a number nor the first or last reading
+        assert client.delete('/sensor_data/3').status_code == 204
+        response = client.get('/sensors/1/stats')
+        assert refreshed == []
+        assert response.json['count'] == 3
+        assert response.json['numeric_count'] == 3
+        assert response.json['avg'] == 3.0
+
+        # '3' is the last reading
+        assert client.delete('/sensor_data/4').status_code == 204
+        response = client.get('/sensors/1/stats')
+        assert refreshed == [{1}]
+        assert response.json['count'] == 2
+        assert response.json['last'] == {'value': '1', 'datetime': '2023-03-20 00:01:00'}
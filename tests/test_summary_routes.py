@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+import pytest
+from tests.helpers import reset_test_database
+
+START = datetime(2023, 3, 20)
+
+
+@pytest.fixture(scope='module', autouse=True)
+def add_data(app):
+    """ add_data
+
+    Module scoped fixture to populate the database with a building holding a
+    room with two sensors reporting in different units, and an empty room.
+
+    Parameter:
+        app - app instance for testing
+    """
+
+    with app.app_context():
+        from api.database import db_session, bulk_create_from_json_list
+        from api.models import Building, Room, Sensor, SensorDataReadable
+        reset_test_database()
+        db_session.add(Building(name='building', description='desc'))
+        db_session.add(Room(name='room1', description='desc', building_id=1))
+        db_session.add(Room(name='room2', description='desc', building_id=1))
+        db_session.add(Sensor(name='sensor1', description='desc', room_id=1))
+        db_session.add(Sensor(name='sensor2', description='desc', room_id=1))
+        db_session.add(Sensor(name='sensor3', description='desc', room_id=1))
+        db_session.commit()
+        bulk_create_from_json_list([{
+            'value': value,
+            'units': units,
+            'sensor_id': sensor_id,
+            'datetime': START + timedelta(minutes=minute),
+        } for sensor_id, units, minute, value in [
+            (1, 'C', 0, '5'), (1, 'C', 1, '1'), (1, 'C', 2, 'n/a'),
+            (2, 'C', 0, '9'), (2, '%', 3, '40'), (2, '%', 1, '50'),
+        ]], SensorDataReadable)
+
+
+class TestSummaryRoutes:
+    """ TestSummaryRoutes
+
+    Class containing tests related to making requests to the room and building
+    '/summary' endpoints.
+    """
+
+    def test_room_summary(self, client):
+        """ test_room_summary
+
+        Tests aggregating a room's readings per units, skipping values that
+        aren't numbers, and the latest reading of each sensor.
+        """
+        response = client.get('/rooms/1/summary')
+
+        assert response.status_code == 200
+        assert response.json['room_id'] == 1
+        assert response.json['units'] == [
+            {'units': '%', 'count': 2, 'numeric_count': 2, 'avg': 45.0, 'min': 40.0, 'max': 50.0},
+            {'units': 'C', 'count': 4, 'numeric_count': 3, 'avg': 5.0, 'min': 1.0, 'max': 9.0},
+        ]
+        assert response.json['sensors'] == [
+            {'sensor': 'sensor1', 'sensor_id': 1, 'count': 3, 'latest': {
+                'value': 'n/a', 'units': 'C', 'datetime': '2023-03-20 00:02:00'}},
+            {'sensor': 'sensor2', 'sensor_id': 2, 'count': 3, 'latest': {
+                'value': '40', 'units': '%', 'datetime': '2023-03-20 00:03:00'}},
+            {'sensor': 'sensor3', 'sensor_id': 3, 'count': 0, 'latest': None},
+        ]
+
+    def test_building_summary_range(self, client):
+        """ test_building_summary_range
+
+        Tests summarizing each room of a building within a range.
+        """
+        response = client.get('/buildings/1/summary'
+                              '?from=2023-03-20 00:01:00&to=2023-03-20 00:02:00')
+
+        assert response.status_code == 200
+        assert response.json['building_id'] == 1
+        room1, room2 = response.json['rooms']
+        assert room1['units'] == [
+            {'units': '%', 'count': 1, 'numeric_count': 1, 'avg': 50.0, 'min': 50.0, 'max': 50.0},
+            {'units': 'C', 'count': 2, 'numeric_count': 1, 'avg': 1.0, 'min': 1.0, 'max': 1.0},
+        ]
+        assert [sensor['latest'] and sensor['latest']['value']
+                for sensor in room1['sensors']] == ['n/a', '50', None]
+        assert room2 == {'room': 'room2', 'room_id': 2, 'units': [], 'sensors': []}
+
+    def test_summary_invalid(self, client):
+        """ test_summary_invalid
+
+        Tests unknown records and invalid datetimes.
+        """
+        assert client.get('/rooms/99/summary').status_code == 404
+        assert client.get('/buildings/99/summary').status_code == 404
+        assert client.get('/rooms/1/summary?from=yesterday').status_code == 400